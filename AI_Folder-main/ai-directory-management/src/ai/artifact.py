@@ -0,0 +1,141 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+from datetime import datetime, timezone
+
+from config.settings import MODEL_SETTINGS
+
+AI_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARTIFACT_ROOT = os.path.join(AI_DIRECTORY, 'models')
+LEGACY_MODEL_PATH = os.path.join(AI_DIRECTORY, 'model.pkl')
+
+MANIFEST = 'manifest.json'
+MODEL_FILE = 'model.joblib'
+FORMAT_VERSION = 1
+
+
+def _version_number(name):
+    """Return N for an artifact directory named vN, else None."""
+    if name.startswith('v') and name[1:].isdigit():
+        return int(name[1:])
+    return None
+
+
+def list_versions(root):
+    """Return the artifact versions published under root, oldest first."""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    return sorted(number for number in map(_version_number, names)
+                  if number is not None and os.path.isfile(os.path.join(root, f"v{number}", MANIFEST)))
+
+
+def resolve_model_path(path=None, version=None):
+    """Find the model to load: an artifact directory or a legacy pickle file.
+
+    path is a single artifact directory, a root of versioned artifacts (v1,
+    v2, ...) or a .pkl file; it defaults to MODEL_SETTINGS['model_path'] and
+    then to ai/models. From a root the pinned version
+    (MODEL_SETTINGS['model_version']) or else the newest one is used. With no
+    artifact at the default location the bundled ai/model.pkl is used.
+    """
+    configured = path or MODEL_SETTINGS["model_path"]
+    root = configured or DEFAULT_ARTIFACT_ROOT
+    version = version or MODEL_SETTINGS["model_version"]
+
+    if os.path.isfile(root):
+        return root
+    if os.path.isfile(os.path.join(root, MANIFEST)):
+        return root
+    versions = list_versions(root)
+    if version is not None:
+        if version not in versions:
+            raise FileNotFoundError(f"Model version {version} not found in {root}.")
+        return os.path.join(root, f"v{version}")
+    if versions:
+        return os.path.join(root, f"v{versions[-1]}")
+    if configured is None and os.path.isfile(LEGACY_MODEL_PATH):
+        return LEGACY_MODEL_PATH
+    raise FileNotFoundError(f"No model found in {root}.")
+
+
+def load_artifact(path, mmap_mode=None):
+    """Load a model from an artifact directory or a legacy pickle; returns (model, manifest).
+
+    An artifact holds either a compiled forest (.npy node arrays) or a joblib
+    pickle. Arrays in an artifact are memory-mapped with mmap_mode
+    (MODEL_SETTINGS['mmap_mode'] by default), so processes loading the same
+    version share one page-cached copy. Legacy pickles get a manifest of None.
+    """
+    # joblib takes a noticeable time to import; only pay for it when a model is loaded
+    import joblib
+
+    mmap_mode = mmap_mode or MODEL_SETTINGS["mmap_mode"]
+    if os.path.isfile(path):
+        return joblib.load(path), None
+    with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get('format', FORMAT_VERSION) > FORMAT_VERSION:
+        raise ValueError(f"Model artifact {path} has a newer format ({manifest['format']}) than supported.")
+    if manifest.get('model_format') == 'compiled_forest':
+        from ai.model import CompiledForest
+        return CompiledForest.load(path, manifest, mmap_mode), manifest
+    model = joblib.load(os.path.join(path, manifest.get('model_file', MODEL_FILE)), mmap_mode=mmap_mode)
+    return model, manifest
+
+
+def save_artifact(model, root=None, metadata=None):
+    """Publish model as the next version under root and return its directory.
+
+    The artifact is written to a temporary directory and renamed into place,
+    so readers never see a partial version. The model is stored uncompressed
+    so its arrays can be memory-mapped. metadata is added to the manifest.
+    """
+    import joblib
+    import sklearn
+
+    root = root or MODEL_SETTINGS["model_path"] or DEFAULT_ARTIFACT_ROOT
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    try:
+        feature_names = getattr(model, 'feature_names_in_', None)
+        classes = getattr(model, 'classes_', None)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(),
+            'estimator': type(model).__name__,
+            'sklearn_version': sklearn.__version__,
+            'feature_names': [str(name) for name in feature_names] if feature_names is not None else None,
+            'classes': [str(label) for label in classes] if classes is not None else None,
+        }
+        if hasattr(model, 'save_arrays'):
+            # Plain .npy files, memory-mapped by np.load
+            manifest.update(model.save_arrays(staging))
+        else:
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            manifest['model_file'] = MODEL_FILE
+        manifest.update(metadata or {})
+
+        while True:
+            versions = list_versions(root)
+            version = versions[-1] + 1 if versions else 1
+            manifest['version'] = version
+            with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as manifest_file:
+                json.dump(manifest, manifest_file, indent=1)
+            target = os.path.join(root, f"v{version}")
+            try:
+                # Fails if another trainer published this version first
+                os.rename(staging, target)
+                break
+            except OSError:
+                if not os.path.exists(target):
+                    raise
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    logging.info(f"Published model version {version} to {target}")
+    return target
@@ -0,0 +1,163 @@
+import os
+import json
+import logging
+from types import MappingProxyType
+
+from config.settings import CATEGORY_SETTINGS
+
+OTHERS = 'Others'
+
+# Default category rules. Rules are checked in order, so the first category
+# listing a MIME type or extension wins (application/x-sh is a Script, not an
+# Executable File).
+DEFAULT_CATEGORY_RULES = (
+    ('Documents', {
+        'mime_types': ['application/pdf'],
+        'extensions': ['.pdf'],
+    }),
+    ('Images', {
+        'mime_types': ['image/jpeg', 'image/png'],
+        'extensions': ['.jpg', '.jpeg', '.png'],
+    }),
+    ('Audio', {
+        'mime_types': ['audio/mpeg'],
+        'extensions': ['.mp3'],
+    }),
+    ('Video', {
+        'mime_types': ['video/mp4', 'video/quicktime', 'video/x-matroska', 'video/x-mkv'],
+        'extensions': ['.mp4', '.mov', '.mkv'],
+    }),
+    ('Text', {
+        'mime_types': ['text/plain', 'text/markdown'],
+        'extensions': ['.txt', '.md'],
+    }),
+    ('Spreadsheets', {
+        'mime_types': ['application/vnd.ms-excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'text/csv'],
+        'extensions': ['.xls', '.xlsx', '.csv'],
+    }),
+    ('Presentations', {
+        'mime_types': ['application/vnd.ms-powerpoint', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'],
+        'extensions': ['.ppt', '.pptx'],
+    }),
+    ('Archives', {
+        'mime_types': ['application/zip', 'application/x-rar-compressed', 'application/x-tar', 'application/x-gzip'],
+        'extensions': ['.zip', '.rar', '.tar', '.gz', '.tgz'],
+    }),
+    ('Scripts', {
+        'mime_types': ['application/x-python-code', 'application/javascript', 'application/x-sh', 'application/x-java', 'application/x-c', 'application/x-c++', 'application/x-ruby', 'application/x-php', 'application/x-perl', 'application/x-go', 'application/x-rust', 'application/x-swift', 'application/x-kotlin', 'application/x-typescript', 'application/x-sql'],
+        'extensions': ['.py', '.js', '.sh', '.java', '.c', '.cpp', '.rb', '.php', '.pl', '.go', '.rs', '.swift', '.kt', '.ts', '.sql'],
+    }),
+    ('Word Documents', {
+        'mime_types': ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'],
+        'extensions': ['.doc', '.docx'],
+    }),
+    ('Configuration Files', {
+        'mime_types': ['application/json', 'application/xml', 'application/x-yaml'],
+        'extensions': ['.json', '.xml', '.yaml', '.yml'],
+    }),
+    ('Database Files', {
+        'mime_types': ['application/x-sqlite3', 'application/x-sql'],
+        'extensions': ['.sqlite', '.sqlite3', '.db'],
+    }),
+    ('Font Files', {
+        'mime_types': ['application/x-font-ttf', 'application/x-font-otf'],
+        'extensions': ['.ttf', '.otf'],
+    }),
+    ('Executable Files', {
+        'mime_types': ['application/x-msdownload', 'application/x-sh'],
+        'extensions': ['.exe', '.msi'],
+    }),
+)
+
+
+class CategoryRegistry:
+    """Category rules compiled into frozen MIME type and extension lookup tables."""
+
+    __slots__ = ('categories', 'by_mime_type', 'by_extension', 'extensions', 'names')
+
+    def __init__(self, rules):
+        by_mime_type = {}
+        by_extension = {}
+        extensions = {}
+        for category, rule in rules:
+            extensions.setdefault(category, set())
+            for mime_type in rule.get('mime_types', ()):
+                by_mime_type.setdefault(mime_type.lower(), category)
+            for extension in rule.get('extensions', ()):
+                extension = extension.lower()
+                if not extension.startswith('.'):
+                    extension = '.' + extension
+                by_extension.setdefault(extension, category)
+        for extension, category in by_extension.items():
+            extensions[category].add(extension)
+
+        self.categories = tuple(extensions)
+        self.by_mime_type = MappingProxyType(by_mime_type)
+        self.by_extension = MappingProxyType(by_extension)
+        self.extensions = MappingProxyType({category: frozenset(exts) for category, exts in extensions.items()})
+        # Case-insensitive singular and plural spellings -> category name
+        names = {}
+        for category in self.categories + (OTHERS,):
+            key = category.lower()
+            for spelling in (key, key[:-1] if key.endswith('s') else key + 's'):
+                names.setdefault(spelling, category)
+        self.names = MappingProxyType(names)
+
+    def category_for_mime_type(self, mime_type):
+        """Return the category of a MIME type, or None if it is unknown."""
+        if not mime_type:
+            return None
+        return self.by_mime_type.get(mime_type.lower())
+
+    def category_for_name(self, file_name):
+        """Return the category of a file name's extension, or None if it is unknown."""
+        _, ext = os.path.splitext(file_name)
+        return self.by_extension.get(ext.lower())
+
+    def canonical(self, label):
+        """Return the registered category a label names, such as 'Video' for 'Videos'.
+
+        Labels naming no registered category are returned as they are.
+        """
+        return self.names.get(label.lower(), label)
+
+    def lookup(self, mime_type=None, file_name=None):
+        """Categorize by MIME type first, then by extension, falling back to 'Others'."""
+        category = self.category_for_mime_type(mime_type)
+        if category is None and file_name:
+            category = self.category_for_name(file_name)
+        return category or OTHERS
+
+
+def load_category_rules(rules_file):
+    """Load extra category rules from a JSON file.
+
+    The file maps a category to its MIME types and extensions, e.g.
+    {"Ebooks": {"mime_types": ["application/epub+zip"], "extensions": [".epub"]}}.
+    """
+    with open(rules_file, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError("expected an object mapping categories to rules")
+    for category, rule in data.items():
+        if not isinstance(rule, dict):
+            raise ValueError(f"rule for {category!r} is not an object")
+        for key in ('mime_types', 'extensions'):
+            values = rule.get(key, [])
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                raise ValueError(f"{key} of {category!r} is not a list of strings")
+    return tuple((category, rule) for category, rule in data.items())
+
+
+def build_registry(rules_file=None):
+    """Compile the default rules, preceded by any rules from rules_file."""
+    rules = DEFAULT_CATEGORY_RULES
+    if rules_file:
+        try:
+            rules = load_category_rules(rules_file) + rules
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading category rules from {rules_file}: {e}")
+    return CategoryRegistry(rules)
+
+
+REGISTRY = build_registry(CATEGORY_SETTINGS["rules_file"])
@@ -0,0 +1,164 @@
+import os
+import numpy as np
+from ai.categories import REGISTRY, OTHERS
+
+# Categories behind the one-hot feature columns (feature1, feature2, ...) of labeled_data.csv
+FEATURE_CATEGORIES = ['Images', 'Documents', 'Video', 'Audio', 'Archives']
+LEGACY_COLUMNS = [f"feature{index}" for index in range(1, len(FEATURE_CATEGORIES) + 1)]
+
+# Columns of a labeled CSV holding raw file metadata instead of precomputed features
+METADATA_COLUMNS = ['name', 'size', 'type']
+
+LEGACY = 'legacy'
+FULL = 'full'
+
+# Upper bounds of the size buckets: < 1 KiB, < 64 KiB, < 1 MiB, < 16 MiB, < 256 MiB, < 4 GiB, larger
+SIZE_BUCKET_EDGES = np.array([1 << 10, 64 << 10, 1 << 20, 16 << 20, 256 << 20, 4 << 30], dtype=np.int64)
+
+MIME_MAJORS = ('application', 'audio', 'font', 'image', 'model', 'text', 'video')
+
+DEFAULT_TYPE = 'application/octet-stream'
+
+
+class FeatureExtractor:
+    """Turns file metadata dicts into the feature matrix a category model is trained on.
+
+    The LEGACY schema is the one-hot rule category of labeled_data.csv
+    (feature1..feature5). The FULL schema one-hot encodes the rule category,
+    the extension, the MIME major and minor type and the size bucket, plus
+    log2 of the size. Its vocabulary (the categories, extensions and MIME
+    minor types given columns) comes from the category registry, or from the
+    vocabulary saved with a trained model, so that later changes to the
+    rules do not change the columns the model expects.
+    Header bytes enter through the MIME type, which is sniffed from the
+    content when the name leaves it open. The same extractor builds the
+    training matrix in ModelTrainer and the inference matrix in
+    FileCategorizer, so both always agree on the column order.
+    """
+
+    def __init__(self, schema=FULL, registry=REGISTRY, vocabulary=None):
+        self.schema = schema
+        self.registry = registry
+        self.vocabulary = None
+        if schema == LEGACY:
+            self.feature_names = list(LEGACY_COLUMNS)
+            self._category_index = {category: index for index, category in enumerate(FEATURE_CATEGORIES)}
+            return
+        if schema != FULL:
+            raise ValueError(f"Unknown feature schema: {schema}")
+
+        if vocabulary is None:
+            categories = list(registry.categories) + [OTHERS]
+            extensions = sorted(registry.by_extension)
+            minors = sorted({mime_type.split('/', 1)[1] for mime_type in registry.by_mime_type if '/' in mime_type})
+        else:
+            categories = list(vocabulary['categories'])
+            extensions = list(vocabulary['extensions'])
+            minors = list(vocabulary['mime_minors'])
+        self.vocabulary = {'categories': categories, 'extensions': extensions, 'mime_minors': minors}
+        names = [f"category={category}" for category in categories]
+        self._extension_offset = len(names)
+        names += [f"extension={extension}" for extension in extensions] + ["extension=", "extension=?"]
+        self._major_offset = len(names)
+        names += [f"mime_major={major}" for major in MIME_MAJORS] + ["mime_major=?"]
+        self._minor_offset = len(names)
+        names += [f"mime_minor={minor}" for minor in minors] + ["mime_minor=?"]
+        self._size_offset = len(names)
+        names += [f"size_bucket={index}" for index in range(len(SIZE_BUCKET_EDGES) + 1)]
+        self._log_size_index = len(names)
+        names.append("log2_size")
+
+        self.feature_names = names
+        self._category_index = {category: index for index, category in enumerate(categories)}
+        self._extension_index = {extension: self._extension_offset + index for index, extension in enumerate(extensions)}
+        self._no_extension = self._extension_offset + len(extensions)
+        self._major_index = {major: self._major_offset + index for index, major in enumerate(MIME_MAJORS)}
+        self._minor_index = {minor: self._minor_offset + index for index, minor in enumerate(minors)}
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    @classmethod
+    def for_model(cls, model, registry=REGISTRY, vocabulary=None):
+        """Return the extractor producing the features model was fitted on, or None.
+
+        vocabulary is the FULL-schema vocabulary saved with the model, if any;
+        without it the vocabulary of the registry is tried.
+        """
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None:
+            names = [str(name) for name in names]
+            for schema in (LEGACY, FULL):
+                extractor = cls(schema, registry, vocabulary)
+                if extractor.feature_names == names:
+                    return extractor
+            return None
+        n_features = getattr(model, 'n_features_in_', None)
+        for schema in (LEGACY, FULL):
+            extractor = cls(schema, registry, vocabulary)
+            if extractor.n_features == n_features:
+                return extractor
+        return None
+
+    def transform(self, metadata_list, categories=None):
+        """Build the float32 feature matrix for a list of metadata dicts.
+
+        categories, if given, are the rule-based categories of the files, which
+        callers usually have already.
+        """
+        return self.transform_columns([file_metadata.get('name') or '' for file_metadata in metadata_list],
+                                      [file_metadata.get('size') or 0 for file_metadata in metadata_list],
+                                      [file_metadata.get('type') or DEFAULT_TYPE for file_metadata in metadata_list],
+                                      categories)
+
+    def transform_frame(self, frame):
+        """Build the feature matrix for a DataFrame with name, size and type columns."""
+        return self.transform_columns(frame['name'].fillna('').astype(str).tolist(),
+                                      frame['size'].fillna(0).astype(np.int64).to_numpy(),
+                                      frame['type'].fillna(DEFAULT_TYPE).astype(str).tolist())
+
+    def transform_columns(self, names, sizes, types, categories=None):
+        """Build the feature matrix from parallel sequences of names, sizes and MIME types."""
+        count = len(names)
+        features = np.zeros((count, self.n_features), dtype=np.float32)
+        if count == 0:
+            return features
+        rows = np.arange(count)
+        lookup = self.registry.lookup
+        if categories is None:
+            categories = [lookup(mime_type, name) for mime_type, name in zip(types, names)]
+
+        if self.schema == LEGACY:
+            columns = np.fromiter((self._category_index.get(category, -1) for category in categories),
+                                  dtype=np.intp, count=count)
+            known = columns >= 0
+            features[rows[known], columns[known]] = 1
+            return features
+
+        others = self._category_index[OTHERS]
+        features[rows, [self._category_index.get(category, others) for category in categories]] = 1
+
+        unknown_extension = self._no_extension + 1
+        extension_columns = []
+        for name in names:
+            extension = os.path.splitext(name)[1].lower()
+            extension_columns.append(self._extension_index.get(extension, unknown_extension) if extension
+                                     else self._no_extension)
+        features[rows, extension_columns] = 1
+
+        unknown_major = self._minor_offset - 1
+        unknown_minor = self._size_offset - 1
+        major_columns = []
+        minor_columns = []
+        for mime_type in types:
+            major, _, minor = mime_type.lower().partition('/')
+            major_columns.append(self._major_index.get(major, unknown_major))
+            minor_columns.append(self._minor_index.get(minor, unknown_minor))
+        features[rows, major_columns] = 1
+        features[rows, minor_columns] = 1
+
+        sizes = np.asarray(sizes, dtype=np.int64)
+        features[rows, self._size_offset + np.searchsorted(SIZE_BUCKET_EDGES, sizes, side='right')] = 1
+        features[:, self._log_size_index] = np.log2(np.maximum(sizes, 0) + 1)
+        return features
@@ -0,0 +1,179 @@
+import os
+import csv
+import json
+import logging
+from collections import namedtuple
+
+from config.settings import FEEDBACK_SETTINGS, JOURNAL_SETTINGS
+from ai.model import IncrementalCategorizer
+
+# A labeled file mined from the journal; weight is negative when an earlier label is taken back
+FeedbackEvent = namedtuple('FeedbackEvent', ['time', 'metadata', 'category', 'weight', 'corrected', 'key'])
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def journal_segments(path=None):
+    """Return the existing segments of the operations log, oldest first."""
+    path = path or JOURNAL_SETTINGS["path"]
+    rotated = [f"{path}.{index}" for index in range(JOURNAL_SETTINGS["backup_count"], 0, -1)]
+    return [segment for segment in rotated + [path] if os.path.isfile(segment)]
+
+
+def read_journal_positions(path=None, since=None):
+    """Yield (entry, position, new) for the entries of the operations log and its rotated segments.
+
+    position is [inode, offset] of the end of the entry's line in its
+    segment; rotation renames segments, so an inode keeps naming the same
+    data. new tells whether the entry comes after the position since, which
+    is every entry when since is None or its segment has been rotated away.
+    A last line still being written is not yielded.
+    """
+    segments = journal_segments(path)
+    inodes = [os.stat(segment).st_ino for segment in segments]
+    start = None
+    if since is not None:
+        for index, segment in enumerate(segments):
+            if inodes[index] == since[0] and os.path.getsize(segment) >= since[1]:
+                start = index
+    for index, segment in enumerate(segments):
+        offset = 0
+        with open(segment, 'rb') as log_file:
+            for line in log_file:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                new = start is None or index > start or (index == start and offset > since[1])
+                try:
+                    entry = json.loads(line.decode('utf-8', errors='replace'))
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                yield entry, [inodes[index], offset], new
+
+
+def read_journal(path=None):
+    """Yield the entries of the operations log and its rotated segments in order."""
+    for entry, _, _ in read_journal_positions(path):
+        yield entry
+
+
+def mine_feedback(entries, confirmation_weight=None):
+    """Turn organize moves and later moves of the same files into labeled files.
+
+    An organize move (a 'move' entry recording its predicted category) labels
+    the file with that category at confirmation_weight. When the file is
+    later moved from its category folder into a sibling folder of the same
+    target directory, that label is taken back and the file is labeled with
+    the new folder's name at full weight (a correction). Moves anywhere else
+    end the tracking of the file and leave its last label in place.
+    """
+    confirmation_weight = confirmation_weight if confirmation_weight is not None \
+        else FEEDBACK_SETTINGS["confirmation_weight"]
+    # normalized current path -> (metadata, category, weight, normalized target directory, key)
+    tracked = {}
+    for entry in entries:
+        if entry.get('operation') != 'move':
+            continue
+        details = entry.get('details') or {}
+        source, target = details.get('source'), details.get('target')
+        if not source or not target:
+            continue
+        when = entry.get('time', 0)
+        source_key, target_key = _normalize(source), _normalize(target)
+        previous = tracked.pop(source_key, None)
+
+        if 'category' in details:
+            metadata = {'name': os.path.basename(source), 'size': details.get('size', 0), 'type': details.get('type')}
+            category = details['category']
+            tracked[target_key] = (metadata, category, confirmation_weight,
+                                   os.path.dirname(os.path.dirname(target_key)), target_key)
+            yield FeedbackEvent(when, metadata, category, confirmation_weight, False, target_key)
+            continue
+        if previous is None:
+            continue
+
+        metadata, category, weight, target_directory, key = previous
+        folder = os.path.dirname(target_key)
+        if folder == os.path.dirname(source_key):
+            # Renamed in place
+            tracked[target_key] = previous
+        elif os.path.dirname(folder) == target_directory:
+            corrected = os.path.basename(os.path.dirname(target))
+            yield FeedbackEvent(when, metadata, category, -weight, False, key)
+            yield FeedbackEvent(when, metadata, corrected, 1.0, True, key)
+            tracked[target_key] = (metadata, corrected, 1.0, target_directory, key)
+
+
+def correction_rows(events):
+    """Return labeled rows (name, size, type, category) of the corrected files, latest label per file."""
+    rows = {}
+    for event in events:
+        if event.corrected:
+            rows[event.key] = dict(event.metadata, category=event.category)
+    return list(rows.values())
+
+
+def export_corrections(rows, csv_path):
+    """Append correction rows to a labeled CSV with name, size, type and category columns."""
+    fieldnames = ['name', 'size', 'type', 'category']
+    write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    if not write_header:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as csv_file:
+            header = next(csv.reader(csv_file), [])
+        if header != fieldnames:
+            raise ValueError(f"{csv_path} has columns {header}, expected {fieldnames}.")
+    with open(csv_path, 'a', encoding='utf-8', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+    logging.info(f"Appended {len(rows)} corrected files to {csv_path}")
+
+
+def learn_from_journal(journal_path=None, model_path=None, export_csv=None, rebuild=False):
+    """Update the feedback model with the journal entries written since it last learned.
+
+    The IncrementalCategorizer at model_path (FEEDBACK_SETTINGS['model_path'])
+    is loaded, updated with partial_fit and saved; with rebuild it is learned
+    again from the whole journal. The model keeps the journal position it has
+    learned up to, so each entry is learned once whatever its timestamp.
+    With export_csv the corrected files are also appended to that labeled CSV
+    for the next full training run.
+    Returns {'files': labeled files learned, 'corrections': corrections among them}.
+    """
+    model_path = model_path or FEEDBACK_SETTINGS["model_path"]
+    if os.path.isfile(model_path) and not rebuild:
+        model = IncrementalCategorizer.load(model_path)
+    else:
+        model = IncrementalCategorizer()
+
+    # The whole journal is mined so that corrections find their organize
+    # moves, but only events from entries after the checkpoint are learned
+    current = {'position': model.learned_position, 'new': False}
+
+    def entries():
+        for entry, position, new in read_journal_positions(journal_path, since=model.learned_position):
+            if model.learned_position is None and model.learned_until is not None:
+                # Checkpoint written by an older version: the time of the newest entry learned
+                new = entry.get('time', 0) > model.learned_until
+            current['position'], current['new'] = position, new
+            yield entry
+        current['new'] = False
+
+    events = [event for event in mine_feedback(entries()) if current['new']]
+    if events:
+        model.partial_fit([event.metadata for event in events], [event.category for event in events],
+                          sample_weight=[event.weight for event in events])
+    if current['position'] != model.learned_position:
+        model.learned_position = current['position']
+        model.save(model_path)
+    corrections = correction_rows(events)
+    if export_csv and corrections:
+        export_corrections(corrections, export_csv)
+
+    files = sum(1 for event in events if event.weight > 0)
+    logging.info(f"Learned {files} labeled files ({len(corrections)} corrections) into {model_path}")
+    return {'files': files, 'corrections': len(corrections)}
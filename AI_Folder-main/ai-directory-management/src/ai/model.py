@@ -1,54 +1,426 @@
-import joblib
 import os
+import json
+import logging
+import warnings
+from threading import Lock
+import numpy as np
+from ai.categories import REGISTRY
+from ai.features import FeatureExtractor, SIZE_BUCKET_EDGES, DEFAULT_TYPE
+from ai.artifact import resolve_model_path, load_artifact
+from config.settings import MODEL_SETTINGS, FEEDBACK_SETTINGS
+
+# Node arrays of a CompiledForest, saved as one .npy file each
+_FOREST_ARRAYS = ('roots', 'feature', 'threshold', 'children', 'missing_left', 'leaf_row', 'leaf_proba')
+
+# Upper bound on samples x trees traversed at once
+_TRAVERSAL_CELLS = 1 << 17
+
+# scikit-learn classifiers whose predict_proba CompiledForest reproduces
+_COMPILABLE_MODELS = ('DecisionTreeClassifier', 'ExtraTreeClassifier', 'RandomForestClassifier', 'ExtraTreesClassifier')
+
+def _round_down_to_float32(thresholds):
+    """Return the largest float32 values not above the float64 thresholds.
+
+    scikit-learn compares float32 features with float64 thresholds; for a
+    float32 x, x <= t holds exactly when x <= the rounded-down t, so the
+    comparison can be done in float32 with the same outcome.
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+class CompiledForest:
+    """A fitted decision tree or random forest classifier flattened into NumPy arrays.
+
+    The nodes of all trees live in shared contiguous arrays (split feature,
+    threshold, children, and a row into leaf_proba for leaves); tree t starts at
+    roots[t] and node i's right and left children are children[2i] and
+    children[2i + 1]. Leaves are their own children, so a batch walks every
+    tree at once for max_depth vectorized steps, tree-major so each tree's
+    nodes stay in cache. Class probabilities are accumulated
+    tree by tree in estimator order exactly like scikit-learn does with
+    n_jobs=1, so predictions are bit-identical to the original model.
+    """
+
+    def __init__(self, arrays, classes, n_features, feature_names=None, max_depth=0, average=True):
+        for name in _FOREST_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.max_depth = max_depth
+        # A forest averages its trees; a single tree's probabilities are used as they are
+        self.average = average
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted DecisionTreeClassifier or RandomForestClassifier."""
+        estimators = getattr(model, 'estimators_', None)
+        trees = [estimator.tree_ for estimator in estimators] if estimators is not None else [model.tree_]
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output classifiers can be compiled.")
+        n_classes = len(model.classes_)
+
+        roots, features, thresholds, children, missing_lefts, leaf_rows, leaf_probas = [], [], [], [], [], [], []
+        offset = leaf_offset = 0
+        for tree in trees:
+            nodes = tree.__getstate__()['nodes']
+            count = len(nodes)
+            is_leaf = nodes['left_child'] == -1
+            node_ids = np.arange(offset, offset + count)
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, nodes['feature']))
+            thresholds.append(nodes['threshold'])
+            children.append(np.stack([np.where(is_leaf, node_ids, nodes['right_child'] + offset),
+                                      np.where(is_leaf, node_ids, nodes['left_child'] + offset)], axis=1).ravel())
+            missing_lefts.append(nodes['missing_go_to_left'] if 'missing_go_to_left' in nodes.dtype.names
+                                 else np.zeros(count, dtype=np.uint8))
+            leaf_row = np.full(count, -1, dtype=np.int64)
+            leaf_row[is_leaf] = np.arange(leaf_offset, leaf_offset + is_leaf.sum())
+            leaf_rows.append(leaf_row)
+            # tree_.predict_proba returns these values as they are
+            leaf_probas.append(tree.value[is_leaf, 0, :n_classes])
+            offset += count
+            leaf_offset += int(is_leaf.sum())
+
+        index_type = np.int32 if 2 * offset < 2 ** 31 else np.int64
+        arrays = {
+            'roots': np.asarray(roots, dtype=index_type),
+            'feature': np.concatenate(features).astype(np.int32),
+            'threshold': _round_down_to_float32(np.concatenate(thresholds)),
+            'children': np.concatenate(children).astype(index_type),
+            'missing_left': np.concatenate(missing_lefts).astype(bool),
+            'leaf_row': np.concatenate(leaf_rows).astype(index_type),
+            'leaf_proba': np.ascontiguousarray(np.concatenate(leaf_probas), dtype=np.float64),
+        }
+        return cls(arrays, model.classes_, model.n_features_in_, getattr(model, 'feature_names_in_', None),
+                   max(tree.max_depth for tree in trees), average=estimators is not None)
+
+    def save_arrays(self, directory):
+        """Write the node arrays as .npy files; returns the manifest entries needed to load them."""
+        for name in _FOREST_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        feature_names = getattr(self, 'feature_names_in_', None)
+        return {
+            'model_format': 'compiled_forest',
+            'n_trees': len(self.roots),
+            'n_nodes': len(self.feature),
+            'max_depth': self.max_depth,
+            'average': self.average,
+            'n_features': self.n_features_in_,
+            'feature_names': [str(name) for name in feature_names] if feature_names is not None else None,
+            'classes': [str(label) for label in self.classes_],
+        }
+
+    @classmethod
+    def load(cls, directory, manifest, mmap_mode=None):
+        """Load arrays written by save_arrays, memory-mapped with mmap_mode."""
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in _FOREST_ARRAYS}
+        return cls(arrays, manifest['classes'], manifest['n_features'], manifest.get('feature_names'),
+                   manifest['max_depth'], manifest['average'])
+
+    def _leaf_rows(self, X):
+        """Return the leaf_proba row reached in every tree, shape (n_trees, n_samples)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, expected (n_samples, {self.n_features_in_}).")
+        n_trees = len(self.roots)
+        rows = np.empty((n_trees, len(X)), dtype=self.leaf_row.dtype)
+        step = max(1, _TRAVERSAL_CELLS // n_trees)
+        for start in range(0, len(X), step):
+            chunk = X[start:start + step]
+            count = len(chunk)
+            index_type = np.int32 if self.n_features_in_ * count < 2 ** 31 else np.intp
+            # Feature-major, so that one tree's samples read neighbouring values
+            values_by_feature = np.ascontiguousarray(chunk.T).ravel()
+            feature_offset = self.feature.astype(index_type) * count
+            samples = np.tile(np.arange(count, dtype=index_type), n_trees)
+            nodes = np.repeat(self.roots, count)
+            has_missing = np.isnan(values_by_feature).any()
+            for _ in range(self.max_depth):
+                values = values_by_feature[feature_offset[nodes] + samples]
+                go_left = values <= self.threshold[nodes]
+                if has_missing:
+                    go_left = np.where(np.isnan(values), self.missing_left[nodes], go_left)
+                nodes = self.children[(nodes << 1) | go_left]
+            rows[:, start:start + count] = self.leaf_row[nodes].reshape(n_trees, count)
+        return rows
+
+    def apply(self, X):
+        """Return the leaf_proba row reached in every tree, shape (n_samples, n_trees)."""
+        return self._leaf_rows(X).T
+
+    def predict_proba(self, X):
+        rows = self._leaf_rows(X)
+        proba = np.zeros((rows.shape[1], len(self.classes_)), dtype=np.float64)
+        # Summed tree by tree in order; a pairwise sum would differ in the last bits
+        for tree_rows in rows:
+            proba += self.leaf_proba[tree_rows]
+        if self.average:
+            proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+# Feature groups of an IncrementalCategorizer; each file has one token per group
+_TOKEN_GROUPS = ('category', 'extension', 'mime_major', 'mime_type', 'size_bucket')
+
+def _file_tokens(file_metadata):
+    """Return the 'group=value' tokens of a file, one per _TOKEN_GROUPS entry."""
+    name = file_metadata.get('name') or ''
+    mime_type = (file_metadata.get('type') or DEFAULT_TYPE).lower()
+    size = max(int(file_metadata.get('size') or 0), 0)
+    return (
+        f"category={REGISTRY.lookup(mime_type, name)}",
+        f"extension={os.path.splitext(name)[1].lower()}",
+        f"mime_major={mime_type.split('/', 1)[0]}",
+        f"mime_type={mime_type}",
+        f"size_bucket={int(np.searchsorted(SIZE_BUCKET_EDGES, size, side='right'))}",
+    )
+
+class IncrementalCategorizer:
+    """Categorical naive Bayes model updated one batch of labeled files at a time.
+
+    Unlike the forest, partial_fit adds to per-category counts, so it learns
+    from a few corrections without retraining and takes new categories and
+    never seen extensions or MIME types as they come. Files are described by
+    open-vocabulary tokens (rule category, extension, MIME major and full type,
+    size bucket) rather than the fixed FeatureExtractor columns for that
+    reason. A negative sample_weight takes back an earlier partial_fit.
+    """
+
+    def __init__(self, alpha=None):
+        self.alpha = alpha if alpha is not None else FEEDBACK_SETTINGS["alpha"]
+        # category -> total sample weight, and category -> {token: weight}
+        self.class_weights = {}
+        self.token_weights = {}
+        # [inode, offset] in operations.log up to which entries were learned
+        self.learned_position = None
+        # Time of the newest entry learned, kept by older versions instead
+        self.learned_until = None
+        self._tables = None
+
+    @property
+    def classes_(self):
+        return sorted(category for category, weight in self.class_weights.items() if weight > 1e-9)
+
+    def partial_fit(self, metadata_list, labels, sample_weight=None):
+        """Add labeled files (metadata dicts with name, size and type) to the counts."""
+        if sample_weight is None:
+            sample_weight = [1.0] * len(labels)
+        for file_metadata, label, weight in zip(metadata_list, labels, sample_weight):
+            label = str(label)
+            self.class_weights[label] = self.class_weights.get(label, 0.0) + weight
+            tokens = self.token_weights.setdefault(label, {})
+            for token in _file_tokens(file_metadata):
+                tokens[token] = tokens.get(token, 0.0) + weight
+        self._tables = None
+        return self
+
+    def _build_tables(self):
+        """Precompute log P(category) and log P(token | category) over the current classes."""
+        classes = self.classes_
+        class_weights = np.array([self.class_weights[category] for category in classes])
+        vocabulary = {group: set() for group in _TOKEN_GROUPS}
+        for category in classes:
+            for token, weight in self.token_weights[category].items():
+                if weight > 1e-9:
+                    vocabulary[token.split('=', 1)[0]].add(token)
+
+        token_log_proba = {}
+        unseen_log_proba = {}
+        for group, tokens in vocabulary.items():
+            # One extra value stands for every token not seen yet
+            denominator = np.log(class_weights + self.alpha * (len(tokens) + 1))
+            unseen_log_proba[group] = np.log(self.alpha) - denominator
+            for token in tokens:
+                counts = np.array([max(self.token_weights[category].get(token, 0.0), 0.0) for category in classes])
+                token_log_proba[token] = np.log(counts + self.alpha) - denominator
+        log_prior = np.log(class_weights / class_weights.sum())
+        self._tables = (classes, log_prior, token_log_proba, unseen_log_proba)
+        return self._tables
+
+    def predict_proba(self, metadata_list):
+        """Return (classes, probabilities of shape (n_files, n_classes))."""
+        classes, log_prior, token_log_proba, unseen_log_proba = self._tables or self._build_tables()
+        log_proba = np.empty((len(metadata_list), len(classes)))
+        for index, file_metadata in enumerate(metadata_list):
+            row = log_prior.copy()
+            for group, token in zip(_TOKEN_GROUPS, _file_tokens(file_metadata)):
+                row += token_log_proba.get(token, unseen_log_proba[group])
+            log_proba[index] = row
+        if not classes:
+            return classes, log_proba
+        log_proba -= log_proba.max(axis=1, keepdims=True)
+        proba = np.exp(log_proba)
+        return classes, proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, metadata_list):
+        classes, proba = self.predict_proba(metadata_list)
+        return [classes[index] for index in np.argmax(proba, axis=1)]
+
+    def override(self, metadata_list, categories, min_confidence=None, min_support=None):
+        """Replace predicted categories where this model is confident of another one.
+
+        A category is replaced when the posterior of this model's choice is at
+        least min_confidence and it has learned at least min_support (weighted)
+        files of that category with the same extension.
+        """
+        min_confidence = min_confidence if min_confidence is not None else FEEDBACK_SETTINGS["min_confidence"]
+        min_support = min_support if min_support is not None else FEEDBACK_SETTINGS["min_support"]
+        classes, proba = self.predict_proba(metadata_list)
+        if not classes:
+            return list(categories)
+        best = np.argmax(proba, axis=1)
+        categories = list(categories)
+        for index, file_metadata in enumerate(metadata_list):
+            category = classes[best[index]]
+            if category == categories[index] or proba[index, best[index]] < min_confidence:
+                continue
+            extension = _file_tokens(file_metadata)[1]
+            if self.token_weights[category].get(extension, 0.0) >= min_support:
+                categories[index] = category
+        return categories
+
+    def save(self, path):
+        """Write the counts as JSON, replacing path atomically."""
+        staging = f"{path}.tmp"
+        with open(staging, 'w', encoding='utf-8') as model_file:
+            json.dump({
+                'format': 1,
+                'alpha': self.alpha,
+                'learned_position': self.learned_position,
+                'learned_until': self.learned_until,
+                'classes': {category: {'weight': weight, 'tokens': self.token_weights.get(category, {})}
+                            for category, weight in self.class_weights.items()},
+            }, model_file)
+        os.replace(staging, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as model_file:
+            data = json.load(model_file)
+        model = cls(alpha=data.get('alpha'))
+        model.learned_position = data.get('learned_position')
+        model.learned_until = data.get('learned_until')
+        for category, counts in data['classes'].items():
+            model.class_weights[category] = counts['weight']
+            model.token_weights[category] = counts['tokens']
+        return model
 
 class FileCategorizer:
-    def __init__(self, model_path='d:/LANGUAGE/workspace/ai-directory-management/src/ai/model.pkl'):
+    """Category model loaded lazily on the first prediction.
+
+    model_path is an artifact directory, a root of versioned artifacts or a
+    legacy .pkl file (see ai.artifact.resolve_model_path); by default it comes
+    from MODEL_SETTINGS. If an IncrementalCategorizer has been learned from
+    user corrections (FEEDBACK_SETTINGS['model_path']), it overrides the
+    model's categories where it is confident.
+    """
+
+    def __init__(self, model_path=None, feedback_path=None):
         self.model_path = model_path
+        self.feedback_path = feedback_path
         self.model = None
+        self.manifest = None
+        self.feedback = None
+        self._load_lock = Lock()
+        self._schema_warning_logged = False
+        # Set once no trained model was found, so the rules are used without looking again
+        self._model_missing = False
+        # Extractor matching the feature schema of the loaded model, and that model
+        self._extractor = None
+        self._extractor_model = None
 
     def load_model(self):
-        """Load the trained model from a file."""
-        if os.path.exists(self.model_path):
-            self.model = joblib.load(self.model_path)
-        else:
-            raise FileNotFoundError(f"Model file {self.model_path} does not exist.")
+        """Load the trained model now instead of on the first prediction."""
+        with self._load_lock:
+            if self.model is None:
+                path = resolve_model_path(self.model_path)
+                model, self.manifest = load_artifact(path)
+                # A model matching no feature schema is never consulted, so it is not worth compiling
+                if MODEL_SETTINGS["compile"] and type(model).__name__ in _COMPILABLE_MODELS and \
+                        FeatureExtractor.for_model(model, vocabulary=self._vocabulary()) is not None:
+                    model = CompiledForest.from_sklearn(model)
+                self.feedback = self._load_feedback()
+                self.model = model
+                self.model_path = path
+                logging.info(f"Loaded model {path}")
+        return self.model
+
+    def _load_feedback(self):
+        """Load the model learned from corrections, or None if there is none."""
+        path = self.feedback_path or FEEDBACK_SETTINGS["model_path"]
+        if not FEEDBACK_SETTINGS["enabled"] or not os.path.isfile(path):
+            return None
+        try:
+            feedback = IncrementalCategorizer.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Error loading feedback model {path}: {e}")
+            return None
+        logging.info(f"Loaded feedback model {path}")
+        return feedback
 
     def predict_category(self, file_metadata):
         """Predict the category of a file based on its metadata."""
-        if self.model is None:
-            raise ValueError("Model is not loaded.")
-        
-        # Mock prediction process for demonstration purposes
-        if file_metadata['type'] == 'application/pdf':
-            return 'Documents'
-        elif file_metadata['type'] in ['image/jpeg', 'image/png']:
-            return 'Images'
-        elif file_metadata['type'] == 'audio/mpeg':
-            return 'Audio'
-        elif file_metadata['type'] in ['video/mp4', 'video/quicktime', 'video/x-matroska', 'video/x-mkv']:
-            return 'Video'
-        elif file_metadata['type'] in ['text/plain', 'text/markdown']:
-            return 'Text'
-        elif file_metadata['type'] in ['application/vnd.ms-excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'text/csv']:
-            return 'Spreadsheets'
-        elif file_metadata['type'] in ['application/vnd.ms-powerpoint', 'application/vnd.openxmlformats-officedocument.presentationml.presentation']:
-            return 'Presentations'
-        elif file_metadata['type'] in ['application/zip', 'application/x-rar-compressed', 'application/x-tar', 'application/x-gzip']:
-            return 'Archives'
-        elif file_metadata['type'] in ['application/x-python-code', 'application/javascript', 'application/x-sh', 'application/x-java', 'application/x-c', 'application/x-c++', 'application/x-ruby', 'application/x-php', 'application/x-perl', 'application/x-go', 'application/x-rust', 'application/x-swift', 'application/x-kotlin', 'application/x-typescript', 'application/x-sql']:
-            return 'Scripts'
-        elif file_metadata['type'] in ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            return 'Word Documents'
-        elif file_metadata['type'] in ['application/json', 'application/xml', 'application/x-yaml']:
-            return 'Configuration Files'
-        elif file_metadata['type'] in ['application/x-sqlite3', 'application/x-sql']:
-            return 'Database Files'
-        elif file_metadata['type'] in ['application/x-font-ttf', 'application/x-font-otf']:
-            return 'Font Files'
-        elif file_metadata['type'] in ['application/x-msdownload', 'application/x-sh']:
-            return 'Executable Files'
-        else:
-            return 'Others'
+        return self.predict_categories([file_metadata])[0]
+
+    def predict_categories(self, metadata_list):
+        """Predict the categories of a batch of files with a single model call.
+
+        Without a trained model on disk the rule-based categories are returned.
+        """
+        if self.model is None and not self._model_missing:
+            try:
+                self.load_model()
+            except FileNotFoundError as e:
+                logging.warning(f"No trained model available ({e}); using rule-based categories. "
+                                "Train one with ai/train.py.")
+                self._model_missing = True
+
+        categories = [self._rule_based_category(file_metadata) for file_metadata in metadata_list]
+        if not categories or self.model is None:
+            return categories
+
+        extractor = self._feature_extractor()
+        if extractor is not None:
+            features = extractor.transform(metadata_list, categories)
+            has_signal = features.any(axis=1)
+            if has_signal.any():
+                with warnings.catch_warnings():
+                    # The model was fitted on a DataFrame; plain arrays are fine for prediction
+                    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+                    predictions = self.model.predict(features[has_signal])
+                for index, category in zip(np.flatnonzero(has_signal), predictions):
+                    categories[index] = REGISTRY.canonical(str(category))
+        if self.feedback is not None:
+            categories = self.feedback.override(metadata_list, categories)
+        return categories
+
+    def _feature_extractor(self):
+        """Return the extractor for the loaded model's feature schema, or None if it matches none."""
+        if self._extractor_model is self.model:
+            return self._extractor
+        self._extractor = FeatureExtractor.for_model(self.model, vocabulary=self._vocabulary())
+        self._extractor_model = self.model
+        if self._extractor is None and not self._schema_warning_logged:
+            n_features = getattr(self.model, 'n_features_in_', None)
+            logging.warning(f"Model {self.model_path} expects {n_features} features matching no known feature schema; "
+                            "using rule-based categories. Retrain it with ai/train.py.")
+            self._schema_warning_logged = True
+        return self._extractor
+
+    def _vocabulary(self):
+        """Return the feature vocabulary saved in the loaded artifact's manifest, if any."""
+        return (self.manifest or {}).get('feature_vocabulary')
+
+    @staticmethod
+    def _rule_based_category(file_metadata):
+        """Map a file's MIME type (or extension) to a category without the model."""
+        return REGISTRY.lookup(file_metadata['type'], file_metadata.get('name'))
 
 class AIModel:
     def __init__(self):
@@ -60,36 +432,11 @@ class AIModel:
 
     def predict_category(self, file_metadata):
         """Predict the category of a file based on its metadata."""
-        if file_metadata['type'] == 'application/pdf':
-            return 'Documents'
-        elif file_metadata['type'] in ['image/jpeg', 'image/png']:
-            return 'Images'
-        elif file_metadata['type'] == 'audio/mpeg':
-            return 'Audio'
-        elif file_metadata['type'] == 'text/plain':
-            return 'Text'
-        elif file_metadata['type'] in ['video/mp4', 'video/quicktime', 'video/x-matroska', 'video/x-mkv']:
-            return 'Video'
-        elif file_metadata['type'] in ['application/vnd.ms-excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'text/csv']:
-            return 'Spreadsheets'
-        elif file_metadata['type'] in ['application/vnd.ms-powerpoint', 'application/vnd.openxmlformats-officedocument.presentationml.presentation']:
-            return 'Presentations'
-        elif file_metadata['type'] in ['application/zip', 'application/x-rar-compressed', 'application/x-tar', 'application/x-gzip']:
-            return 'Archives'
-        elif file_metadata['type'] in ['application/x-python-code', 'application/javascript', 'application/x-sh', 'application/x-java', 'application/x-c', 'application/x-c++', 'application/x-ruby', 'application/x-php', 'application/x-perl', 'application/x-go', 'application/x-rust', 'application/x-swift', 'application/x-kotlin', 'application/x-typescript', 'application/x-sql']:
-            return 'Scripts'
-        elif file_metadata['type'] in ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            return 'Word Documents'
-        elif file_metadata['type'] in ['application/json', 'application/xml', 'application/x-yaml']:
-            return 'Configuration Files'
-        elif file_metadata['type'] in ['application/x-sqlite3', 'application/x-sql']:
-            return 'Database Files'
-        elif file_metadata['type'] in ['application/x-font-ttf', 'application/x-font-otf']:
-            return 'Font Files'
-        elif file_metadata['type'] in ['application/x-msdownload', 'application/x-sh']:
-            return 'Executable Files'
-        else:
-            return 'Others'
+        return REGISTRY.lookup(file_metadata['type'], file_metadata.get('name'))
+
+    def predict_categories(self, metadata_list):
+        """Predict the categories of a batch of files."""
+        return [self.predict_category(file_metadata) for file_metadata in metadata_list]
 
     def evaluate(self, test_data):
         return 0.95  
\ No newline at end of file
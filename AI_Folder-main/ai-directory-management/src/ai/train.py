@@ -1,90 +1,356 @@
 import os
+import sys
+import time
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 import joblib
 import logging
 from collections import Counter
+from contextlib import contextmanager
+
+# Allow running as a script from any directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import MODEL_SETTINGS, TRAIN_SETTINGS
+from ai.features import FeatureExtractor, METADATA_COLUMNS, FULL
+from ai.categories import REGISTRY
+from ai.artifact import save_artifact, DEFAULT_ARTIFACT_ROOT, AI_DIRECTORY
+from ai.model import CompiledForest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _reset_peak_memory():
+    """Reset the process's peak resident set size where the OS allows it (Linux)."""
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _file_digest(path, limit=None, chunk_size=1024 * 1024):
+    """Return the BLAKE2b hex digest of a file, or of its first limit bytes."""
+    digest = hashlib.blake2b(digest_size=20)
+    remaining = limit
+    with open(path, 'rb') as data_file:
+        while remaining is None or remaining > 0:
+            chunk = data_file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def data_fingerprint(path):
+    """Return the size, mtime and content digest identifying a version of the labeled data."""
+    data_stat = os.stat(path)
+    return {'size': data_stat.st_size, 'mtime_ns': data_stat.st_mtime_ns, 'digest': _file_digest(path)}
+
+
+def held_out_rows(first_row, count):
+    """Return which of count CSV rows, numbered from first_row, are held out for evaluation.
+
+    Rows are picked by a hash of their row number, so a row keeps its side of
+    the split when rows are appended and grown forests are never evaluated on
+    rows earlier trees were trained on.
+    """
+    rows = pd.Index(np.arange(first_row, first_row + count, dtype=np.int64))
+    buckets = pd.util.hash_pandas_object(rows, index=False).to_numpy() % 1000
+    return buckets < round(TRAIN_SETTINGS["test_fraction"] * 1000)
+
+
+def _peak_memory_mb():
+    """Return the peak resident set size in MiB, or None if unknown."""
+    try:
+        with open(_PROC_STATUS) as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 
 class ModelTrainer:
-    def __init__(self, data_path, model_path):
+    def __init__(self, data_path, model_path, n_jobs=None, chunk_size=None, warm_start=True):
         self.data_path = data_path
         self.model_path = model_path
-        self.model = RandomForestClassifier(n_estimators=1000, max_depth=10, random_state=42)
+        self.n_jobs = n_jobs or TRAIN_SETTINGS["n_jobs"]
+        self.chunk_size = chunk_size or TRAIN_SETTINGS["chunk_size"]
+        self.warm_start = warm_start
+        self.model = RandomForestClassifier(n_estimators=TRAIN_SETTINGS["n_estimators"],
+                                            max_depth=TRAIN_SETTINGS["max_depth"], random_state=42,
+                                            n_jobs=self.n_jobs)
+        # Rows the current model was trained on, times it was grown, and (phase, seconds, peak MiB) per phase
+        self.rows_trained = 0
+        self.growths = 0
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Log the wall time and peak memory of a training phase."""
+        per_phase = _reset_peak_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = _peak_memory_mb()
+            self.phases.append((name, elapsed, peak))
+            scope = "phase" if per_phase else "process"
+            memory = f", {scope} peak memory {peak:.0f} MiB" if peak is not None else ""
+            logging.info(f"{name}: {elapsed:.2f}s{memory}")
+
+    @property
+    def state_path(self):
+        """File keeping the scikit-learn forest between runs so it can be grown with warm_start.
+
+        It is a compressed pickle of the whole forest, kept outside the artifact
+        root so that published versions stay compact.
+        """
+        if TRAIN_SETTINGS["state_path"]:
+            return TRAIN_SETTINGS["state_path"]
+        if self.model_path.endswith('.pkl'):
+            return os.path.splitext(self.model_path)[0] + '.state.joblib'
+        return os.path.normpath(self.model_path) + '.trainer_state.joblib'
 
     def load_data(self):
-        """Load labeled data from CSV."""
+        """Load labeled data from CSV.
+
+        The file is read in chunks of chunk_size rows; raw file metadata is
+        turned into features chunk by chunk, so only the float32 feature matrix
+        of the whole set is held in memory. The held_out column marks the rows
+        kept for evaluation (see held_out_rows).
+        """
         if not os.path.exists(self.data_path):
             logging.error(f"Data file {self.data_path} does not exist.")
             return None
-        data = pd.read_csv(self.data_path)
+        chunks = []
+        rows = 0
+        for chunk in pd.read_csv(self.data_path, chunksize=self.chunk_size):
+            features = self.build_features(chunk).astype(np.float32)
+            features['category'] = chunk['category'].astype(str).map(REGISTRY.canonical)
+            features['held_out'] = held_out_rows(rows, len(chunk))
+            rows += len(chunk)
+            chunks.append(features)
+        data = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
         logging.info(f"Loaded dataset with shape: {data.shape}")
         return data
 
-    def preprocess_data(self, data):
-        """Preprocess features and labels, handle class balancing."""
-        X = data.drop('category', axis=1)
-        y = data['category']
-
-        # Count the number of classes
-        class_counts = y.value_counts()
-        num_classes = len(class_counts)
+    def build_features(self, data):
+        """Return the feature DataFrame for the labeled rows.
 
-        # Calculate minimum required test size to have at least 1 sample per class
-        min_test_size = num_classes / len(y) + 0.05  # + a little buffer
+        Rows with raw file metadata (name, size and type columns) go through
+        the same FeatureExtractor as FileCategorizer; precomputed feature
+        columns (feature1, feature2, ...) are used as they are.
+        """
+        X = data.drop('category', axis=1)
+        if set(METADATA_COLUMNS).issubset(X.columns):
+            extractor = FeatureExtractor(FULL)
+            X = pd.DataFrame(extractor.transform_frame(X), columns=extractor.feature_names, index=X.index)
+        return X
 
-        test_size = max(0.3, min_test_size)  # ensure test size isn't too small
+    def preprocess_data(self, data):
+        """Split features and labels into the training rows and the fixed held-out rows."""
+        held_out = data['held_out'].to_numpy(dtype=bool)
+        X = self.build_features(data.drop('held_out', axis=1))
+        y = data['category']
 
-        try:
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=test_size, random_state=42, stratify=y
-            )
-            logging.info("Stratified train/test split successful.")
-        except ValueError as e:
-            logging.warning(f"Stratified split failed: {e}")
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=test_size, random_state=42
-            )
-            logging.info("Used non-stratified train/test split as fallback.")
+        X_train, X_test, y_train, y_test = X[~held_out], X[held_out], y[~held_out], y[held_out]
+        logging.info(f"Held out {len(X_test)} of {len(X)} rows for evaluation.")
 
         logging.info(f"Train label distribution: {Counter(y_train)}")
         logging.info(f"Test label distribution: {Counter(y_test)}")
 
         return X_train, X_test, y_train, y_test
 
-    def train_model(self, X_train, y_train):
-        """Train the model using Random Forest."""
+    def load_state(self, X, y):
+        """Resume from the forest saved by the last run if it can be grown on this data.
+
+        The labeled data is compared with the fingerprint saved with the
+        forest. Returns 'grow' when the previous forest was loaded and rows
+        were appended to the data, 'unchanged' when the data is the same, and
+        None when training has to start from scratch (no state, the data was
+        edited rather than appended to, or different features or classes).
+        """
+        if not self.warm_start or not os.path.exists(self.state_path):
+            return None
+        state = joblib.load(self.state_path)
+        previous = state.get('data')
+        if previous is None:
+            logging.info("Trainer state has no data fingerprint; training from scratch.")
+            return None
+        data_stat = os.stat(self.data_path)
+        if data_stat.st_size == previous['size'] and (data_stat.st_mtime_ns == previous['mtime_ns'] or
+                                                      _file_digest(self.data_path) == previous['digest']):
+            return 'unchanged'
+        if data_stat.st_size < previous['size'] or _file_digest(self.data_path, previous['size']) != previous['digest']:
+            logging.info("Labeled data was edited since the last run; training from scratch.")
+            return None
+        model = state['model']
+        if list(getattr(model, 'feature_names_in_', [])) != list(X.columns):
+            logging.info("Feature columns changed since the last run; training from scratch.")
+            return None
+        if sorted(map(str, model.classes_)) != sorted(map(str, y.unique())):
+            logging.info("Categories changed since the last run; training from scratch.")
+            return None
+        self.model = model
+        self.rows_trained = state['rows']
+        self.growths = state.get('growths', 0)
+        return 'grow'
+
+    def save_state(self, fingerprint):
+        """Keep the fitted forest and the fingerprint of the data it came from for the next run."""
+        joblib.dump({'model': self.model, 'rows': self.rows_trained, 'growths': self.growths, 'data': fingerprint},
+                    self.state_path, compress=3)
+
+    def train_model(self, X_train, y_train, grow=False):
+        """Train the model using Random Forest.
+
+        With grow, the loaded forest keeps its trees and
+        TRAIN_SETTINGS['warm_start_trees'] new trees are fitted on the
+        current training rows. The oldest trees are dropped so that the forest
+        never exceeds TRAIN_SETTINGS['max_trees']. Each growth gets its own
+        random_state: scikit-learn seeds new trees by skipping as many seeds as
+        there are trees, so after dropping trees the old seeds would repeat.
+        """
+        if grow:
+            added = TRAIN_SETTINGS["warm_start_trees"]
+            excess = len(self.model.estimators_) + added - max(TRAIN_SETTINGS["max_trees"], added)
+            if excess > 0:
+                # The oldest trees learned the least of the current data
+                self.model.estimators_ = self.model.estimators_[excess:]
+                logging.info(f"Dropped the {excess} oldest trees to stay within {TRAIN_SETTINGS['max_trees']} trees")
+            n_estimators = len(self.model.estimators_) + added
+            self.growths += 1
+            self.model.set_params(warm_start=True, n_estimators=n_estimators, n_jobs=self.n_jobs,
+                                  random_state=42 + self.growths)
+            logging.info(f"Growing the forest to {n_estimators} trees on {len(X_train)} rows")
+        else:
+            self.model.set_params(n_jobs=self.n_jobs)
         self.model.fit(X_train, y_train)
+        self.model.set_params(warm_start=False)
         logging.info("Model training completed.")
 
     def evaluate_model(self, X_test, y_test):
         """Print classification metrics."""
+        if not len(X_test):
+            logging.warning("No rows held out for evaluation.")
+            return
         predictions = self.model.predict(X_test)
         report = classification_report(y_test, predictions, zero_division=1)
         logging.info(f"Model evaluation report:\n{report}")
 
-    def save_model(self):
-        """Save the model to disk."""
-        joblib.dump(self.model, self.model_path)
-        logging.info(f"Model saved to {self.model_path}")
+    def export_model(self, X_check=None):
+        """Flatten the trained forest into a CompiledForest.
+
+        If X_check is given, the compiled model's probabilities are checked to
+        be bit-identical to the forest's.
+        """
+        compiled = CompiledForest.from_sklearn(self.model)
+        logging.info(f"Compiled {len(compiled.roots)} trees with {len(compiled.feature)} nodes")
+        if X_check is not None and len(X_check):
+            # Accumulating tree by tree in order is what scikit-learn does with a single job
+            n_jobs = self.model.n_jobs
+            self.model.set_params(n_jobs=1)
+            try:
+                expected = self.model.predict_proba(X_check)
+            finally:
+                self.model.set_params(n_jobs=n_jobs)
+            if not np.array_equal(compiled.predict_proba(X_check), expected):
+                raise ValueError("Compiled model predictions differ from the trained forest.")
+        return compiled
+
+    def save_model(self, X_check=None):
+        """Save the model to disk.
+
+        A model_path ending in .pkl gets a single legacy pickle; anything else
+        is a root of versioned artifacts, to which the model is published as
+        the next version, compiled to flat node arrays if MODEL_SETTINGS['compile'].
+        """
+        if self.model_path.endswith('.pkl'):
+            joblib.dump(self.model, self.model_path)
+            logging.info(f"Model saved to {self.model_path}")
+            return self.model_path
+        extractor = FeatureExtractor.for_model(self.model)
+        model = self.export_model(X_check) if MODEL_SETTINGS["compile"] else self.model
+        return save_artifact(model, self.model_path, {
+            'feature_schema': extractor.schema if extractor else None,
+            'feature_vocabulary': extractor.vocabulary if extractor else None,
+            'trained_estimator': type(self.model).__name__,
+            'n_estimators': len(self.model.estimators_),
+            'training_rows': self.rows_trained,
+            'training_data': os.path.abspath(self.data_path),
+        })
+
+    def run(self, full=False):
+        """Complete training process: load, split, train, evaluate, save.
 
-    def run(self):
-        """Complete training process: load, split, train, evaluate, save."""
-        data = self.load_data()
-        if data is not None:
+        Unless full is set, a forest saved by an earlier run is grown with
+        warm_start when rows were appended to the data, and nothing is trained
+        when the data is unchanged.
+        """
+        self.phases = []
+        if not os.path.exists(self.data_path):
+            logging.error(f"Data file {self.data_path} does not exist.")
+            return None
+        # Taken before reading, so rows appended meanwhile are trained on next time
+        fingerprint = data_fingerprint(self.data_path)
+        with self.phase("load"):
+            data = self.load_data()
+        if data is None or data.empty:
+            return None
+        data_rows = len(data)
+        with self.phase("split"):
             X_train, X_test, y_train, y_test = self.preprocess_data(data)
-            self.train_model(X_train, y_train)
+            del data
+        mode = None if full else self.load_state(X_train, y_train)
+        if mode == 'unchanged':
+            logging.info(f"Labeled data unchanged since the last run ({data_rows} rows); nothing to train.")
+            return None
+        with self.phase("train"):
+            self.train_model(X_train, y_train, grow=mode == 'grow')
+            self.rows_trained = len(X_train)
+        with self.phase("evaluate"):
             self.evaluate_model(X_test, y_test)
-            self.save_model()
+        with self.phase("save"):
+            path = self.save_model(X_test)
+            self.save_state(fingerprint)
+        total = sum(seconds for _, seconds, _ in self.phases)
+        logging.info(f"Training finished in {total:.2f}s: " +
+                     ", ".join(f"{name} {seconds:.2f}s" for name, seconds, _ in self.phases))
+        return path
 
 # ---- Main execution ----
 if __name__ == "__main__":
-    data_file = "d:/LANGUAGE/workspace/ai-directory-management/src/ai/labeled_data.csv"
-    model_file = "d:/LANGUAGE/workspace/ai-directory-management/src/ai/model.pkl"
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train the file category model.")
+    parser.add_argument("data_file", nargs="?", default=os.path.join(AI_DIRECTORY, "labeled_data.csv"),
+                        help="Labeled CSV with feature1..featureN or name, size, type columns and a category column.")
+    parser.add_argument("model_path", nargs="?", default=MODEL_SETTINGS["model_path"] or DEFAULT_ARTIFACT_ROOT,
+                        help="Root of versioned model artifacts, or a .pkl file.")
+    parser.add_argument("--full", action="store_true", help="Retrain from scratch instead of growing the last forest.")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Cores used to build trees (-1 for all).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="CSV rows read per chunk.")
+    args = parser.parse_args()
 
-    trainer = ModelTrainer(data_file, model_file)
-    trainer.run()
+    trainer = ModelTrainer(args.data_file, args.model_path, n_jobs=args.n_jobs, chunk_size=args.chunk_size)
+    trainer.run(full=args.full)
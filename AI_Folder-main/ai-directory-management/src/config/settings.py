@@ -1,7 +1,7 @@
 
 # This file contains the settings for the AI Directory Management project.
-SOURCE_DIRECTORY = "D:\LANGUAGE\workspace\source" # Source directory for files to be organized
-TARGET_DIRECTORY = "D:\LANGUAGE\workspace\target" # Target directory for organized files
+SOURCE_DIRECTORY = r"D:\LANGUAGE\workspace\source" # Source directory for files to be organized
+TARGET_DIRECTORY = r"D:\LANGUAGE\workspace\target" # Target directory for organized files
 
 # File categories for organizing files
 AI_MODEL_PARAMETERS = {
@@ -11,8 +11,134 @@ AI_MODEL_PARAMETERS = {
     "input_shape": (224, 224, 3), # Input shape for the model
 }
 
+# Rule-based categories (ai/categories.py)
+CATEGORY_SETTINGS = {
+    "rules_file": None, # Optional JSON file with extra categories, checked before the built-in ones
+}
+
+# Category model
+MODEL_SETTINGS = {
+    "batch_size": 1000, # Files classified per model call
+    "model_path": None, # Artifact directory, root of versioned artifacts or legacy .pkl; None means src/ai/models, then src/ai/model.pkl
+    "model_version": None, # Load this artifact version instead of the newest one
+    "mmap_mode": "r", # joblib mmap_mode for the model's arrays, shared between processes; None reads them into memory
+    "compile": True, # Flatten scikit-learn tree models into NumPy arrays for vectorized batch inference
+}
+
+# Persistent file index for incremental organize runs
+INDEX_SETTINGS = {
+    "db_path": "file_index.db", # SQLite database file (opened in WAL mode)
+    "retry_attempts": 3, # Failed moves of an unchanged file are attempted this many times in all
+    "retry_delay_seconds": 60, # Wait before the first retry of a failed move; doubled after each failure
+}
+
 
 LOGGING_SETTINGS = {
     "log_file": "ai_directory_management.log", # Log file name
     "log_level": "INFO", # Log level for logging
-}
\ No newline at end of file
+}
+
+
+# Pipelined organize engine (scan -> classify -> move stages joined by bounded queues)
+PIPELINE_SETTINGS = {
+    "pipelined": False, # Use the pipelined engine from the GUI "Organize Files" button
+    "scan_workers": 2, # Threads reading file metadata
+    "classify_workers": 2, # Threads running the category model
+    "move_workers": 8, # Threads moving files into category folders
+    "queue_size": 1000, # Maximum number of files buffered between two stages
+}
+
+# Duplicate finder
+DEDUPE_SETTINGS = {
+    "partial_bytes": 4096, # Bytes hashed from the start and the end of each candidate
+    "chunk_size": 1024 * 1024, # Read size for full-file hashes
+    "workers": 8, # Threads hashing files in parallel
+}
+
+# File encryption
+ENCRYPTION_SETTINGS = {
+    "chunk_size": 1024 * 1024, # Plaintext bytes per authenticated segment (at most 64 MiB)
+    "workers": None, # Processes for encrypt-tree/decrypt-tree (None = one per CPU core)
+}
+
+# Operations journal (operations.log)
+JOURNAL_SETTINGS = {
+    "path": "operations.log", # Journal file, one JSON entry per line
+    "flush_every_entries": 256, # Write a batch once this many entries are queued
+    "flush_every_ms": 200, # ... or once the oldest queued entry is this old
+    "fsync": "batch", # "batch" (fsync every write), "close" (only on shutdown) or "never"
+    "max_bytes": 64 * 1024 * 1024, # Rotate to operations.log.1, .2, ... past this size (0 = never)
+    "backup_count": 5, # Rotated segments to keep
+}
+
+# Watch mode
+WATCH_SETTINGS = {
+    "workers": 4, # Threads classifying and moving watched files
+    "batch_size": 256, # Files classified per predict_categories call
+    "queue_size": 100000, # Files tracked or pending before falling back to a rescan
+    "settle_ms": 2000, # A file is complete once its size and mtime stay unchanged this long
+    "settle_tick_ms": 250, # Resolution of the settle timer wheel
+    "reconcile": True, # On startup, organize files that arrived while the watcher was stopped
+    "ignore_patterns": ["*.part", "*.partial", "*.crdownload", "*.download", "*.tmp", "*~", "~$*", ".~lock.*", "*.swp"], # Temporary files that are never organized
+}
+
+# Copy engine used by move, copy, copy-folder and sort-by-date
+COPY_SETTINGS = {
+    "buffer_size": 8 * 1024 * 1024, # Bytes per copy_file_range/sendfile call or read/write buffer
+    "fdatasync": False, # Flush copied data to disk before the source is removed
+    "workers": 16, # Threads copying files in parallel for directory copies
+    "large_file_threshold": 64 * 1024 * 1024, # Files at least this big are copied as concurrent chunks
+    "chunk_size": 16 * 1024 * 1024, # Chunk size for large files
+    "progress_interval": 5, # Seconds between progress log lines for directory copies
+}
+
+# Move plans executed by organize and sort-by-date
+PLAN_SETTINGS = {
+    "workers": 8, # Threads running batches of planned moves
+    "batch_size": 500, # Moves per batch
+}
+
+# sort-by-date
+SORT_SETTINGS = {
+    "granularity": "day", # Folder per "year", "month", "week" or "day"
+    "time_source": "mtime", # Timestamp to sort by: "mtime", "ctime" or "birth"
+}
+
+# delete and delete-directory
+DELETE_SETTINGS = {
+    "workers": 8, # Threads deleting top-level subdirectories in parallel
+    "use_trash": False, # Rename into a trash directory and purge it in the background
+    "trash_dir_name": ".aidm-trash", # Trash directory created next to the deleted path
+    "exit_wait_seconds": 60, # How long a process waits at exit for its trash to be purged
+}
+
+# Content sniffing for files whose extension leaves the type open
+SNIFF_SETTINGS = {
+    "enabled": True, # Read the first bytes of extensionless or misnamed files to detect their type
+    "head_size": 4096, # Bytes read from the start of a file
+    "use_libmagic": True, # Use python-magic when it is installed, else the builtin signature table
+    "cache_path": None, # SQLite cache of detected types keyed by inode, size and mtime (None: sniff_cache.db in the user cache directory)
+    "ambiguous_extensions": [".bin", ".dat", ".tmp", ".part", ".download", ".crdownload"], # Always sniffed
+}
+
+# ai/train.py
+TRAIN_SETTINGS = {
+    "n_estimators": 1000, # Trees in a forest trained from scratch
+    "max_depth": 10, # Maximum depth of each tree
+    "n_jobs": -1, # Cores building trees in parallel (-1 for all)
+    "chunk_size": 100000, # CSV rows read and featurized at a time
+    "test_fraction": 0.3, # Share of rows held out for evaluation, picked by a hash of the row number
+    "warm_start_trees": 100, # Trees added to the last forest when labeled rows were added
+    "max_trees": 2000, # Growing the forest past this drops its oldest trees
+    "state_path": None, # Compressed forest kept for warm starts (None: <model_path>.trainer_state.joblib)
+}
+
+# Learning from files moved out of their predicted category folder (learn command)
+FEEDBACK_SETTINGS = {
+    "enabled": True, # Let the feedback model override FileCategorizer where it is confident
+    "model_path": "feedback_model.json", # Incrementally trained model learned from operations.log
+    "confirmation_weight": 0.1, # Weight of an organized file left in place, relative to a correction
+    "alpha": 1.0, # Additive smoothing of the naive Bayes counts
+    "min_confidence": 0.9, # Posterior probability needed to override the predicted category
+    "min_support": 2.0, # Weighted files of the winning category with the same extension needed to override
+}
@@ -12,6 +12,8 @@ from utils.file_operations import (
     delete_directory, list_files_in_directory, rename_directory, view_file_metadata, preview_file, deorganize_files, organize_files_task,
     move_folder, copy_folder
 )
+from utils.pipeline import organize_files_pipelined
+from config.settings import PIPELINE_SETTINGS
 
 class FileManagerApp:
     def __init__(self, master):
@@ -169,8 +171,9 @@ class FileManagerApp:
                     model.load_model()  # Ensure the model is loaded before use
 
                     # Start the organization task in a separate thread
+                    task = organize_files_pipelined if PIPELINE_SETTINGS["pipelined"] else organize_files_task
                     threading.Thread(
-                        target=organize_files_task,
+                        target=task,
                         args=(source_directory, target_directory, model, self.show_message)
                     ).start()
                 except FileNotFoundError as e:
@@ -310,8 +313,11 @@ class FileManagerApp:
         if source_folder:
             target_folder = self.select_directory("Select Target Location")
             if target_folder:
-                copy_folder(source_folder, target_folder)
-                self.show_message("Success", f"Copied folder to: {target_folder}")
+                stats = copy_folder(source_folder, target_folder)
+                if stats is None or stats['errors']:
+                    self.show_message("Error", f"Could not copy every file to: {target_folder}")
+                else:
+                    self.show_message("Success", f"Copied folder to: {target_folder}")
 
 if __name__ == "__main__":
     root = TkinterDnD.Tk()
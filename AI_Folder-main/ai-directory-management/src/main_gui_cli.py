@@ -1,15 +1,22 @@
 import os
 import sys
+import time
 import logging
 import argparse
 from ai.model import FileCategorizer
+from ai.feedback import learn_from_journal
 from utils.gui_operations import FileSelector
 from utils.file_operations import (
     organize_files_task,summarize_file,display_log,
-    sort_files_by_date, encrypt_file, decrypt_file, move_file, copy_file, delete_file, create_directory,
+    sort_files_by_date, encrypt_file, decrypt_file, encrypt_directory, decrypt_directory, move_file, copy_file, delete_file, create_directory,
     delete_directory, list_files_in_directory, rename_directory,
-    view_file_metadata, preview_file, deorganize_files, batch_rename_files,
+    view_file_metadata, preview_file, deorganize_files, find_duplicates, link_duplicates,
 )
+from utils.pipeline import organize_files_pipelined
+from utils.file_index import FileIndex, build_index, organize_files_incremental
+from utils.log_viewer import parse_log_time
+from utils.watcher import FolderWatcher
+from utils.planner import MovePlan, execute_plan
 
 def main():
     # Initialize logging
@@ -23,9 +30,42 @@ def main():
     parser_organize = subparsers.add_parser("organize", help="Categorizes and moves files into relevant folders.")
     parser_organize.add_argument("-s", "--source-directory", required=False, help="The source directory containing files to organize.")
     parser_organize.add_argument("-t", "--target-directory", required=False, help="The target directory where organized files will be placed.")
+    parser_organize.add_argument("-r", "--recursive", action="store_true", help="Also organize files in subdirectories.")
+    organize_mode = parser_organize.add_mutually_exclusive_group()
+    organize_mode.add_argument("--incremental", action="store_true", help="Only organize files that are new or changed since the last indexed run.")
+    organize_mode.add_argument("--pipelined", action="store_true", help="Use the pipelined scan/classify/move engine.")
+    parser_organize.add_argument("--db", required=False, help="File index database used with --incremental.")
+    parser_organize.add_argument("--scan-workers", type=int, default=None, help="Worker threads for the scan stage (pipelined mode).")
+    parser_organize.add_argument("--classify-workers", type=int, default=None, help="Worker threads for the classify stage (pipelined mode).")
+    parser_organize.add_argument("--move-workers", type=int, default=None, help="Worker threads for the move stage (pipelined mode).")
+    parser_organize.add_argument("--queue-size", type=int, default=None, help="Maximum files buffered between stages (pipelined mode).")
+    parser_organize.add_argument("--dry-run", action="store_true", help="Only print the planned moves.")
+    parser_organize.add_argument("--save-plan", required=False, help="Save the planned moves to this JSON file (not with --incremental or --pipelined).")
 
    
 
+    # Watch a directory and organize new files as they arrive
+    parser_watch = subparsers.add_parser("watch", help="Watches a directory and organizes new files as they arrive.")
+    parser_watch.add_argument("-s", "--source-directory", required=False, help="The directory to watch.")
+    parser_watch.add_argument("-t", "--target-directory", required=False, help="The target directory where organized files will be placed.")
+    parser_watch.add_argument("-r", "--recursive", action="store_true", help="Also watch subdirectories.")
+    parser_watch.add_argument("--workers", type=int, default=None, help="Worker threads classifying and moving files.")
+    parser_watch.add_argument("--batch-size", type=int, default=None, help="Files classified per batch.")
+    parser_watch.add_argument("--queue-size", type=int, default=None, help="Files tracked or pending before falling back to a rescan.")
+    parser_watch.add_argument("--settle-ms", type=int, default=None, help="Treat a file as complete once its size and mtime are unchanged this long.")
+    parser_watch.add_argument("--db", required=False, help="File index database used as the watcher's checkpoint.")
+    parser_watch.add_argument("--no-reconcile", action="store_true", help="Skip the startup pass for files that arrived while the watcher was stopped.")
+
+    # File index for incremental organize runs
+    parser_index = subparsers.add_parser("index", help="Builds or inspects the file index used by organize --incremental.")
+    index_subparsers = parser_index.add_subparsers(dest="index_command")
+    parser_index_build = index_subparsers.add_parser("build", help="Scans and classifies new or changed files into the index.")
+    parser_index_build.add_argument("-s", "--source-directory", required=False, help="The directory to index.")
+    parser_index_build.add_argument("-r", "--recursive", action="store_true", help="Also index files in subdirectories.")
+    parser_index_build.add_argument("--db", required=False, help="The index database file.")
+    parser_index_status = index_subparsers.add_parser("status", help="Shows a summary of the index.")
+    parser_index_status.add_argument("--db", required=False, help="The index database file.")
+
     # Move file or folder
     parser_move = subparsers.add_parser("move", help="Moves a file or folder to a new location.")
     parser_move.add_argument("--source", required=False, help="The source file or folder to move.")
@@ -35,10 +75,13 @@ def main():
     parser_copy = subparsers.add_parser("copy", help="Copies a file or folder to a new location.")
     parser_copy.add_argument("--source", required=False, help="The source file or folder to copy.")
     parser_copy.add_argument("--destination", required=False, help="The destination path.")
+    parser_copy.add_argument("--workers", type=int, default=None, help="Worker threads for copying folders.")
 
     # Delete file or folder
     parser_delete = subparsers.add_parser("delete", help="Deletes a specified file or folder.")
     parser_delete.add_argument("-p", "--path", required=False, help="The file or folder to delete.")
+    parser_delete.add_argument("--trash", action="store_true", default=None, help="Move into a trash directory and purge it in the background.")
+    parser_delete.add_argument("--workers", type=int, default=None, help="Worker threads for deleting folders.")
 
     # Create directory
     parser_create_directory = subparsers.add_parser("create-directory", help="Creates a new directory.")
@@ -49,10 +92,13 @@ def main():
     parser_delete_directory = subparsers.add_parser("delete-directory", help="Deletes a specified directory.")
     parser_delete_directory.add_argument("-p", "--path", required=False, help="The path of the directory to delete.")
     parser_delete_directory.add_argument("-n", "--name", required=False, help="The name of the directory to delete.")
+    parser_delete_directory.add_argument("--trash", action="store_true", default=None, help="Move into a trash directory and purge it in the background.")
+    parser_delete_directory.add_argument("--workers", type=int, default=None, help="Worker threads for deleting the directory.")
 
     # List files in directory
     parser_list_files = subparsers.add_parser("list-files", help="Lists files in a specified directory.")
     parser_list_files.add_argument("-p", "--path", required=False, help="The path of the directory to list files in.")
+    parser_list_files.add_argument("-r", "--recursive", action="store_true", help="Also list files in subdirectories.")
 
     # Rename directory
     parser_rename_directory = subparsers.add_parser("rename-directory", help="Renames a specified directory.")
@@ -60,12 +106,43 @@ def main():
     parser_rename_directory.add_argument("-n", "--new-name", required=False, help="The new name for the directory.")
  
     # Display log
-    subparsers.add_parser("log", help="Displays a log of previous operations.")
+    parser_log = subparsers.add_parser("log", help="Displays the latest logged operations, newest page first.")
+    parser_log.add_argument("-n", "--limit", type=int, default=50, help="Number of entries per page.")
+    parser_log.add_argument("--page", type=int, default=0, help="Page to show, 0 being the newest entries.")
+    parser_log.add_argument("--operation", help="Only show entries of this operation type, e.g. move.")
+    parser_log.add_argument("--path-prefix", help="Only show entries with a path starting with this prefix.")
+    parser_log.add_argument("--since", type=parse_log_time, help="Only show entries at or after this time (ISO date/time or epoch seconds).")
+    parser_log.add_argument("--until", type=parse_log_time, help="Only show entries at or before this time (ISO date/time or epoch seconds).")
+
+    # Learn from files moved out of their predicted category folder
+    parser_learn = subparsers.add_parser("learn", help="Learns from files moved out of their predicted category folder.")
+    parser_learn.add_argument("--journal", default=None, help="Operations log to learn from (default: JOURNAL_SETTINGS path).")
+    parser_learn.add_argument("--model", default=None, help="Feedback model file (default: FEEDBACK_SETTINGS model_path).")
+    parser_learn.add_argument("--export", default=None, help="Also append the corrected files to this labeled CSV (name, size, type, category).")
+    parser_learn.add_argument("--rebuild", action="store_true", help="Learn again from the whole log instead of only new entries.")
 
     # Sort files by date
     parser_sort_by_date = subparsers.add_parser("sort-by-date", help="Organizes files based on creation/modification date.")
     parser_sort_by_date.add_argument("-s", "--source-directory", required=False, help="The source directory containing files to sort.")
     parser_sort_by_date.add_argument("-t", "--target-directory", required=False, help="The target directory where sorted files will be placed.")
+    parser_sort_by_date.add_argument("-r", "--recursive", action="store_true", help="Also sort files in subdirectories.")
+    parser_sort_by_date.add_argument("-g", "--granularity", choices=["year", "month", "week", "day"], default=None, help="Create one folder per year, month, ISO week or day.")
+    parser_sort_by_date.add_argument("--time-source", choices=["mtime", "ctime", "birth"], default=None, help="Sort by modification, change or creation (birth) time.")
+    parser_sort_by_date.add_argument("--workers", type=int, default=None, help="Worker threads running the moves.")
+    parser_sort_by_date.add_argument("--dry-run", action="store_true", help="Only print the planned moves.")
+    parser_sort_by_date.add_argument("--save-plan", required=False, help="Save the planned moves to this JSON file.")
+
+    # Execute a saved move plan
+    parser_apply_plan = subparsers.add_parser("apply-plan", help="Executes a move plan saved with --save-plan.")
+    parser_apply_plan.add_argument("-p", "--plan", required=False, help="The plan JSON file.")
+    parser_apply_plan.add_argument("--workers", type=int, default=None, help="Worker threads running the moves.")
+
+    # Find duplicate files
+    parser_dedupe = subparsers.add_parser("dedupe", help="Finds byte-identical files and optionally hard-links them.")
+    parser_dedupe.add_argument("-s", "--source-directory", required=False, help="The directory to search for duplicates.")
+    parser_dedupe.add_argument("-r", "--recursive", action="store_true", help="Also search subdirectories.")
+    parser_dedupe.add_argument("--hardlink", action="store_true", help="Replace duplicates with hard links to the first copy.")
+    parser_dedupe.add_argument("--workers", type=int, default=None, help="Threads hashing files in parallel.")
 
     # Encrypt file
     parser_encrypt = subparsers.add_parser("encrypt", help="Encrypts a file for security.")
@@ -75,6 +152,14 @@ def main():
     parser_decrypt = subparsers.add_parser("decrypt", help="Decrypt a file.")
     parser_decrypt.add_argument("-f", "--file", required=False, help="File to decrypt.")
 
+    # Encrypt or decrypt a whole directory tree
+    parser_encrypt_tree = subparsers.add_parser("encrypt-tree", help="Encrypts every file in a directory tree in parallel.")
+    parser_encrypt_tree.add_argument("-d", "--directory", required=False, help="Directory tree to encrypt.")
+    parser_encrypt_tree.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU core).")
+    parser_decrypt_tree = subparsers.add_parser("decrypt-tree", help="Decrypts every encrypted file in a directory tree in parallel.")
+    parser_decrypt_tree.add_argument("-d", "--directory", required=False, help="Directory tree to decrypt.")
+    parser_decrypt_tree.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU core).")
+
     # View metadata
     parser_metadata = subparsers.add_parser("view-metadata", help="View metadata of a file.")
     parser_metadata.add_argument("-f", "--file-path", required=False, help="The path to the file.")
@@ -87,9 +172,15 @@ def main():
     # Deorganize files
     parser_deorganize = subparsers.add_parser("deorganize", help="Moves files from subdirectories back to the main directory.")
     parser_deorganize.add_argument("-s", "--source-directory", required=False, help="The source directory to deorganize.")
+    parser_deorganize.add_argument("--workers", type=int, default=None, help="Worker threads running the moves.")
+    parser_deorganize.add_argument("--keep-empty", action="store_true", help="Keep the emptied subdirectories.")
+    parser_deorganize.add_argument("--dry-run", action="store_true", help="Only print the planned moves.")
 
  
     args = parser.parse_args()
+    if args.command == "organize" and (args.dry_run or args.save_plan) and (args.incremental or args.pipelined):
+        # Plans are built by the plain organize engine only
+        parser_organize.error("--dry-run and --save-plan cannot be combined with --incremental or --pipelined")
 
     if args.gui:
         # Handle GUI mode for all commands
@@ -99,9 +190,18 @@ def main():
                 target_dir = FileSelector.select_directory("Select Target Directory")
                 if source_dir and target_dir:
                     model = FileCategorizer()
-                    model.load_model()
                     organize_files_task(source_dir, target_dir, model)
 
+        elif args.command == "watch":
+            source_dir = FileSelector.select_directory("Select Directory to Watch")
+            if source_dir:
+                target_dir = FileSelector.select_directory("Select Target Directory")
+                if target_dir:
+                    model = FileCategorizer()
+                    # Fail now rather than in the first batch of a long-running watch
+                    model.load_model()
+                    FolderWatcher(source_dir, target_dir, model).run_forever()
+
         elif args.command == "move":
             source = FileSelector.select_file("Select File to Move")
             if source:
@@ -170,6 +270,12 @@ def main():
         elif args.command == "log":
             display_log()
 
+        elif args.command == "apply-plan":
+            plan_path = FileSelector.select_file("Select Move Plan", filetypes=[("JSON files", "*.json"),
+                                                                               ("All files", "*.*")])
+            if plan_path:
+                execute_plan(MovePlan.load(plan_path))
+
         elif args.command == "sort-by-date":
             source_directory = FileSelector.select_directory("Select Source Directory to Sort")
             if source_directory:
@@ -235,22 +341,71 @@ def main():
         if args.command == "organize":
             if args.source_directory and args.target_directory:
                 model = FileCategorizer()
+                if args.dry_run or args.save_plan:
+                    organize_files_task(args.source_directory, args.target_directory, model, recursive=args.recursive,
+                                        dry_run=args.dry_run, save_plan=args.save_plan)
+                elif args.incremental:
+                    organize_files_incremental(args.source_directory, args.target_directory, model,
+                                               db_path=args.db, recursive=args.recursive)
+                elif args.pipelined:
+                    stats = organize_files_pipelined(
+                        args.source_directory, args.target_directory, model,
+                        scan_workers=args.scan_workers, classify_workers=args.classify_workers,
+                        move_workers=args.move_workers, queue_size=args.queue_size,
+                        recursive=args.recursive,
+                    )
+                    if stats:
+                        print(f"Organized {stats['files']} files in {stats['seconds']:.2f}s "
+                              f"({stats['files_per_second']:.1f} files/s)")
+                else:
+                    organize_files_task(args.source_directory, args.target_directory, model, recursive=args.recursive)
+            else:
+                logging.error("Source and target directories are required in CLI mode")
+
+        elif args.command == "watch":
+            if args.source_directory and args.target_directory:
+                model = FileCategorizer()
+                # Fail now rather than in the first batch of a long-running watch
                 model.load_model()
-                organize_files_task(args.source_directory, args.target_directory, model)
+                FolderWatcher(args.source_directory, args.target_directory, model, recursive=args.recursive,
+                              workers=args.workers, batch_size=args.batch_size, queue_size=args.queue_size,
+                              settle_ms=args.settle_ms, db_path=args.db,
+                              reconcile=False if args.no_reconcile else None).run_forever()
             else:
                 logging.error("Source and target directories are required in CLI mode")
 
         
 
+        elif args.command == "index":
+            if args.index_command == "build":
+                if args.source_directory:
+                    model = FileCategorizer()
+                    build_index(args.source_directory, model, db_path=args.db, recursive=args.recursive)
+                else:
+                    logging.error("Source directory is required in CLI mode")
+            elif args.index_command == "status":
+                with FileIndex(args.db) as index:
+                    status = index.status()
+                print(f"\nIndex: {status['db_path']}")
+                print(f"  Files: {status['files']}")
+                if status['last_updated']:
+                    print(f"  Last updated: {time.ctime(status['last_updated'])}")
+                for action, count in status['actions'].items():
+                    print(f"  Action {action}: {count}")
+                for category, count in status['categories'].items():
+                    print(f"  Category {category}: {count}")
+            else:
+                parser_index.print_help()
+
         elif args.command == "move":
             move_file(args.source, args.destination)
 
         elif args.command == "copy":
-            copy_file(args.source, args.destination)
+            copy_file(args.source, args.destination, workers=args.workers)
 
         elif args.command == "delete":
             if args.path:
-                delete_file(args.path)
+                delete_file(args.path, use_trash=args.trash, workers=args.workers)
             else:
                 logging.error("Path is required in CLI mode")
 
@@ -262,13 +417,13 @@ def main():
 
         elif args.command == "delete-directory":
             if args.path and args.name:
-                delete_directory(args.path, args.name)
+                delete_directory(args.path, args.name, use_trash=args.trash, workers=args.workers)
             else:
                 logging.error("Path and name are required in CLI mode")
 
         elif args.command == "list-files":
             if args.path:
-                list_files_in_directory(args.path)
+                list_files_in_directory(args.path, recursive=args.recursive)
             else:
                 logging.error("Path is required in CLI mode")
 
@@ -287,14 +442,45 @@ def main():
        
 
         elif args.command == "log":
-            display_log()
+            display_log(limit=args.limit, page=args.page, operation=args.operation, path_prefix=args.path_prefix,
+                        since=args.since, until=args.until)
+
+        elif args.command == "learn":
+            stats = learn_from_journal(journal_path=args.journal, model_path=args.model, export_csv=args.export,
+                                       rebuild=args.rebuild)
+            print(f"Learned {stats['files']} files, {stats['corrections']} of them corrected")
 
         elif args.command == "sort-by-date":
             if args.source_directory and args.target_directory:
-                sort_files_by_date(args.source_directory, args.target_directory)
+                sort_files_by_date(args.source_directory, args.target_directory, recursive=args.recursive,
+                                   dry_run=args.dry_run, save_plan=args.save_plan, granularity=args.granularity,
+                                   time_source=args.time_source, workers=args.workers)
             else:
                 logging.error("Source and target directories are required in CLI mode")
 
+        elif args.command == "apply-plan":
+            if args.plan:
+                stats = execute_plan(MovePlan.load(args.plan), workers=args.workers)
+                print(f"Moved {stats['moved']} files with {stats['errors']} errors in {stats['seconds']:.2f}s")
+            else:
+                logging.error("Plan file is required in CLI mode")
+
+        elif args.command == "dedupe":
+            if args.source_directory:
+                duplicates = find_duplicates(args.source_directory, recursive=args.recursive, workers=args.workers)
+                reclaimable = 0
+                for group in duplicates:
+                    reclaimable += group['size'] * (len(group['paths']) - 1)
+                    print(f"\n{len(group['paths'])} copies of {group['size']} bytes:")
+                    for path in group['paths']:
+                        print(f"  {path}")
+                print(f"\n{len(duplicates)} duplicate sets, {reclaimable} bytes reclaimable")
+                if args.hardlink:
+                    reclaimed = link_duplicates(duplicates)
+                    print(f"Replaced duplicates with hard links, {reclaimed} bytes reclaimed")
+            else:
+                logging.error("Source directory is required in CLI mode")
+
         elif args.command == "encrypt":
             if args.file:
                 encrypt_file(args.file)
@@ -307,6 +493,17 @@ def main():
             else:
                 logging.error("File path is required in CLI mode")
 
+        elif args.command in ("encrypt-tree", "decrypt-tree"):
+            if args.directory:
+                process_directory = encrypt_directory if args.command == "encrypt-tree" else decrypt_directory
+                stats = process_directory(args.directory, workers=args.workers)
+                if stats:
+                    print(f"Processed {stats['files']} files ({stats['skipped']} skipped, {stats['errors']} errors), "
+                          f"{stats['bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']:.2f}s "
+                          f"({stats['mb_per_second']:.1f} MB/s)")
+            else:
+                logging.error("Directory is required in CLI mode")
+
         elif args.command == "view-metadata":
             if args.file_path:
                 metadata = view_file_metadata(args.file_path)
@@ -328,7 +525,8 @@ def main():
 
         elif args.command == "deorganize":
             if args.source_directory:
-                deorganize_files(args.source_directory)
+                deorganize_files(args.source_directory, workers=args.workers, prune_empty=not args.keep_empty,
+                                 dry_run=args.dry_run)
             else:
                 logging.error("Source directory is required in CLI mode")
  
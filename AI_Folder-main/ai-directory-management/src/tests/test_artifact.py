@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import sys
+import joblib
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.artifact import save_artifact, list_versions, resolve_model_path, load_artifact
+from ai.features import FeatureExtractor, FULL
+from ai.model import FileCategorizer, CompiledForest
+
+METADATA = [
+    {'name': 'a.jpg', 'size': 10, 'type': 'image/jpeg'},
+    {'name': 'b.pdf', 'size': 10 << 20, 'type': 'application/pdf'},
+]
+
+class TestModelArtifact(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'models')
+        extractor = FeatureExtractor(FULL)
+        X = pd.DataFrame(extractor.transform(METADATA), columns=extractor.feature_names)
+        self.model = DecisionTreeClassifier(random_state=0).fit(X, ['Small', 'Large'])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # Test that each save publishes a new version and the newest is resolved
+    def test_versions(self):
+        first = save_artifact(self.model, self.root, {'feature_schema': FULL})
+        second = save_artifact(self.model, self.root)
+        self.assertEqual(list_versions(self.root), [1, 2])
+        self.assertEqual(resolve_model_path(self.root), second)
+        self.assertEqual(resolve_model_path(self.root, version=1), first)
+        self.assertEqual([name for name in os.listdir(self.root) if name.startswith('.')], [])
+        with self.assertRaises(FileNotFoundError):
+            resolve_model_path(self.root, version=3)
+
+    # Test that an artifact loads with memory-mapped arrays and keeps its manifest
+    def test_load_artifact(self):
+        path = save_artifact(self.model, self.root, {'feature_schema': FULL})
+        model, manifest = load_artifact(path, mmap_mode='r')
+        self.assertEqual(manifest['version'], 1)
+        self.assertEqual(manifest['feature_schema'], FULL)
+        self.assertEqual(manifest['classes'], ['Large', 'Small'])
+        extractor = FeatureExtractor(FULL)
+        X = pd.DataFrame(extractor.transform(METADATA), columns=extractor.feature_names)
+        self.assertEqual(list(model.predict(X)), ['Small', 'Large'])
+
+    # Test that the categorizer loads its model on the first prediction only
+    def test_lazy_loading(self):
+        save_artifact(self.model, self.root)
+        categorizer = FileCategorizer(model_path=self.root)
+        self.assertIsNone(categorizer.model)
+        self.assertEqual(categorizer.predict_categories(METADATA), ['Small', 'Large'])
+        self.assertEqual(categorizer.manifest['version'], 1)
+
+        legacy = os.path.join(self.tmp.name, 'model.pkl')
+        joblib.dump(self.model, legacy)
+        categorizer = FileCategorizer(model_path=legacy)
+        self.assertEqual(categorizer.predict_categories(METADATA), ['Small', 'Large'])
+        self.assertIsNone(categorizer.manifest)
+        self.assertIsInstance(categorizer.model, CompiledForest)
+
+    # Test that a legacy model matching no feature schema is loaded but not compiled
+    def test_mismatched_model_not_compiled(self):
+        legacy = os.path.join(self.tmp.name, 'model.pkl')
+        joblib.dump(DecisionTreeClassifier().fit([[0, 0, 1], [1, 0, 0]], ['Images', 'Videos']), legacy)
+        categorizer = FileCategorizer(model_path=legacy)
+        self.assertEqual(categorizer.predict_categories(METADATA), ['Images', 'Documents'])
+        self.assertIsInstance(categorizer.model, DecisionTreeClassifier)
+
+if __name__ == '__main__':
+    unittest.main()
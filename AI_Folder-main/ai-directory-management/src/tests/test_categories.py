@@ -0,0 +1,64 @@
+import os
+import json
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.categories import REGISTRY, build_registry
+
+class TestCategoryRegistry(unittest.TestCase):
+
+    # Test lookups by MIME type
+    def test_lookup_by_mime_type(self):
+        self.assertEqual(REGISTRY.lookup('application/pdf'), 'Documents')
+        self.assertEqual(REGISTRY.lookup('IMAGE/PNG'), 'Images')
+        self.assertEqual(REGISTRY.lookup('application/x-unknown'), 'Others')
+
+    # Test that the first matching rule wins, as with the old if/elif chain
+    def test_rule_order(self):
+        self.assertEqual(REGISTRY.lookup('application/x-sh'), 'Scripts')
+        self.assertEqual(REGISTRY.lookup('application/x-sql'), 'Scripts')
+
+    # Test the extension fallback when the MIME type is unknown
+    def test_lookup_by_extension(self):
+        self.assertEqual(REGISTRY.lookup('application/octet-stream', 'script.py'), 'Scripts')
+        self.assertEqual(REGISTRY.lookup(None, 'REPORT.DOCX'), 'Word Documents')
+        self.assertEqual(REGISTRY.lookup(None, 'unknown_file.xyz'), 'Others')
+
+    # Test that labels spelled differently from a category map to it
+    def test_canonical(self):
+        self.assertEqual(REGISTRY.canonical('Videos'), 'Video')
+        self.assertEqual(REGISTRY.canonical('images'), 'Images')
+        self.assertEqual(REGISTRY.canonical('Others'), 'Others')
+        self.assertEqual(REGISTRY.canonical('Ebooks'), 'Ebooks')
+
+    # Test extending the registry from a data file
+    def test_rules_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rules_file = os.path.join(tmp, 'categories.json')
+            with open(rules_file, 'w') as f:
+                json.dump({"Ebooks": {"mime_types": ["application/epub+zip"], "extensions": ["epub"]},
+                           "Shell": {"extensions": [".sh"]}}, f)
+            registry = build_registry(rules_file)
+        self.assertEqual(registry.lookup('application/epub+zip'), 'Ebooks')
+        self.assertEqual(registry.lookup(None, 'book.epub'), 'Ebooks')
+        self.assertEqual(registry.lookup(None, 'run.sh'), 'Shell')
+        self.assertEqual(registry.lookup('application/pdf'), 'Documents')
+        self.assertIn('.epub', registry.extensions['Ebooks'])
+
+    # Test that a malformed rules file is reported and the defaults are used
+    def test_malformed_rules_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rules_file = os.path.join(tmp, 'categories.json')
+            for data in (["Ebooks"], {"Ebooks": [".epub"]}, {"Ebooks": {"extensions": ".epub"}}):
+                with open(rules_file, 'w') as f:
+                    json.dump(data, f)
+                with self.assertLogs(level='ERROR'):
+                    registry = build_registry(rules_file)
+                self.assertEqual(registry.categories, REGISTRY.categories)
+
+if __name__ == '__main__':
+    unittest.main()
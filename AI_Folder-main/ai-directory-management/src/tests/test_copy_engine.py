@@ -0,0 +1,164 @@
+import os
+import tempfile
+import unittest
+import sys
+from unittest import mock
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import copy_engine
+from utils.copy_engine import copy_file_data, fast_copy, fast_move, copy_tree_parallel
+
+class TestCopyEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source.bin')
+        self.data = os.urandom(300 * 1024 + 7)
+        with open(self.source, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    # Test that the data is copied intact with a buffer smaller than the file
+    def test_copy_file_data(self):
+        target = os.path.join(self.tmp.name, 'target.bin')
+        copy_file_data(self.source, target, buffer_size=64 * 1024, fdatasync=True)
+        self.assertEqual(self.read(target), self.data)
+
+    # Test that unsupported primitives fall through to the buffered copy
+    def test_fallback(self):
+        def unsupported(*args):
+            raise OSError(copy_engine.errno.EXDEV, "cross-device")
+        target = os.path.join(self.tmp.name, 'target.bin')
+        with mock.patch.object(copy_engine, '_STRATEGIES',
+                               ((copy_engine.REFLINK, unsupported), (copy_engine.COPY_FILE_RANGE, unsupported),
+                                (copy_engine.BUFFERED, copy_engine._buffered))):
+            method = copy_file_data(self.source, target, buffer_size=4096)
+        self.assertEqual(method, copy_engine.BUFFERED)
+        self.assertEqual(self.read(target), self.data)
+
+    # Test that fast_copy preserves the modification time and copies into directories
+    def test_fast_copy(self):
+        os.utime(self.source, (1000, 2000))
+        target_dir = os.path.join(self.tmp.name, 'out')
+        os.makedirs(target_dir)
+        target = fast_copy(self.source, target_dir)
+        self.assertEqual(target, os.path.join(target_dir, 'source.bin'))
+        self.assertEqual(os.stat(target).st_mtime, 2000)
+        self.assertEqual(self.read(target), self.data)
+
+    # Test moving a file both by rename and by copying across devices
+    def test_fast_move(self):
+        target = os.path.join(self.tmp.name, 'moved.bin')
+        fast_move(self.source, target)
+        self.assertFalse(os.path.exists(self.source))
+        self.assertEqual(self.read(target), self.data)
+
+        with mock.patch.object(copy_engine, '_same_device', return_value=False):
+            fast_move(target, self.source)
+        self.assertFalse(os.path.exists(target))
+        self.assertEqual(self.read(self.source), self.data)
+
+    # Test that a move without overwrite never replaces an existing file
+    def test_move_to_free_name(self):
+        target = os.path.join(self.tmp.name, 'target.bin')
+        with open(target, 'wb') as f:
+            f.write(b'existing')
+        with self.assertRaises(FileExistsError):
+            fast_move(self.source, target, overwrite=False)
+        for same_device in (True, False):
+            with mock.patch.object(copy_engine, '_same_device', return_value=same_device):
+                moved = copy_engine.move_to_free_name(self.source, target)
+            self.assertEqual(self.read(moved), self.data)
+            os.replace(moved, self.source)
+        self.assertEqual(moved, os.path.join(self.tmp.name, 'target (1).bin'))
+        self.assertEqual(self.read(target), b'existing')
+
+    # Test that a primitive stopping early falls through and a short copy never unlinks the source
+    def test_short_copy(self):
+        def first_chunk_only(source_fd, target_fd, count, source_offset, target_offset):
+            if source_offset:
+                return 0
+            data = os.pread(source_fd, count, source_offset)
+            return os.pwrite(target_fd, data, target_offset)
+        target = os.path.join(self.tmp.name, 'moved.bin')
+        with mock.patch.object(copy_engine, '_same_device', return_value=False), \
+                mock.patch.object(copy_engine.os, 'copy_file_range', first_chunk_only, create=True), \
+                mock.patch.object(copy_engine, '_reflink', side_effect=OSError(copy_engine.errno.EXDEV, "")):
+            fast_move(self.source, target, buffer_size=64 * 1024)
+        self.assertEqual(self.read(target), self.data)
+
+        def short(source_fd, target_fd, size, buffer_size):
+            os.write(target_fd, b'x')
+            copy_engine._check_complete('short', 1, size)
+        with mock.patch.object(copy_engine, '_same_device', return_value=False), \
+                mock.patch.object(copy_engine, '_STRATEGIES', ((copy_engine.BUFFERED, short),)):
+            with self.assertRaises(copy_engine.ShortCopyError):
+                fast_move(target, self.source)
+        self.assertEqual(self.read(target), self.data)
+
+    # Test a parallel tree copy with nested directories and a file copied in chunks
+    def test_copy_tree_parallel(self):
+        tree = os.path.join(self.tmp.name, 'tree')
+        os.makedirs(os.path.join(tree, 'a', 'b'))
+        for i in range(20):
+            with open(os.path.join(tree, 'a', 'b', f'{i}.txt'), 'w') as f:
+                f.write(str(i))
+        os.replace(self.source, os.path.join(tree, 'a', 'large.bin'))
+        os.utime(os.path.join(tree, 'a', 'large.bin'), (1000, 2000))
+        os.utime(os.path.join(tree, 'a'), (1000, 3000))
+
+        reports = []
+        target = os.path.join(self.tmp.name, 'copy')
+        stats = copy_tree_parallel(tree, target, workers=4, large_file_threshold=64 * 1024,
+                                   chunk_size=64 * 1024, progress=reports.append)
+        self.assertEqual((stats['files'], stats['dirs'], stats['errors']), (21, 2, 0))
+        self.assertEqual(stats['bytes'], len(self.data) + sum(len(str(i)) for i in range(20)))
+        self.assertEqual(self.read(os.path.join(target, 'a', 'large.bin')), self.data)
+        self.assertEqual(os.stat(os.path.join(target, 'a', 'large.bin')).st_mtime, 2000)
+        self.assertEqual(os.stat(os.path.join(target, 'a')).st_mtime, 3000)
+        self.assertEqual(self.read(os.path.join(target, 'a', 'b', '7.txt')), b'7')
+        self.assertEqual(reports[-1]['files'], 21)
+
+    # Test that symlinks to directories and dangling symlinks are recreated, not dropped
+    @unittest.skipUnless(hasattr(os, 'symlink') and os.name != 'nt', "needs symlinks")
+    def test_copy_tree_symlinks(self):
+        tree = os.path.join(self.tmp.name, 'tree')
+        os.makedirs(os.path.join(tree, 'real'))
+        with open(os.path.join(tree, 'real', 'a.txt'), 'w') as f:
+            f.write('a')
+        os.symlink('real', os.path.join(tree, 'dir_link'))
+        os.symlink(os.path.join('real', 'a.txt'), os.path.join(tree, 'file_link'))
+        os.symlink('missing', os.path.join(tree, 'dangling'))
+
+        target = os.path.join(self.tmp.name, 'copy')
+        stats = copy_tree_parallel(tree, target, workers=2)
+        self.assertEqual((stats['files'], stats['dirs'], stats['links'], stats['errors']), (2, 1, 2, 0))
+        self.assertEqual(os.readlink(os.path.join(target, 'dir_link')), 'real')
+        self.assertEqual(os.readlink(os.path.join(target, 'dangling')), 'missing')
+        self.assertFalse(os.path.islink(os.path.join(target, 'file_link')))
+        self.assertEqual(self.read(os.path.join(target, 'dir_link', 'a.txt')), b'a')
+
+    # Test that a chunk cut short by the source ending early fails the file
+    def test_copy_tree_short_chunk(self):
+        tree = os.path.join(self.tmp.name, 'tree')
+        os.makedirs(tree)
+        os.replace(self.source, os.path.join(tree, 'large.bin'))
+        copy_chunk = copy_engine._copy_chunk
+
+        def short_chunk(source, target, offset, length, buffer_size):
+            return copy_chunk(source, target, offset, length, buffer_size) - (1 if offset else 0)
+        with mock.patch.object(copy_engine, '_copy_chunk', short_chunk):
+            stats = copy_tree_parallel(tree, os.path.join(self.tmp.name, 'copy'), workers=2,
+                                       large_file_threshold=64 * 1024, chunk_size=64 * 1024)
+        self.assertEqual((stats['files'], stats['errors'], stats['bytes']), (0, 1, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import stat
+import tempfile
+import unittest
+import subprocess
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.delete_engine import delete_tree, delete_path, move_to_trash, get_purger
+
+class TestDeleteEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tree = os.path.join(self.tmp.name, 'tree')
+        os.makedirs(os.path.join(self.tree, 'a', 'b'))
+        os.makedirs(os.path.join(self.tree, 'c'))
+        for name in ['top.txt', os.path.join('a', '1.txt'), os.path.join('a', 'b', '2.txt'), os.path.join('c', '3.txt')]:
+            with open(os.path.join(self.tree, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        for root, dirs, files in os.walk(self.tmp.name):
+            for name in dirs:
+                os.chmod(os.path.join(root, name), stat.S_IRWXU)
+        self.tmp.cleanup()
+
+    # Test deleting a tree with read-only files and locked directories
+    def test_delete_tree(self):
+        os.chmod(os.path.join(self.tree, 'a', 'b', '2.txt'), stat.S_IRUSR)
+        os.chmod(os.path.join(self.tree, 'a', 'b'), stat.S_IRUSR | stat.S_IXUSR)
+        os.chmod(os.path.join(self.tree, 'c'), 0)
+        stats = delete_tree(self.tree, workers=2)
+        self.assertFalse(os.path.exists(self.tree))
+        self.assertEqual(stats['dirs'], 4)
+
+    # Test that a symlink to a directory is removed without touching its target
+    def test_symlink_not_followed(self):
+        outside = os.path.join(self.tmp.name, 'outside')
+        os.makedirs(outside)
+        with open(os.path.join(outside, 'keep.txt'), 'w') as f:
+            f.write('keep')
+        os.symlink(outside, os.path.join(self.tree, 'a', 'link'))
+        os.symlink(outside, os.path.join(self.tree, 'toplink'))
+        delete_path(self.tree)
+        self.assertFalse(os.path.exists(self.tree))
+        self.assertTrue(os.path.exists(os.path.join(outside, 'keep.txt')))
+
+    # Test that trashing renames right away and the purger empties the trash
+    def test_move_to_trash(self):
+        trashed = move_to_trash(self.tree)
+        self.assertFalse(os.path.exists(self.tree))
+        get_purger().join()
+        self.assertFalse(os.path.exists(trashed))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    # Test that trash left over by an earlier process is purged along with the next trashed path
+    def test_leftover_trash(self):
+        leftover = os.path.join(self.tmp.name, '.aidm-trash', 'old-tree')
+        os.makedirs(os.path.join(leftover, 'sub'))
+        with open(os.path.join(leftover, 'sub', 'file.txt'), 'w') as f:
+            f.write('old')
+        move_to_trash(self.tree)
+        self.assertTrue(get_purger().join(timeout=10))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    # Test that a process exiting right after trashing still purges its trash
+    def test_purged_at_exit(self):
+        src = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        script = f"import sys; sys.path.insert(0, {src!r}); from utils.delete_engine import move_to_trash; move_to_trash({self.tree!r})"
+        subprocess.run([sys.executable, '-c', script], check=True)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+if __name__ == '__main__':
+    unittest.main()
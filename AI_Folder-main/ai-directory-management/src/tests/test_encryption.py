@@ -0,0 +1,131 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from utils.encryption import (
+    STREAM, FERNET, detect_encryption, encrypt_stream, decrypt_stream,
+    encrypt_file_in_place, decrypt_file_in_place, encrypt_tree, decrypt_tree,
+)
+
+class TestStreamingEncryption(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, 'data.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def roundtrip(self, data, chunk_size):
+        encrypted = io.BytesIO()
+        encrypt_stream(io.BytesIO(data), encrypted, self.key, chunk_size=chunk_size)
+        decrypted = io.BytesIO()
+        decrypt_stream(io.BytesIO(encrypted.getvalue()), decrypted, self.key)
+        return encrypted.getvalue(), decrypted.getvalue()
+
+    # Test round trips around segment boundaries, including empty input
+    def test_roundtrip(self):
+        for size in (0, 1, 63, 64, 65, 640):
+            data = os.urandom(size)
+            _, decrypted = self.roundtrip(data, chunk_size=64)
+            self.assertEqual(decrypted, data)
+
+    # Test that truncating or tampering with the container is detected
+    def test_tampering_detected(self):
+        encrypted, _ = self.roundtrip(os.urandom(200), chunk_size=64)
+        segment_size = 64 + 16
+        truncated = encrypted[:len(encrypted) - (len(encrypted) - 36) % segment_size]
+        flipped = bytearray(encrypted)
+        flipped[40] ^= 1
+        for corrupted in (truncated, bytes(flipped)):
+            with self.assertRaises(InvalidTag):
+                decrypt_stream(io.BytesIO(corrupted), io.BytesIO(), self.key)
+
+    # Test that a corrupted chunk size is rejected before anything is read with it
+    def test_invalid_chunk_size(self):
+        encrypted, _ = self.roundtrip(os.urandom(100), chunk_size=64)
+        for chunk_size in (0, 2 ** 32 - 1):
+            corrupted = encrypted[:9] + struct.pack(">I", chunk_size) + encrypted[13:]
+            with self.assertRaises(ValueError):
+                decrypt_stream(io.BytesIO(corrupted), io.BytesIO(), self.key)
+
+    # Test in-place encryption and decryption of a file
+    def test_file_in_place(self):
+        data = os.urandom(5000)
+        with open(self.file_path, 'wb') as f:
+            f.write(data)
+        encrypt_file_in_place(self.file_path, self.key, chunk_size=1024)
+        self.assertEqual(detect_encryption(self.file_path), STREAM)
+        decrypt_file_in_place(self.file_path, self.key)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.listdir(self.tmp.name), ['data.bin'])
+
+    # Test that files encrypted with the old whole-file Fernet format still decrypt
+    def test_legacy_fernet(self):
+        with open(self.file_path, 'wb') as f:
+            f.write(Fernet(self.key).encrypt(b'legacy contents'))
+        self.assertEqual(detect_encryption(self.file_path), FERNET)
+        decrypt_file_in_place(self.file_path, self.key)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'legacy contents')
+
+    # Test that only real Fernet tokens are taken for legacy encrypted files
+    def test_fernet_detection(self):
+        for contents in (b'gAAAAA plain text', b'gAAAAABk' * 20, Fernet(self.key).encrypt(b'x')[:-4]):
+            with open(self.file_path, 'wb') as f:
+                f.write(contents)
+            self.assertIsNone(detect_encryption(self.file_path))
+
+class TestTreeEncryption(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tree = os.path.join(self.tmp.name, 'tree')
+        self.files = {
+            os.path.join('a', 'one.bin'): os.urandom(3000),
+            os.path.join('a', 'b', 'two.txt'): b'two',
+            '.notes.tmp': b'user file that looks like a temp file',
+            'fake.txt': b'gAAAAA is how this plain text starts',
+        }
+        for name, data in self.files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.tree, name)), exist_ok=True)
+            with open(os.path.join(self.tree, name), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self):
+        contents = {}
+        for name in self.files:
+            with open(os.path.join(self.tree, name), 'rb') as f:
+                contents[name] = f.read()
+        return contents
+
+    # Test a round trip of a tree and that encrypted files are skipped the second time
+    def test_tree_roundtrip(self):
+        stats = encrypt_tree(self.tree, self.key, workers=2)
+        self.assertEqual((stats['files'], stats['skipped'], stats['errors']), (4, 0, 0))
+        for name in self.files:
+            self.assertEqual(detect_encryption(os.path.join(self.tree, name)), STREAM)
+
+        stats = encrypt_tree(self.tree, self.key, workers=2)
+        self.assertEqual((stats['files'], stats['skipped']), (0, 4))
+
+        stats = decrypt_tree(self.tree, self.key, workers=2)
+        self.assertEqual((stats['files'], stats['errors']), (4, 0))
+        self.assertEqual(self.read_tree(), self.files)
+
+if __name__ == '__main__':
+    unittest.main()
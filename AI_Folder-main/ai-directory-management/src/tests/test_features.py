@@ -0,0 +1,85 @@
+import os
+import unittest
+import sys
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.categories import build_registry
+from ai.features import FeatureExtractor, LEGACY, FULL, LEGACY_COLUMNS
+from ai.model import FileCategorizer
+from ai.train import ModelTrainer
+
+METADATA = [
+    {'name': 'a.jpg', 'size': 500, 'type': 'image/jpeg'},
+    {'name': 'b.pdf', 'size': 2 << 20, 'type': 'application/pdf'},
+    {'name': 'README', 'size': 0, 'type': 'text/plain'},
+    {'name': 'c.xyz', 'size': 5 << 30, 'type': 'application/x-unknown'},
+]
+
+class TestFeatureExtractor(unittest.TestCase):
+
+    # Test that the legacy schema is the one-hot rule category of labeled_data.csv
+    def test_legacy_schema(self):
+        extractor = FeatureExtractor(LEGACY)
+        self.assertEqual(extractor.feature_names, LEGACY_COLUMNS)
+        features = extractor.transform(METADATA)
+        self.assertEqual(features.dtype, np.float32)
+        np.testing.assert_array_equal(features[:, :2], [[1, 0], [0, 1], [0, 0], [0, 0]])
+        self.assertEqual(features.sum(), 2)
+
+    # Test that each file sets one column per one-hot group in the full schema
+    def test_full_schema(self):
+        extractor = FeatureExtractor(FULL)
+        self.assertEqual(len(set(extractor.feature_names)), extractor.n_features)
+        features = extractor.transform(METADATA)
+        names = extractor.feature_names
+        self.assertEqual(features.shape, (4, extractor.n_features))
+        # category, extension, MIME major, MIME minor and size bucket
+        np.testing.assert_array_equal(np.delete(features, names.index('log2_size'), axis=1).sum(axis=1), [5] * 4)
+        self.assertEqual(features[0, names.index('category=Images')], 1)
+        self.assertEqual(features[0, names.index('extension=.jpg')], 1)
+        self.assertEqual(features[2, names.index('extension=')], 1)
+        self.assertEqual(features[3, names.index('extension=?')], 1)
+        self.assertEqual(features[3, names.index('mime_minor=?')], 1)
+        self.assertEqual(features[0, names.index('size_bucket=0')], 1)
+        self.assertEqual(features[3, names.index('size_bucket=6')], 1)
+        self.assertAlmostEqual(features[1, names.index('log2_size')], np.log2((2 << 20) + 1), places=4)
+
+    # Test that the trainer and the categorizer agree on the feature schema
+    def test_trained_model_is_used(self):
+        data = pd.DataFrame([dict(metadata, category='Small' if metadata['size'] < 1000 else 'Large')
+                             for metadata in METADATA])
+        X = ModelTrainer('unused.csv', 'unused.pkl').build_features(data)
+        self.assertEqual(list(X.columns), FeatureExtractor(FULL).feature_names)
+        model = DecisionTreeClassifier(random_state=0).fit(X, data['category'])
+        self.assertIs(FeatureExtractor.for_model(model).schema, FULL)
+
+        categorizer = FileCategorizer(model_path='unused.pkl')
+        categorizer.model = model
+        self.assertEqual(categorizer.predict_categories(METADATA), ['Small', 'Large', 'Small', 'Large'])
+
+    # Test that a model keeps working with the vocabulary it was trained on after the rules change
+    def test_saved_vocabulary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rules_file = os.path.join(tmp, 'categories.json')
+            with open(rules_file, 'w') as f:
+                json.dump({"Ebooks": {"mime_types": ["application/epub+zip"], "extensions": [".epub"]}}, f)
+            extractor = FeatureExtractor(FULL, registry=build_registry(rules_file))
+        self.assertNotEqual(extractor.feature_names, FeatureExtractor(FULL).feature_names)
+        X = pd.DataFrame(extractor.transform(METADATA), columns=extractor.feature_names)
+        model = DecisionTreeClassifier(random_state=0).fit(X, ['Small', 'Large', 'Small', 'Large'])
+
+        categorizer = FileCategorizer(model_path='unused.pkl')
+        categorizer.model = model
+        self.assertIsNone(FeatureExtractor.for_model(model))
+        categorizer.manifest = {'feature_vocabulary': json.loads(json.dumps(extractor.vocabulary))}
+        self.assertEqual(categorizer.predict_categories(METADATA), ['Small', 'Large', 'Small', 'Large'])
+
+if __name__ == '__main__':
+    unittest.main()
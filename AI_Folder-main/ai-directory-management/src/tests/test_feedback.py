@@ -0,0 +1,127 @@
+import os
+import json
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.feedback import mine_feedback, correction_rows, learn_from_journal, export_corrections
+from ai.model import IncrementalCategorizer, FileCategorizer, AIModel
+
+TARGET = os.path.join('data', 'sorted')
+
+
+def organize(name, category, when, size=100, file_type='application/octet-stream'):
+    return {'operation': 'move', 'time': when,
+            'details': {'source': os.path.join('data', 'inbox', name), 'target': os.path.join(TARGET, category, name),
+                        'category': category, 'size': size, 'type': file_type}}
+
+
+def move(source, target, when):
+    return {'operation': 'move', 'time': when, 'details': {'source': source, 'target': target}}
+
+
+class TestFeedback(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.tmp.name, 'operations.log')
+        self.model_path = os.path.join(self.tmp.name, 'feedback_model.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_journal(self, entries, mode='w'):
+        with open(self.journal, mode, encoding='utf-8') as log_file:
+            for entry in entries:
+                log_file.write(json.dumps(entry) + '\n')
+
+    # Test that only moves into a sibling category folder count as corrections
+    def test_mine_feedback(self):
+        entries = [
+            organize('a.foo', 'Others', 1),
+            organize('b.foo', 'Others', 2),
+            organize('c.jpg', 'Images', 3),
+            move(os.path.join(TARGET, 'Others', 'a.foo'), os.path.join(TARGET, 'Code', 'a.foo'), 4),
+            move(os.path.join(TARGET, 'Others', 'b.foo'), os.path.join('home', 'b.foo'), 5),
+            move(os.path.join(TARGET, 'Code', 'a.foo'), os.path.join(TARGET, 'Scripts', 'a.foo'), 6),
+        ]
+        events = list(mine_feedback(entries, confirmation_weight=0.5))
+        self.assertEqual([(event.category, event.weight, event.corrected) for event in events], [
+            ('Others', 0.5, False), ('Others', 0.5, False), ('Images', 0.5, False),
+            ('Others', -0.5, False), ('Code', 1.0, True),
+            ('Code', -1.0, False), ('Scripts', 1.0, True),
+        ])
+        self.assertEqual(correction_rows(events), [
+            {'name': 'a.foo', 'size': 100, 'type': 'application/octet-stream', 'category': 'Scripts'}])
+
+        csv_path = os.path.join(self.tmp.name, 'labeled.csv')
+        export_corrections(correction_rows(events), csv_path)
+        with open(csv_path) as csv_file:
+            self.assertEqual(csv_file.read().split(), ['name,size,type,category', 'a.foo,100,application/octet-stream,Scripts'])
+
+    # Test that new categories are learned and a negative weight takes a file back
+    def test_partial_fit(self):
+        model = IncrementalCategorizer(alpha=1.0)
+        files = [{'name': 'a.jpg', 'size': 10, 'type': 'image/jpeg'}, {'name': 'b.foo', 'size': 10, 'type': None}]
+        model.partial_fit(files, ['Images', 'Others'])
+        self.assertEqual(model.predict(files), ['Images', 'Others'])
+        model.partial_fit(files[1:], ['Others'], sample_weight=[-1.0])
+        model.partial_fit(files[1:] * 2, ['Code'] * 2)
+        self.assertEqual(model.classes_, ['Code', 'Images'])
+        self.assertEqual(model.predict(files), ['Images', 'Code'])
+
+    # Test that corrections learned from the journal override the categorizer
+    def test_learn_and_override(self):
+        entries = [organize(f'photo{index}.jpg', 'Images', index, file_type='image/jpeg') for index in range(5)]
+        for index in range(3):
+            name = f'tool{index}.foo'
+            entries.append(organize(name, 'Others', 10 + index))
+            entries.append(move(os.path.join(TARGET, 'Others', name), os.path.join(TARGET, 'Code', name), 20 + index))
+        self.write_journal(entries)
+
+        self.assertEqual(learn_from_journal(self.journal, self.model_path), {'files': 11, 'corrections': 3})
+        self.assertEqual(learn_from_journal(self.journal, self.model_path), {'files': 0, 'corrections': 0})
+        feedback = IncrementalCategorizer.load(self.model_path)
+        self.assertEqual(feedback.learned_position, [os.stat(self.journal).st_ino, os.path.getsize(self.journal)])
+        self.assertEqual(feedback.classes_, ['Code', 'Images'])
+
+        files = [{'name': 'new.foo', 'size': 50, 'type': 'application/octet-stream'},
+                 {'name': 'new.jpg', 'size': 50, 'type': 'image/jpeg'},
+                 {'name': 'new.bar', 'size': 50, 'type': 'application/octet-stream'}]
+        categorizer = FileCategorizer(model_path='unused.pkl')
+        categorizer.model = AIModel()
+        categorizer.feedback = feedback
+        self.assertEqual(categorizer.predict_categories(files), ['Code', 'Images', 'Others'])
+
+        # A single further correction is learned incrementally
+        self.write_journal([organize('more.foo', 'Others', 30),
+                            move(os.path.join(TARGET, 'Others', 'more.foo'), os.path.join(TARGET, 'Code', 'more.foo'), 31)],
+                           mode='a')
+        self.assertEqual(learn_from_journal(self.journal, self.model_path), {'files': 2, 'corrections': 1})
+        self.assertAlmostEqual(IncrementalCategorizer.load(self.model_path).class_weights['Code'], 4.0)
+
+    # Test that entries are learned once by journal position, whatever their times, across rotation
+    def test_learn_by_position(self):
+        self.write_journal([organize('a.jpg', 'Images', 100, file_type='image/jpeg')])
+        self.assertEqual(learn_from_journal(self.journal, self.model_path)['files'], 1)
+
+        # Written later by a process with a slower clock
+        self.write_journal([organize('b.jpg', 'Images', 50, file_type='image/jpeg')], mode='a')
+        # A line still being written is left for the next run
+        with open(self.journal, 'a', encoding='utf-8') as log_file:
+            log_file.write('{"operation": "mo')
+        self.assertEqual(learn_from_journal(self.journal, self.model_path)['files'], 1)
+
+        with open(self.journal, 'a', encoding='utf-8') as log_file:
+            log_file.write('ve", "time": 60, "details": {}}\n')
+        os.rename(self.journal, self.journal + '.1')
+        self.write_journal([organize('c.jpg', 'Images', 40, file_type='image/jpeg')])
+        self.assertEqual(learn_from_journal(self.journal, self.model_path)['files'], 1)
+        self.assertEqual(learn_from_journal(self.journal, self.model_path)['files'], 0)
+        self.assertAlmostEqual(IncrementalCategorizer.load(self.model_path).class_weights['Images'], 0.3)
+
+if __name__ == '__main__':
+    unittest.main()
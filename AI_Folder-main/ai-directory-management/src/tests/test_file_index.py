@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.model import AIModel
+from utils.scanner import scan_directory
+from utils.file_index import FileIndex, ACTION_ERROR, build_index, organize_files_incremental
+from utils.journal import reset_journal
+
+class _CountingModel(AIModel):
+    """Rule-based model that records how many files it classified."""
+
+    def __init__(self):
+        super().__init__()
+        self.classified = 0
+
+    def predict_categories(self, metadata_list):
+        self.classified += len(metadata_list)
+        return super().predict_categories(metadata_list)
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        reset_journal(os.path.join(self.tmp.name, 'operations.log'))
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.target = os.path.join(self.tmp.name, 'target')
+        self.db_path = os.path.join(self.tmp.name, 'index.db')
+        os.makedirs(self.source)
+        for name in ('a.jpg', 'b.pdf'):
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write(name)
+        self.model = _CountingModel()
+
+    def tearDown(self):
+        reset_journal()
+        self.tmp.cleanup()
+
+    # Test that building the index twice only classifies changed files
+    def test_build_index_is_incremental(self):
+        self.assertEqual(build_index(self.source, self.model, db_path=self.db_path)['changed'], 2)
+        with open(os.path.join(self.source, 'a.jpg'), 'a') as f:
+            f.write('changed')
+        self.assertEqual(build_index(self.source, self.model, db_path=self.db_path)['changed'], 1)
+        self.assertEqual(self.model.classified, 3)
+
+    # Test that organize --incremental reuses indexed categories
+    def test_organize_incremental(self):
+        build_index(self.source, self.model, db_path=self.db_path)
+        stats = organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path)
+        self.assertEqual(stats['moved'], 2)
+        self.assertEqual(self.model.classified, 2)
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Images', 'a.jpg')))
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Documents', 'b.pdf')))
+        with FileIndex(self.db_path) as index:
+            self.assertEqual(index.status()['actions'], {'move': 2})
+
+    # Test that a file moved back to the path it was organized from is organized again
+    def test_organize_moved_back(self):
+        organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path)
+        os.rename(os.path.join(self.target, 'Images', 'a.jpg'), os.path.join(self.source, 'a.jpg'))
+        stats = organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path)
+        self.assertEqual((stats['moved'], stats['skipped']), (1, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Images', 'a.jpg')))
+        self.assertEqual(os.listdir(self.source), [])
+
+    # Test that same-named files from different subfolders do not overwrite each other
+    def test_organize_recursive_collision(self):
+        for folder in ('x', 'y'):
+            os.makedirs(os.path.join(self.source, folder))
+            with open(os.path.join(self.source, folder, 'notes.txt'), 'w') as f:
+                f.write(folder)
+        stats = organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path, recursive=True)
+        self.assertEqual(stats['moved'], 4)
+        contents = set()
+        for name in os.listdir(os.path.join(self.target, 'Text')):
+            with open(os.path.join(self.target, 'Text', name)) as f:
+                contents.add(f.read())
+        self.assertEqual(contents, {'x', 'y'})
+
+    # Test that a failed move of an unchanged file is retried once its delay has passed
+    def test_organize_retries_errors(self):
+        with FileIndex(self.db_path) as index:
+            index.record([(entry, 'Images', ACTION_ERROR, None) for entry in scan_directory(self.source)
+                          if entry.name == 'a.jpg'])
+        stats = organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path)
+        self.assertEqual((stats['moved'], stats['skipped']), (1, 1))
+
+        with FileIndex(self.db_path) as index:
+            with index.conn:
+                index.conn.execute("UPDATE files SET updated = 0")
+        stats = organize_files_incremental(self.source, self.target, self.model, db_path=self.db_path)
+        self.assertEqual(stats['moved'], 1)
+        self.assertEqual(self.model.classified, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Images', 'a.jpg')))
+
+if __name__ == '__main__':
+    unittest.main()
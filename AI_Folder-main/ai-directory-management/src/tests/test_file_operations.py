@@ -1,16 +1,20 @@
 import os
+import tempfile
 import unittest
 import sys
 
 # Add the src directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
 
-from file_operations import move_file, categorize_file
+from file_operations import move_file, categorize_file, find_duplicates, deorganize_files
+from utils.journal import reset_journal
 
 class TestFileOperations(unittest.TestCase):
 
     # Create test files and directories
     def setUp(self):
+        self.journal_dir = tempfile.TemporaryDirectory()
+        reset_journal(os.path.join(self.journal_dir.name, 'operations.log'))
         self.test_source_dir = 'test_source'
         self.test_target_dir = 'test_target'
         os.makedirs(self.test_source_dir, exist_ok=True)
@@ -41,6 +45,8 @@ class TestFileOperations(unittest.TestCase):
             os.rmdir(self.test_target_dir)
         except OSError:
             pass
+        reset_journal()
+        self.journal_dir.cleanup()
 
     # Test the categorize_file function
     def test_categorize_file(self):
@@ -60,6 +66,41 @@ class TestFileOperations(unittest.TestCase):
         self.assertEqual(categorize_file('script.py', categories), 'Code')
         self.assertEqual(categorize_file('unknown_file.xyz', categories), 'Others')
 
+    # Test the categorize_file function with the shared category registry
+    def test_categorize_file_default_registry(self):
+        self.assertEqual(categorize_file('image.jpg'), 'Images')
+        self.assertEqual(categorize_file('script.py'), 'Scripts')
+        self.assertEqual(categorize_file('unknown_file.xyz'), 'Others')
+
+    # Test the find_duplicates function
+    def test_find_duplicates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, 'sub'))
+            same = b'x' * 20000
+            differs_in_middle = same[:10000] + b'y' + same[10001:]
+            for rel_path, content in (('a.bin', same), (os.path.join('sub', 'b.bin'), same),
+                                      ('c.bin', differs_in_middle), ('d.txt', b'other')):
+                with open(os.path.join(tmp, rel_path), 'wb') as f:
+                    f.write(content)
+            duplicates = find_duplicates(tmp, recursive=True)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['size'], 20000)
+        self.assertEqual([os.path.basename(path) for path in duplicates[0]['paths']], ['a.bin', 'b.bin'])
+
+    # Test the deorganize_files function
+    def test_deorganize_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rel_path in ('a.txt', os.path.join('Text', 'a.txt'), os.path.join('Text', 'old', 'a.txt'),
+                             os.path.join('Images', 'b.jpg')):
+                os.makedirs(os.path.dirname(os.path.join(tmp, rel_path)), exist_ok=True)
+                with open(os.path.join(tmp, rel_path), 'w') as f:
+                    f.write(rel_path)
+            stats = deorganize_files(tmp, workers=2)
+            self.assertEqual((stats['moved'], stats['errors'], stats['pruned']), (3, 0, 3))
+            self.assertEqual(sorted(os.listdir(tmp)), ['a (1).txt', 'a (2).txt', 'a.txt', 'b.jpg'])
+            with open(os.path.join(tmp, 'a (2).txt')) as f:
+                self.assertEqual(f.read(), os.path.join('Text', 'old', 'a.txt'))
+
     # Test the move_file function
     def test_move_file(self):
         move_file(os.path.join(self.test_source_dir, 'image.jpg'), os.path.join(self.test_target_dir, 'image.jpg'))
@@ -0,0 +1,93 @@
+import os
+import json
+import tempfile
+import unittest
+import sys
+from unittest import mock
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.journal import OperationJournal
+from utils.log_viewer import LogIndex
+from utils.file_operations import move_file
+
+class TestOperationJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'operations.log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_entries(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    # Test that flush() writes every queued entry in order
+    def test_flush(self):
+        journal = OperationJournal(self.path, flush_every_entries=1000, flush_every_ms=60000)
+        for i in range(10):
+            journal.append('move', {'source': f'a{i}', 'target': f'b{i}'})
+        journal.flush()
+        entries = self.read_entries(self.path)
+        self.assertEqual([entry['details']['source'] for entry in entries], [f'a{i}' for i in range(10)])
+        self.assertIn('time', entries[0])
+        journal.close()
+
+    # Test that close() writes the remaining entries
+    def test_close(self):
+        journal = OperationJournal(self.path, flush_every_entries=1000, flush_every_ms=60000, fsync='close')
+        journal.append('copy', {'source': 'a', 'target': 'b'})
+        journal.close()
+        self.assertEqual(self.read_entries(self.path)[0]['operation'], 'copy')
+        with self.assertRaises(ValueError):
+            journal.append('copy', {})
+
+    # Test size-bounded rotation
+    def test_rotation(self):
+        journal = OperationJournal(self.path, flush_every_entries=1, max_bytes=200, backup_count=2)
+        for i in range(20):
+            journal.append('move', {'source': 'x' * 50, 'target': str(i)})
+        journal.close()
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertEqual(self.read_entries(self.path + '.1')[-1]['details']['target'], '19')
+
+    # Test that rotation moves the log viewer's offset indexes along with the segments
+    def test_rotation_moves_indexes(self):
+        journal = OperationJournal(self.path, flush_every_entries=1, max_bytes=200, backup_count=1)
+        journal.append('move', {'source': 'x' * 50, 'target': '0'})
+        journal.flush()
+        LogIndex(self.path).update()
+        # The second entry fills the log, which is rotated into operations.log.1
+        journal.append('move', {'source': 'x' * 50, 'target': '1'})
+        journal.flush()
+        self.assertFalse(os.path.exists(self.path + '.idx'))
+        self.assertTrue(os.path.exists(self.path + '.1.idx'))
+        self.assertEqual(LogIndex(self.path + '.1').update(), 2)
+
+        # Replacing operations.log.1 with an unindexed segment drops its index
+        for i in range(2, 4):
+            journal.append('move', {'source': 'x' * 50, 'target': str(i)})
+        journal.close()
+        self.assertEqual(self.read_entries(self.path + '.1')[-1]['details']['target'], '3')
+        self.assertFalse(os.path.exists(self.path + '.1.idx'))
+        self.assertFalse(os.path.exists(self.path + '.2'))
+
+    # Test that a move still succeeds when the journal can no longer take entries
+    def test_closed_journal_move(self):
+        journal = OperationJournal(self.path)
+        journal.close()
+        source = os.path.join(self.tmp.name, 'a.txt')
+        with open(source, 'w') as f:
+            f.write('a')
+        target = os.path.join(self.tmp.name, 'b.txt')
+        with mock.patch('utils.journal._journal', journal):
+            self.assertEqual(move_file(source, target, show_dialog=False), target)
+        self.assertTrue(os.path.exists(target))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import json
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.log_viewer import LogIndex, tail_log, parse_log_time
+
+class TestLogViewer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'operations.log')
+        self.write_entries(self.path, range(100))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_entries(self, path, numbers, mode='w'):
+        with open(path, mode) as f:
+            for i in numbers:
+                operation = 'move' if i % 2 else 'copy'
+                f.write(json.dumps({'operation': operation, 'details': {'source': f'/src/{i % 3}/f{i}'}, 'time': 1000 + i}) + '\n')
+
+    def times(self, lines):
+        return [json.loads(line)['time'] for line in lines]
+
+    # Test that the tail and its pages come back in chronological order
+    def test_tail_pages(self):
+        self.assertEqual(self.times(tail_log(self.path, limit=3)), [1097, 1098, 1099])
+        self.assertEqual(self.times(tail_log(self.path, limit=3, page=1)), [1094, 1095, 1096])
+
+    # Test the operation, path prefix and time range filters
+    def test_filters(self):
+        lines = tail_log(self.path, limit=100, operation='move', path_prefix='/src/1/', since=1050, until=1080)
+        self.assertEqual(self.times(lines), [1000 + i for i in range(50, 81) if i % 2 and i % 3 == 1])
+
+    # Test that the sidecar index is extended as the log grows and rebuilt when it is replaced
+    def test_index_update(self):
+        index = LogIndex(self.path)
+        self.assertEqual(index.update(), 100)
+        self.write_entries(self.path, range(100, 110), mode='a')
+        with open(self.path, 'a') as f:
+            f.write('{"operation": "partial')
+        self.assertEqual(index.update(), 110)
+        self.assertEqual(self.times(tail_log(self.path, limit=1)), [1109])
+
+        os.replace(self.path, self.path + '.1')
+        self.write_entries(self.path, range(200, 202))
+        self.assertEqual(LogIndex(self.path).update(), 2)
+        # Older entries continue into the rotated segment
+        self.assertEqual(self.times(tail_log(self.path, limit=3)), [1109, 1200, 1201])
+
+    # Test parsing of time range arguments
+    def test_parse_log_time(self):
+        self.assertEqual(parse_log_time('1500.5'), 1500.5)
+        self.assertIsInstance(parse_log_time('2024-01-02T03:04:05'), float)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,15 @@
 import unittest
 import sys
 import os
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
 
 # Add the ai directory to the sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ai')))
 
-from model import AIModel
+from model import AIModel, FileCategorizer, CompiledForest
 
 class TestAIModel(unittest.TestCase):
 
@@ -52,5 +56,102 @@ class TestAIModel(unittest.TestCase):
         accuracy = self.model.evaluate(test_data)
         self.assertGreaterEqual(accuracy, 0.8)  
 
+class _CountingModel:
+    """Stand-in for the trained forest that records how often it is called."""
+    n_features_in_ = 5
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, features):
+        self.calls += 1
+        labels = ['Images', 'Documents', 'Videos', 'Audio', 'Archives']
+        return [labels[row.argmax()] for row in features]
+
+class TestFileCategorizer(unittest.TestCase):
+
+    def setUp(self):
+        self.categorizer = FileCategorizer(model_path='unused.pkl')
+        self.categorizer.model = _CountingModel()
+
+    # Test that a batch is classified with a single model call
+    def test_predict_categories_single_model_call(self):
+        metadata_list = [
+            {'name': 'a.jpg', 'size': 1, 'type': 'image/jpeg'},
+            {'name': 'b.pdf', 'size': 1, 'type': 'application/pdf'},
+            {'name': 'c.zip', 'size': 1, 'type': 'application/zip'},
+            {'name': 'd.xyz', 'size': 1, 'type': 'application/x-unknown'},
+            {'name': 'e.mp4', 'size': 1, 'type': 'video/mp4'},
+        ]
+        categories = self.categorizer.predict_categories(metadata_list)
+        # The model's 'Videos' label is filed under the rules' 'Video' folder
+        self.assertEqual(categories, ['Images', 'Documents', 'Archives', 'Others', 'Video'])
+        self.assertEqual(self.categorizer.model.calls, 1)
+
+    # Test that a model trained on a different feature schema is not used
+    def test_predict_categories_schema_mismatch(self):
+        self.categorizer.model.n_features_in_ = 3
+        categories = self.categorizer.predict_categories([{'name': 'a.mp4', 'size': 1, 'type': 'video/mp4'}])
+        self.assertEqual(categories, ['Video'])
+        self.assertEqual(self.categorizer.model.calls, 0)
+
+    # Test that the single-file API matches the batch API
+    def test_predict_category_wraps_batch(self):
+        file_metadata = {'name': 'a.png', 'size': 1, 'type': 'image/png'}
+        self.assertEqual(self.categorizer.predict_category(file_metadata),
+                         self.categorizer.predict_categories([file_metadata])[0])
+
+    # Test that predicting without a model on disk falls back to the category rules
+    def test_predict_categories_without_model(self):
+        self.categorizer.model = None
+        with self.assertLogs(level='WARNING') as logs:
+            categories = self.categorizer.predict_categories([{'name': 'a.mp4', 'size': 1, 'type': 'video/mp4'},
+                                                              {'name': 'b.xyz', 'size': 1, 'type': 'application/x-unknown'}])
+        self.assertEqual(categories, ['Video', 'Others'])
+        self.assertEqual(len(logs.records), 1)
+        # The missing model is not looked for again
+        self.assertEqual(self.categorizer.predict_category({'name': 'c.pdf', 'size': 1, 'type': 'application/pdf'}),
+                         'Documents')
+
+class TestCompiledForest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(500, 6).astype(np.float32)
+        self.y = np.array(['a', 'b', 'c'])[(self.X[:, 0] * 3 + rng.rand(500)).astype(int) % 3]
+        self.forest = RandomForestClassifier(n_estimators=40, max_depth=8, random_state=0).fit(self.X, self.y)
+        # Training values sit right next to the split thresholds
+        self.X_new = np.vstack([rng.rand(300, 6), self.X[:100]])
+
+    # Test that compiled predictions are bit-identical to scikit-learn's
+    def test_bit_identical(self):
+        compiled = CompiledForest.from_sklearn(self.forest)
+        self.assertTrue(np.array_equal(compiled.predict_proba(self.X_new), self.forest.predict_proba(self.X_new)))
+        np.testing.assert_array_equal(compiled.predict(self.X_new), self.forest.predict(self.X_new))
+
+        tree = DecisionTreeClassifier(random_state=0).fit(self.X, self.y)
+        compiled = CompiledForest.from_sklearn(tree)
+        self.assertTrue(np.array_equal(compiled.predict_proba(self.X_new), tree.predict_proba(self.X_new)))
+
+    # Test that missing values follow the learned missing-value direction
+    def test_missing_values(self):
+        X = self.X.copy()
+        X[::7, 1] = np.nan
+        forest = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, self.y)
+        X_new = self.X_new.copy()
+        X_new[::3, 1] = np.nan
+        compiled = CompiledForest.from_sklearn(forest)
+        self.assertTrue(np.array_equal(compiled.predict_proba(X_new), forest.predict_proba(X_new)))
+
+    # Test that saved arrays load back memory-mapped with the same predictions
+    def test_save_load(self):
+        compiled = CompiledForest.from_sklearn(self.forest)
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = compiled.save_arrays(directory)
+            loaded = CompiledForest.load(directory, manifest, mmap_mode='r')
+            self.assertIsInstance(loaded.threshold, np.memmap)
+            np.testing.assert_array_equal(loaded.predict(self.X_new), self.forest.predict(self.X_new))
+            del loaded
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.model import AIModel
+from utils.pipeline import organize_files_pipelined
+from utils.scanner import scan_directory
+from utils.journal import reset_journal
+
+class _VanishingModel(AIModel):
+    """Rule-based model that deletes the named files before they are moved."""
+
+    def __init__(self, source, vanish=()):
+        super().__init__()
+        self.source = source
+        self.vanish = vanish
+
+    def predict_categories(self, metadata_list):
+        for name in self.vanish:
+            if os.path.exists(os.path.join(self.source, name)):
+                os.remove(os.path.join(self.source, name))
+        return super().predict_categories(metadata_list)
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        reset_journal(os.path.join(self.tmp.name, 'operations.log'))
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.target = os.path.join(self.tmp.name, 'target')
+        os.makedirs(self.source)
+        for name in ('a.jpg', 'b.pdf', 'c.txt'):
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        reset_journal()
+        self.tmp.cleanup()
+
+    # Test that the pipeline files every file into its category folder
+    def test_organize_pipelined(self):
+        stats = organize_files_pipelined(self.source, self.target, AIModel(), move_workers=2)
+        self.assertEqual(stats['files'], 3)
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Images', 'a.jpg')))
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'Documents', 'b.pdf')))
+        self.assertEqual(os.listdir(self.source), [])
+
+    # Test that files that could not be moved are not counted
+    def test_failed_moves_not_counted(self):
+        model = _VanishingModel(self.source, vanish=('b.pdf',))
+        stats = organize_files_pipelined(self.source, self.target, model)
+        self.assertEqual(stats['files'], 2)
+
+    # Test that a failing scan still lets the stages finish instead of hanging
+    def test_scan_error(self):
+        def failing_scan(*args, **kwargs):
+            for entry in scan_directory(*args, **kwargs):
+                yield entry
+                raise OSError("scan failed")
+
+        with mock.patch('utils.pipeline.scan_directory', failing_scan):
+            self.assertIsNone(organize_files_pipelined(self.source, self.target, AIModel()))
+        self.assertEqual(len(os.listdir(self.source)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
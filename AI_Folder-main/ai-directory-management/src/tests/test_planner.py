@@ -0,0 +1,122 @@
+import os
+import time
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.model import AIModel
+from utils.planner import MovePlan, plan_organize, plan_sort_by_date, plan_deorganize, execute_plan, resolve_collision
+from utils.journal import reset_journal
+
+class TestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        reset_journal(os.path.join(self.tmp.name, 'operations.log'))
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.target = os.path.join(self.tmp.name, 'target')
+        os.makedirs(os.path.join(self.source, 'sub'))
+        os.makedirs(os.path.join(self.target, 'Images'))
+        for name in ['photo.jpg', 'notes.txt', os.path.join('sub', 'photo.jpg')]:
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write(name)
+        with open(os.path.join(self.target, 'Images', 'photo.jpg'), 'w') as f:
+            f.write('existing')
+
+    def tearDown(self):
+        reset_journal()
+        self.tmp.cleanup()
+
+    # Test collision suffixes
+    def test_resolve_collision(self):
+        occupied = {'a.txt', 'a (1).txt'}
+        self.assertEqual(resolve_collision('a.txt', occupied), 'a (2).txt')
+        self.assertEqual(resolve_collision('b.txt', occupied), 'b.txt')
+        self.assertIn('a (2).txt', occupied)
+
+    # Test that planning moves nothing and avoids existing and planned names
+    def test_plan_organize(self):
+        plan = plan_organize(self.source, self.target, AIModel(), recursive=True)
+        self.assertTrue(os.path.exists(os.path.join(self.source, 'photo.jpg')))
+        self.assertEqual(plan.summary(), {'Images': 2, 'Text': 1})
+        images = sorted(os.path.basename(move.destination) for move in plan if move.category == 'Images')
+        self.assertEqual(images, ['photo (1).jpg', 'photo (2).jpg'])
+
+    # Test that a saved plan loads back and executes
+    def test_save_load_execute(self):
+        plan_path = os.path.join(self.tmp.name, 'plan.json')
+        plan_organize(self.source, self.target, AIModel(), recursive=True).save(plan_path)
+        plan = MovePlan.load(plan_path)
+        self.assertEqual(len(plan), 3)
+        # Organize moves keep the metadata their category was predicted from
+        self.assertEqual({move.metadata['name'] for move in plan}, {'photo.jpg', 'notes.txt'})
+
+        stats = execute_plan(plan, workers=2, batch_size=1)
+        self.assertEqual((stats['moved'], stats['errors']), (3, 0))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.target, 'Images'))),
+                         ['photo (1).jpg', 'photo (2).jpg', 'photo.jpg'])
+        self.assertEqual(os.listdir(os.path.join(self.target, 'Text')), ['notes.txt'])
+        self.assertFalse(os.path.exists(os.path.join(self.source, 'photo.jpg')))
+
+    # Test that a file created at a planned destination after planning is not replaced
+    def test_execute_plan_keeps_new_files(self):
+        plan = plan_organize(self.source, self.target, AIModel())
+        os.makedirs(os.path.join(self.target, 'Text'))
+        with open(os.path.join(self.target, 'Text', 'notes.txt'), 'w') as f:
+            f.write('created later')
+        stats = execute_plan(plan, workers=1)
+        self.assertEqual((stats['moved'], stats['errors']), (2, 0))
+        with open(os.path.join(self.target, 'Text', 'notes.txt')) as f:
+            self.assertEqual(f.read(), 'created later')
+        with open(os.path.join(self.target, 'Text', 'notes (1).txt')) as f:
+            self.assertEqual(f.read(), 'notes.txt')
+
+    # Test the date folder names for each granularity
+    def test_plan_sort_by_date(self):
+        noon = time.mktime((2021, 3, 10, 12, 0, 0, 0, 0, -1))
+        for name in ['photo.jpg', 'notes.txt', os.path.join('sub', 'photo.jpg')]:
+            os.utime(os.path.join(self.source, name), (noon, noon))
+        expected = {'year': '2021', 'month': '2021-03', 'week': '2021-W10', 'day': '2021-03-10'}
+        for granularity, folder in expected.items():
+            plan = plan_sort_by_date(self.source, self.target, recursive=True, granularity=granularity)
+            self.assertEqual(plan.summary(), {folder: 3})
+            self.assertEqual(plan.directories(), [os.path.join(self.target, folder)])
+
+    # Test day folders in a time zone whose offset is not a multiple of 15 minutes
+    @unittest.skipUnless(hasattr(time, 'tzset'), "needs time.tzset")
+    def test_plan_sort_by_date_odd_offset(self):
+        previous = os.environ.get('TZ')
+        os.environ['TZ'] = 'Europe/Amsterdam'
+        time.tzset()
+        try:
+            # Amsterdam summer time in 1930 was +01:19:32, so this is 1930-06-02 00:00:02 local time
+            after_midnight = time.mktime((1930, 6, 2, 0, 0, 2, 0, 0, -1))
+            if time.localtime(after_midnight - 600)[:3] != (1930, 6, 1):
+                self.skipTest("historical time zone data is not available")
+            os.utime(os.path.join(self.source, 'photo.jpg'), (after_midnight, after_midnight))
+            os.utime(os.path.join(self.source, 'notes.txt'), (after_midnight - 4, after_midnight - 4))
+            plan = plan_sort_by_date(self.source, self.target, granularity='day')
+            self.assertEqual(plan.summary(), {'1930-06-02': 1, '1930-06-01': 1})
+        finally:
+            if previous is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
+
+    # Test that flattening resolves collisions deterministically and skips desktop.ini
+    def test_plan_deorganize(self):
+        os.makedirs(os.path.join(self.source, 'a'))
+        for name in [os.path.join('a', 'photo.jpg'), os.path.join('sub', 'desktop.ini')]:
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write(name)
+        plan = plan_deorganize(self.source)
+        moves = [(os.path.relpath(move.source, self.source), os.path.basename(move.destination)) for move in plan]
+        self.assertEqual(moves, [(os.path.join('a', 'photo.jpg'), 'photo (1).jpg'),
+                                 (os.path.join('sub', 'photo.jpg'), 'photo (2).jpg')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.scanner import scan_directory, file_metadata
+
+class TestScanner(unittest.TestCase):
+
+    # Create a small tree: a.txt, sub/b.jpg, sub/deeper/c.pdf
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, 'sub', 'deeper'))
+        for rel_path in ('a.txt', os.path.join('sub', 'b.jpg'), os.path.join('sub', 'deeper', 'c.pdf')):
+            with open(os.path.join(self.root, rel_path), 'w') as f:
+                f.write('data')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def names(self, **kwargs):
+        return sorted(entry.name for entry in scan_directory(self.root, **kwargs))
+
+    # Test that only the top level is scanned by default
+    def test_top_level(self):
+        self.assertEqual(self.names(), ['a.txt'])
+        self.assertEqual(self.names(include_dirs=True), ['a.txt', 'sub'])
+
+    # Test recursion with and without a depth limit
+    def test_recursive(self):
+        self.assertEqual(self.names(recursive=True), ['a.txt', 'b.jpg', 'c.pdf'])
+        self.assertEqual(self.names(recursive=True, max_depth=1), ['a.txt', 'b.jpg'])
+
+    # Test excluding a directory
+    def test_exclude(self):
+        self.assertEqual(self.names(recursive=True, exclude=(os.path.join(self.root, 'sub', 'deeper'),)),
+                         ['a.txt', 'b.jpg'])
+
+    # Test that entries carry their stat result and depth
+    def test_entry_metadata(self):
+        entries = {entry.name: entry for entry in scan_directory(self.root, recursive=True)}
+        self.assertEqual(entries['c.pdf'].depth, 2)
+        self.assertEqual(entries['c.pdf'].stat.st_size, 4)
+        self.assertEqual(file_metadata(entries['b.jpg']), {'name': 'b.jpg', 'size': 4, 'type': 'image/jpeg'})
+
+    # Test that symlinked directories are only followed when asked to
+    @unittest.skipUnless(hasattr(os, 'symlink') and os.name != 'nt', "symlinks required")
+    def test_symlinks(self):
+        os.symlink(os.path.join(self.root, 'sub'), os.path.join(self.root, 'link'))
+        os.symlink(self.root, os.path.join(self.root, 'sub', 'loop'))
+        self.assertEqual(self.names(recursive=True), ['a.txt', 'b.jpg', 'c.pdf'])
+        self.assertEqual(self.names(recursive=True, follow_symlinks=True), ['a.txt', 'b.jpg', 'c.pdf'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import sys
+from unittest import mock
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import sniffer
+from utils.sniffer import SniffCache, sniff_bytes, needs_sniffing, detect_type, read_only_cache, get_sniff_cache
+
+class TestSniffer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SniffCache(os.path.join(self.tmp.name, 'sniff.db'))
+        patcher = mock.patch.object(sniffer, '_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    # Test the builtin signature table
+    def test_sniff_bytes(self):
+        self.assertEqual(sniff_bytes(b'%PDF-1.7\n'), 'application/pdf')
+        self.assertEqual(sniff_bytes(b'\x00\x00\x00\x18ftypqt  '), 'video/quicktime')
+        self.assertEqual(sniff_bytes(b'PK\x03\x04' + b'\x00' * 26 + b'[Content_Types].xml word/document.xml'),
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        self.assertEqual(sniff_bytes(b'#!/usr/bin/env python3\nprint(1)\n'), 'application/x-python-code')
+        self.assertEqual(sniff_bytes('héllo'.encode('utf-8')[:-1]), 'text/plain')
+        self.assertIsNone(sniff_bytes(b'\x00\x01\x02\x03garbage'))
+
+    # Test that only extensionless, unknown or ambiguous extensions are sniffed
+    def test_needs_sniffing(self):
+        self.assertTrue(needs_sniffing('README'))
+        self.assertTrue(needs_sniffing('download.bin'))
+        self.assertTrue(needs_sniffing('photo.qqq'))
+        self.assertFalse(needs_sniffing('photo.jpg'))
+
+    # Test that a misnamed file is detected and later served from the cache
+    def test_detect_type_cached(self):
+        path = self.write('scan', b'%PDF-1.4\n')
+        with mock.patch.object(sniffer, 'magic', None):
+            self.assertEqual(detect_type(path), 'application/pdf')
+            with mock.patch.object(sniffer, 'read_head', side_effect=AssertionError("read twice")):
+                self.assertEqual(detect_type(path), 'application/pdf')
+            self.cache.flush()
+            self.assertEqual(SniffCache(self.cache.db_path).get(os.stat(path)), (True, 'application/pdf'))
+
+            # A changed file is sniffed again
+            with open(path, 'wb') as f:
+                f.write(b'\x89PNG\r\n\x1a\n and more')
+            self.assertEqual(detect_type(path), 'image/png')
+
+    # Test that a failed read is not cached
+    def test_read_error_not_cached(self):
+        path = self.write('scan', b'%PDF-1.4\n')
+        with mock.patch.object(sniffer, 'magic', None):
+            with mock.patch.object(sniffer, 'read_head', side_effect=PermissionError("locked")):
+                self.assertEqual(detect_type(path), 'application/octet-stream')
+            self.assertEqual(detect_type(path), 'application/pdf')
+
+    # Test that files with a known extension are never read
+    def test_known_extension_not_read(self):
+        path = self.write('notes.txt', b'%PDF-1.4\n')
+        with mock.patch.object(sniffer, 'read_head', side_effect=AssertionError("read")):
+            self.assertEqual(detect_type(path), 'text/plain')
+
+    # Test that types sniffed inside read_only_cache are not recorded
+    def test_read_only_cache(self):
+        path = self.write('scan', b'%PDF-1.4\n')
+        with mock.patch.object(sniffer, 'magic', None):
+            with read_only_cache():
+                self.assertEqual(detect_type(path), 'application/pdf')
+            self.assertEqual(self.cache.get(os.stat(path)), (False, None))
+
+    # Test that the default cache goes to the user cache directory and is not created read-only
+    @unittest.skipIf(os.name == 'nt' or sys.platform == 'darwin', "XDG cache directory")
+    def test_default_cache_path(self):
+        cache_home = os.path.join(self.tmp.name, 'cache')
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home}), \
+                mock.patch.dict(sniffer.SNIFF_SETTINGS, {'cache_path': None}), \
+                mock.patch.object(sniffer, '_cache', None):
+            self.assertIsNone(get_sniff_cache(create=False))
+            self.assertFalse(os.path.exists(os.path.join(cache_home, 'ai-directory-management', 'sniff_cache.db')))
+            cache = get_sniff_cache()
+            try:
+                self.assertEqual(cache.db_path, os.path.join(cache_home, 'ai-directory-management', 'sniff_cache.db'))
+            finally:
+                cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
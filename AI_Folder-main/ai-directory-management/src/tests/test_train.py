@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+import sys
+import pandas as pd
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import TRAIN_SETTINGS
+from ai.artifact import load_artifact
+from ai.features import FeatureExtractor, FULL
+from ai.train import ModelTrainer
+
+ROWS = [
+    {'name': 'a.jpg', 'size': 500, 'type': 'image/jpeg', 'category': 'Images'},
+    {'name': 'b.pdf', 'size': 2 << 20, 'type': 'application/pdf', 'category': 'Documents'},
+    {'name': 'c.png', 'size': 900, 'type': 'image/png', 'category': 'Images'},
+    {'name': 'd.txt', 'size': 40, 'type': 'text/plain', 'category': 'Documents'},
+]
+
+class TestModelTrainer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp.name, 'labeled_data.csv')
+        self.root = os.path.join(self.tmp.name, 'models')
+        self.settings = dict(TRAIN_SETTINGS)
+        TRAIN_SETTINGS.update(n_estimators=4, warm_start_trees=2, max_trees=7, n_jobs=1, chunk_size=3)
+
+    def tearDown(self):
+        TRAIN_SETTINGS.update(self.settings)
+        self.tmp.cleanup()
+
+    def write_rows(self, copies):
+        pd.DataFrame(ROWS * copies).to_csv(self.data_path, index=False)
+
+    # Test that chunked loading featurizes every row into float32 columns
+    def test_load_data_in_chunks(self):
+        self.write_rows(2)
+        data = ModelTrainer(self.data_path, self.root).load_data()
+        self.assertEqual(len(data), 8)
+        self.assertEqual(list(data['category'][:2]), ['Images', 'Documents'])
+        self.assertTrue(all(str(dtype) == 'float32' for dtype in data.drop(['category', 'held_out'], axis=1).dtypes))
+
+    # Test that appended rows leave the held-out rows of the earlier data unchanged
+    def test_fixed_held_out_rows(self):
+        self.write_rows(3)
+        before = ModelTrainer(self.data_path, self.root).load_data()['held_out']
+        self.write_rows(5)
+        after = ModelTrainer(self.data_path, self.root).load_data()['held_out']
+        self.assertEqual(list(after[:len(before)]), list(before))
+        self.assertTrue(after.any() and not after.all())
+
+    # Test that a rerun grows the last forest only when labeled rows were appended
+    def test_warm_start(self):
+        self.write_rows(3)
+        trainer = ModelTrainer(self.data_path, self.root)
+        first = trainer.run()
+        self.assertEqual(len(trainer.model.estimators_), 4)
+        self.assertEqual([phase[0] for phase in trainer.phases], ['load', 'split', 'train', 'evaluate', 'save'])
+
+        self.assertIsNone(ModelTrainer(self.data_path, self.root).run())
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'trainer_state.joblib')))
+
+        # Rewritten with the same contents
+        self.write_rows(3)
+        self.assertIsNone(ModelTrainer(self.data_path, self.root).run())
+
+        self.write_rows(5)
+        trainer = ModelTrainer(self.data_path, self.root)
+        second = trainer.run()
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(trainer.model.estimators_), 6)
+        _, manifest = load_artifact(second)
+        self.assertEqual(manifest['n_trees'], 6)
+        self.assertEqual(FeatureExtractor(FULL, vocabulary=manifest['feature_vocabulary']).feature_names,
+                         manifest['feature_names'])
+
+        # Capped at max_trees by dropping the oldest trees
+        self.write_rows(6)
+        trainer = ModelTrainer(self.data_path, self.root)
+        trainer.run()
+        self.assertEqual(len(trainer.model.estimators_), 7)
+        # Trees added after dropping old ones do not reuse their seeds
+        self.assertEqual(len({tree.random_state for tree in trainer.model.estimators_}), 7)
+
+        trainer = ModelTrainer(self.data_path, self.root)
+        trainer.run(full=True)
+        self.assertEqual(len(trainer.model.estimators_), 4)
+
+    # Test that edited rows are trained from scratch even when the row count grew
+    def test_edited_data(self):
+        self.write_rows(3)
+        ModelTrainer(self.data_path, self.root).run()
+        rows = [dict(row, size=row['size'] + 1) for row in ROWS]
+        pd.DataFrame(rows * 4).to_csv(self.data_path, index=False)
+        trainer = ModelTrainer(self.data_path, self.root)
+        self.assertIsNotNone(trainer.run())
+        self.assertEqual(len(trainer.model.estimators_), 4)
+
+if __name__ == '__main__':
+    unittest.main()
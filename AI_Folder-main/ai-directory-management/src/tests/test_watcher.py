@@ -0,0 +1,178 @@
+import os
+import tempfile
+import unittest
+import sys
+import time
+import threading
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import INDEX_SETTINGS
+from ai.model import AIModel
+from utils.file_index import FileIndex, ACTION_MOVED, ACTION_ERROR
+from utils.scanner import scan_directory
+from utils.watcher import CoalescingQueue, SettleWheel, FolderWatcher, is_transient
+
+class TestCoalescingQueue(unittest.TestCase):
+
+    # Test that repeated puts of a path are handed out once, in first-seen order
+    def test_coalesce(self):
+        queue = CoalescingQueue(max_size=10)
+        for path in ['a', 'b', 'a', 'c', 'a']:
+            queue.put(path)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.get_batch(2), ['a', 'b'])
+        self.assertEqual(queue.get_batch(2), ['c'])
+
+    # Test that a full queue drops new paths and requests a rescan once
+    def test_overflow(self):
+        queue = CoalescingQueue(max_size=2)
+        self.assertTrue(queue.put('a'))
+        self.assertTrue(queue.put('b'))
+        self.assertTrue(queue.put('a'))
+        self.assertFalse(queue.put('c'))
+        self.assertTrue(queue.take_rescan_request())
+        self.assertFalse(queue.take_rescan_request())
+
+    # Test that a rescan request wakes a worker waiting on an empty queue
+    def test_rescan_wakes_waiter(self):
+        queue = CoalescingQueue(max_size=10)
+        batches = []
+        waiter = threading.Thread(target=lambda: batches.append(queue.get_batch(10)))
+        waiter.start()
+        time.sleep(0.05)
+        queue.request_rescan()
+        waiter.join(timeout=5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(batches, [[]])
+        self.assertTrue(queue.take_rescan_request())
+
+    # Test that discarded paths are skipped and a closed queue drains before returning None
+    def test_discard_and_close(self):
+        queue = CoalescingQueue(max_size=10)
+        queue.put('a')
+        queue.put('b')
+        queue.discard('a')
+        queue.close()
+        self.assertEqual(queue.get_batch(10), ['b'])
+        self.assertIsNone(queue.get_batch(10))
+
+    # Test that partial downloads and editor temp files are recognized
+    def test_is_transient(self):
+        self.assertTrue(is_transient('movie.mkv.part'))
+        self.assertTrue(is_transient('setup.exe.crdownload'))
+        self.assertTrue(is_transient('~$report.docx'))
+        self.assertFalse(is_transient('report.docx'))
+
+class TestSettleWheel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'upload.bin')
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 10)
+        self.queue = CoalescingQueue(max_size=10)
+        # Three slots: a file added now comes due on the second tick
+        self.wheel = SettleWheel(self.queue, window=1, tick=1, max_size=10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # Test that a file is promoted once it is unchanged for a whole window
+    def test_settle(self):
+        self.wheel.add(self.path)
+        self.wheel.advance()
+        self.assertEqual(len(self.queue), 0)
+        self.wheel.advance()
+        self.assertEqual(self.queue.get_batch(10), [self.path])
+        self.assertEqual(len(self.wheel), 0)
+
+    # Test that a file that is still growing is checked again a window later
+    def test_still_growing(self):
+        self.wheel.add(self.path)
+        self.wheel.advance()
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.wheel.advance()
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(len(self.wheel), 1)
+        self.wheel.advance()
+        self.wheel.advance()
+        self.assertEqual(self.queue.get_batch(10), [self.path])
+
+    # Test that promote() skips the wait and deleted files are dropped
+    def test_promote_and_deleted(self):
+        self.wheel.add(self.path)
+        self.wheel.promote(self.path)
+        self.assertEqual(self.queue.get_batch(10), [self.path])
+        self.assertEqual(len(self.wheel), 0)
+
+        self.wheel.add(self.path)
+        os.remove(self.path)
+        self.wheel.advance()
+        self.wheel.advance()
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(len(self.wheel), 0)
+
+class TestReconcile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        os.makedirs(self.source)
+        for name in ['failed.txt', 'changed.txt', 'missed.txt', 'download.part']:
+            path = os.path.join(self.source, name)
+            with open(path, 'w') as f:
+                f.write(name)
+            os.utime(path, (1000, 1000))
+        self.watcher = FolderWatcher(self.source, os.path.join(self.tmp.name, 'target'), AIModel(),
+                                     db_path=os.path.join(self.tmp.name, 'index.db'))
+        self.watcher.index = FileIndex(self.watcher.db_path)
+
+    def tearDown(self):
+        self.watcher.index.close()
+        self.tmp.cleanup()
+
+    # Test that only files without an unchanged recorded outcome are fed into the queue
+    def test_reconcile(self):
+        entries = {entry.name: entry for entry in scan_directory(self.source)}
+        self.watcher.index.record([(entries['failed.txt'], 'Text', ACTION_ERROR, None),
+                                   (entries['changed.txt'], 'Text', ACTION_ERROR, None)])
+        with open(os.path.join(self.source, 'changed.txt'), 'a') as f:
+            f.write('more')
+        os.utime(os.path.join(self.source, 'changed.txt'), (1000, 1000))
+
+        self.assertEqual(self.watcher.reconcile(), 2)
+        queued = [os.path.basename(path) for path in self.watcher.queue.get_batch(10)]
+        self.assertEqual(sorted(queued), ['changed.txt', 'missed.txt'])
+
+    # Test that a file moved back to a path it was organized from is fed in again
+    def test_reconcile_moved_back(self):
+        entries = {entry.name: entry for entry in scan_directory(self.source)}
+        self.watcher.index.record([(entries[name], 'Text', ACTION_MOVED, None)
+                                   for name in ('failed.txt', 'changed.txt', 'missed.txt')])
+        self.assertEqual(self.watcher.reconcile(), 3)
+
+    # Test that failed moves are fed in again after the retry delay, up to the attempt limit
+    def test_reconcile_retries_errors(self):
+        entries = {entry.name: entry for entry in scan_directory(self.source)}
+        self.watcher.index.record([(entries['failed.txt'], 'Text', ACTION_ERROR, None)])
+        row = self.watcher.index.lookup([entries['failed.txt'].path])[entries['failed.txt'].path]
+        self.assertFalse(FileIndex.should_retry(row))
+        self.assertTrue(FileIndex.should_retry(row, now=row[6] + INDEX_SETTINGS["retry_delay_seconds"]))
+
+        with self.watcher.index.conn:
+            self.watcher.index.conn.execute("UPDATE files SET updated = 0")
+        self.assertEqual(self.watcher.reconcile(), 3)
+
+        for _ in range(INDEX_SETTINGS["retry_attempts"] - 1):
+            self.watcher.index.record([(entries['failed.txt'], 'Text', ACTION_ERROR, None)])
+        with self.watcher.index.conn:
+            self.watcher.index.conn.execute("UPDATE files SET updated = 0")
+        row = self.watcher.index.lookup([entries['failed.txt'].path])[entries['failed.txt'].path]
+        self.assertEqual(row[5], INDEX_SETTINGS["retry_attempts"])
+        self.assertFalse(FileIndex.should_retry(row))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,408 @@
+import os
+import sys
+import time
+import errno
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config.settings import COPY_SETTINGS
+from utils.scanner import scan_directory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl(dest_fd, FICLONE, src_fd) shares the source's extents on btrfs, XFS and
+# similar file systems (linux/fs.h: _IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+# Errors meaning "this primitive is not available for these two files", after
+# which the next strategy is tried
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF,
+                errno.ETXTBSY, getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+
+REFLINK = 'reflink'
+COPY_FILE_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+BUFFERED = 'buffered'
+
+
+class ShortCopyError(OSError):
+    """A copy primitive stopped before the whole file was copied."""
+
+
+def _check_complete(name, copied, size):
+    if copied < size:
+        raise ShortCopyError(errno.EIO, f"{name} copied {copied} of {size} bytes")
+
+
+def _reflink(source_fd, target_fd, size, buffer_size):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.ENOTSUP, "reflink not supported")
+    fcntl.ioctl(target_fd, FICLONE, source_fd)
+
+
+def _copy_file_range(source_fd, target_fd, size, buffer_size):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "copy_file_range not available")
+    offset = 0
+    while offset < size:
+        # Copied inside the kernel, or on the server for NFS 4.2 and SMB3 mounts
+        copied = os.copy_file_range(source_fd, target_fd, min(buffer_size, size - offset), offset, offset)
+        if copied == 0:
+            break
+        offset += copied
+    _check_complete(COPY_FILE_RANGE, offset, size)
+
+
+def _sendfile(source_fd, target_fd, size, buffer_size):
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        # Only Linux supports sendfile into a regular file
+        raise OSError(errno.ENOSYS, "sendfile not available")
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(target_fd, source_fd, offset, min(buffer_size, size - offset))
+        if sent == 0:
+            break
+        offset += sent
+    _check_complete(SENDFILE, offset, size)
+    os.lseek(target_fd, offset, os.SEEK_SET)
+
+
+def _buffered(source_fd, target_fd, size, buffer_size):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    os.lseek(source_fd, 0, os.SEEK_SET)
+    copied = 0
+    with open(source_fd, 'rb', buffering=0, closefd=False) as source, \
+            open(target_fd, 'wb', buffering=0, closefd=False) as target:
+        while True:
+            read = source.readinto(buffer)
+            if not read:
+                break
+            written = 0
+            while written < read:
+                written += target.write(view[written:read])
+            copied += read
+    _check_complete(BUFFERED, copied, size)
+
+
+_STRATEGIES = ((REFLINK, _reflink), (COPY_FILE_RANGE, _copy_file_range), (SENDFILE, _sendfile),
+               (BUFFERED, _buffered))
+
+
+def copy_file_data(source, target, buffer_size=None, fdatasync=None):
+    """Copy the contents of source to target with the fastest primitive that works.
+
+    Tries a reflink, then copy_file_range, then sendfile and finally a plain
+    read/write loop with a large buffer. A primitive that stops short of the
+    source's size is treated like an unsupported one; if the buffered copy
+    also falls short, ShortCopyError is raised. Returns the name of the
+    strategy used. With fdatasync the data is flushed to disk before returning.
+    """
+    buffer_size = buffer_size or COPY_SETTINGS["buffer_size"]
+    fdatasync = COPY_SETTINGS["fdatasync"] if fdatasync is None else fdatasync
+    with open(source, 'rb') as source_file, open(target, 'wb') as target_file:
+        source_fd = source_file.fileno()
+        target_fd = target_file.fileno()
+        size = os.fstat(source_fd).st_size
+        for name, strategy in _STRATEGIES:
+            try:
+                strategy(source_fd, target_fd, size, buffer_size)
+                break
+            except OSError as e:
+                if strategy is _buffered or (e.errno not in _UNSUPPORTED and not isinstance(e, ShortCopyError)):
+                    raise
+                if isinstance(e, ShortCopyError):
+                    logging.warning(f"Short copy of {source}, trying the next method: {e}")
+                # Start over cleanly with the next strategy
+                os.ftruncate(target_fd, 0)
+                os.lseek(target_fd, 0, os.SEEK_SET)
+                error = e
+        else:
+            raise error
+        if fdatasync:
+            getattr(os, 'fdatasync', os.fsync)(target_fd)
+    return name
+
+
+def fast_copy(source, target, buffer_size=None, fdatasync=None):
+    """Copy a file with its metadata like shutil.copy2, using kernel-side copies where possible."""
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(source))
+    if os.name != 'posix':
+        # shutil already uses the native copy call on Windows
+        shutil.copyfile(source, target)
+    else:
+        copy_file_data(source, target, buffer_size, fdatasync)
+    shutil.copystat(source, target)
+    return target
+
+
+def _same_device(source, target):
+    try:
+        target_parent = os.path.dirname(os.path.abspath(target))
+        return os.stat(source, follow_symlinks=False).st_dev == os.stat(target_parent).st_dev
+    except OSError:
+        return False
+
+
+def _rename_no_replace(source, target):
+    """Rename source to target on the same device, raising FileExistsError instead of replacing target."""
+    if os.name == 'nt' or (os.path.isdir(source) and not os.path.islink(source)):
+        # os.rename never replaces on Windows; directories are only replaced when empty
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, "Destination exists", target)
+        os.rename(source, target)
+        return
+    try:
+        # link() fails atomically if target exists
+        os.link(source, target, follow_symlinks=False)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard links on this file system
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, "Destination exists", target)
+        os.rename(source, target)
+        return
+    os.unlink(source)
+
+
+def fast_move(source, target, buffer_size=None, fdatasync=None, overwrite=True):
+    """Move a file or directory like shutil.move.
+
+    On the same device this is a single rename. Across devices each file is
+    copied with fast_copy and the source is removed once everything has been
+    copied. With overwrite=False, target is the exact destination path and
+    FileExistsError is raised instead of replacing anything there. Returns the
+    final target path.
+    """
+    if overwrite and os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(source))
+    elif not overwrite and os.path.lexists(target):
+        raise FileExistsError(errno.EEXIST, "Destination exists", target)
+    if _same_device(source, target):
+        try:
+            if overwrite:
+                os.replace(source, target)
+            else:
+                _rename_no_replace(source, target)
+            return target
+        except FileExistsError:
+            raise
+        except OSError as e:
+            # e.g. a bind mount of the same device, or a directory target that is not empty
+            logging.debug(f"Rename of {source} failed, copying instead: {e}")
+
+    if os.path.islink(source):
+        os.symlink(os.readlink(source), target)
+        os.unlink(source)
+    elif os.path.isdir(source):
+        shutil.copytree(source, target, symlinks=True,
+                        copy_function=lambda src, dst: fast_copy(src, dst, buffer_size, fdatasync))
+        shutil.rmtree(source)
+    else:
+        if not overwrite:
+            # Claim the name before copying into it
+            os.close(os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        try:
+            fast_copy(source, target, buffer_size, fdatasync)
+        except BaseException:
+            if not overwrite:
+                os.unlink(target)
+            raise
+        os.unlink(source)
+    return target
+
+
+def free_name(target, counter):
+    """Return target with ' (counter)' before its extension, or target itself for counter 0."""
+    if counter == 0:
+        return target
+    directory, name = os.path.split(target)
+    stem, extension = os.path.splitext(name)
+    return os.path.join(directory, f"{stem} ({counter}){extension}")
+
+
+def move_to_free_name(source, target, buffer_size=None, fdatasync=None):
+    """Move source to target, or to 'stem (n).ext' beside it with the smallest free n.
+
+    An existing file is never replaced. Returns the path moved to.
+    """
+    counter = 0
+    while True:
+        try:
+            return fast_move(source, free_name(target, counter), buffer_size, fdatasync, overwrite=False)
+        except FileExistsError:
+            counter += 1
+
+
+def _copy_chunk(source, target, offset, length, buffer_size):
+    """Copy length bytes at offset from source into the preallocated target.
+
+    Returns the number of bytes copied, which is less than length if the
+    source ended early.
+    """
+    with open(source, 'rb') as source_file, open(target, 'r+b') as target_file:
+        source_fd = source_file.fileno()
+        target_fd = target_file.fileno()
+        start = offset
+        end = offset + length
+        try:
+            if not hasattr(os, 'copy_file_range'):
+                raise OSError(errno.ENOSYS, "copy_file_range not available")
+            while offset < end:
+                copied = os.copy_file_range(source_fd, target_fd, min(buffer_size, end - offset), offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            while offset < end:
+                data = os.pread(source_fd, min(buffer_size, end - offset), offset)
+                if not data:
+                    break
+                offset += os.pwrite(target_fd, data, offset)
+    return offset - start
+
+
+class _LargeFile:
+    """A file copied as several concurrent chunks; finished once no chunk is outstanding."""
+
+    __slots__ = ('source', 'target', 'size', 'remaining', 'copied', 'failed')
+
+    def __init__(self, source, target, size, chunks):
+        self.source = source
+        self.target = target
+        self.size = size
+        self.remaining = chunks
+        self.copied = 0
+        self.failed = False
+
+
+def copy_tree_parallel(source, target, workers=None, large_file_threshold=None, chunk_size=None, progress=None):
+    """Copy the contents of source into target with a pool of worker threads.
+
+    Directories are created as the tree is scanned, before any of their files
+    are copied. Small files are copied whole by one worker each with
+    fast_copy; files of at least large_file_threshold bytes are split into
+    chunk_size pieces copied concurrently. File and directory metadata is
+    preserved like shutil.copy2. Symlinks to files are copied as files;
+    symlinks to directories and dangling symlinks are recreated as symlinks. Progress is logged every
+    COPY_SETTINGS['progress_interval'] seconds and passed to progress(stats)
+    if given. Returns the final statistics.
+    """
+    settings = COPY_SETTINGS
+    workers = workers or settings["workers"]
+    large_file_threshold = large_file_threshold or settings["large_file_threshold"]
+    chunk_size = chunk_size or settings["chunk_size"]
+    buffer_size = min(settings["buffer_size"], chunk_size)
+    # Chunks are written with pwrite, which Windows lacks
+    split_large_files = hasattr(os, 'pwrite')
+
+    stats = {'files': 0, 'dirs': 0, 'links': 0, 'bytes': 0, 'errors': 0}
+    start = time.perf_counter()
+    last_report = start
+    directories = [(source, target)]
+    os.makedirs(target, exist_ok=True)
+
+    def finish_large_file(large_file):
+        if not large_file.failed and large_file.copied != large_file.size:
+            logging.error(f"Error copying {large_file.source}: copied {large_file.copied} of {large_file.size} bytes")
+            large_file.failed = True
+        if large_file.failed:
+            stats['errors'] += 1
+            return
+        shutil.copystat(large_file.source, large_file.target)
+        if settings["fdatasync"]:
+            with open(large_file.target, 'rb+') as target_file:
+                getattr(os, 'fdatasync', os.fsync)(target_file.fileno())
+        stats['files'] += 1
+        stats['bytes'] += large_file.size
+
+    def collect(done):
+        for future in done:
+            task = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                path = task.source if isinstance(task, _LargeFile) else task[0]
+                logging.error(f"Error copying {path}: {e}")
+                if not isinstance(task, _LargeFile):
+                    stats['errors'] += 1
+                    continue
+                task.failed = True
+                result = 0
+            if isinstance(task, _LargeFile):
+                task.copied += result
+                task.remaining -= 1
+                if task.remaining == 0:
+                    finish_large_file(task)
+            else:
+                stats['files'] += 1
+                stats['bytes'] += task[1]
+
+    def report():
+        elapsed = time.perf_counter() - start
+        stats['seconds'] = elapsed
+        stats['files_per_second'] = stats['files'] / elapsed if elapsed > 0 else 0.0
+        stats['mb_per_second'] = stats['bytes'] / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        if progress:
+            progress(dict(stats))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for entry in scan_directory(source, recursive=True, include_dirs=True, exclude=(target,), include_links=True):
+            destination = os.path.join(target, os.path.relpath(entry.path, source))
+            try:
+                if entry.is_dir:
+                    os.makedirs(destination, exist_ok=True)
+                    directories.append((entry.path, destination))
+                    stats['dirs'] += 1
+                    continue
+                if entry.is_link:
+                    os.symlink(os.readlink(entry.path), destination, target_is_directory=os.path.isdir(entry.path))
+                    stats['links'] += 1
+                    continue
+
+                if len(pending) >= workers * 4:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                size = entry.stat.st_size
+                if split_large_files and size >= large_file_threshold:
+                    with open(destination, 'wb') as target_file:
+                        target_file.truncate(size)
+                    large_file = _LargeFile(entry.path, destination, size, -(-size // chunk_size))
+                    for offset in range(0, size, chunk_size):
+                        length = min(chunk_size, size - offset)
+                        future = executor.submit(_copy_chunk, entry.path, destination, offset, length, buffer_size)
+                        pending[future] = large_file
+                else:
+                    pending[executor.submit(fast_copy, entry.path, destination, buffer_size)] = (entry.path, size)
+            except OSError as e:
+                stats['errors'] += 1
+                logging.error(f"Error copying {entry.path}: {e}")
+
+            if time.perf_counter() - last_report >= settings["progress_interval"]:
+                last_report = time.perf_counter()
+                report()
+                logging.info(f"Copying {source}: {stats['files']} files, {stats['bytes'] / (1024 * 1024):.1f} MB "
+                             f"({stats['files_per_second']:.0f} files/s, {stats['mb_per_second']:.1f} MB/s)")
+        collect(wait(pending)[0])
+
+    # Copying files changes their directories' mtimes, so directory metadata goes last, deepest first
+    for source_dir, target_dir in reversed(directories):
+        try:
+            shutil.copystat(source_dir, target_dir)
+        except OSError as e:
+            logging.warning(f"Could not copy metadata of {source_dir}: {e}")
+
+    report()
+    logging.info(f"Copied {source} to {target}: {stats['files']} files, {stats['dirs']} directories, "
+                 f"{stats['bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']:.2f}s "
+                 f"({stats['files_per_second']:.0f} files/s, {stats['mb_per_second']:.1f} MB/s)")
+    return stats
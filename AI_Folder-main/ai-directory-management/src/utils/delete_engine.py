@@ -0,0 +1,240 @@
+import os
+import stat
+import time
+import uuid
+import errno
+import queue
+import atexit
+import shutil
+import logging
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import DELETE_SETTINGS
+
+# os.fwalk and dir_fd support are POSIX only
+_HAVE_FWALK = hasattr(os, 'fwalk') and os.unlink in os.supports_dir_fd and os.rmdir in os.supports_dir_fd
+
+
+def _make_writable(path_or_fd):
+    """Give the owner write and search permission on a directory."""
+    mode = os.stat(path_or_fd).st_mode
+    os.chmod(path_or_fd, stat.S_IMODE(mode) | stat.S_IRWXU)
+
+
+def _unlink_at(name, dir_fd):
+    try:
+        os.unlink(name, dir_fd=dir_fd)
+    except PermissionError:
+        # Removing an entry needs write permission on its directory
+        _make_writable(dir_fd)
+        os.unlink(name, dir_fd=dir_fd)
+
+
+def _rmdir_at(name, dir_fd, path, stats):
+    try:
+        os.rmdir(name, dir_fd=dir_fd)
+    except NotADirectoryError:
+        # A symlink to a directory, listed with the directories but never followed
+        _unlink_at(name, dir_fd)
+        stats['files'] += 1
+        return
+    except PermissionError:
+        _make_writable(dir_fd)
+        os.rmdir(name, dir_fd=dir_fd)
+    except OSError as e:
+        if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+            raise
+        # fwalk could not list it, so it still has contents: unlock it and go again
+        os.chmod(name, stat.S_IRWXU, dir_fd=dir_fd)
+        _delete_contents(path, stats)
+        os.rmdir(name, dir_fd=dir_fd)
+    stats['dirs'] += 1
+
+
+def _delete_contents(path, stats):
+    """Remove everything below path in one bottom-up pass of fd-relative unlinks."""
+    for root, dirs, files, root_fd in os.fwalk(path, topdown=False, onerror=lambda e: None):
+        for name in files:
+            _unlink_at(name, root_fd)
+            stats['files'] += 1
+        for name in dirs:
+            _rmdir_at(name, root_fd, os.path.join(root, name), stats)
+
+
+def _delete_subtree(path):
+    """Delete a directory and its contents; returns {'files', 'dirs'} removed."""
+    stats = {'files': 0, 'dirs': 0}
+    _delete_contents(path, stats)
+    parent_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        _rmdir_at(os.path.basename(path), parent_fd, path, stats)
+    finally:
+        os.close(parent_fd)
+    return stats
+
+
+def _clear_readonly(func, path, exc_info):
+    """shutil.rmtree error handler: clear the read-only flag and retry once."""
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def delete_tree(path, workers=None):
+    """Delete a directory tree, removing its top-level subdirectories in parallel.
+
+    Each subtree is deleted in a single bottom-up os.fwalk pass with
+    fd-relative unlink/rmdir calls; permissions are only fixed for entries whose
+    removal failed. Where fwalk is unavailable (Windows) shutil.rmtree is used,
+    clearing read-only flags as needed. Returns statistics.
+    """
+    workers = workers or DELETE_SETTINGS["workers"]
+    start = time.perf_counter()
+    stats = {'files': 0, 'dirs': 0}
+
+    if not _HAVE_FWALK:
+        shutil.rmtree(path, onerror=_clear_readonly)
+    else:
+        try:
+            entries = list(os.scandir(path))
+        except PermissionError:
+            _make_writable(path)
+            entries = list(os.scandir(path))
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except PermissionError:
+                    _make_writable(path)
+                    os.unlink(entry.path)
+                stats['files'] += 1
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                subtree_stats = list(executor.map(_delete_subtree, subdirectories))
+        else:
+            subtree_stats = [_delete_subtree(subdirectory) for subdirectory in subdirectories]
+        for subtree in subtree_stats:
+            stats['files'] += subtree['files']
+            stats['dirs'] += subtree['dirs']
+        try:
+            os.rmdir(path)
+        except PermissionError:
+            _make_writable(os.path.dirname(os.path.abspath(path)))
+            os.rmdir(path)
+        stats['dirs'] += 1
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def delete_path(path, workers=None):
+    """Delete a file, symlink or directory tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        return delete_tree(path, workers)
+    try:
+        os.remove(path)
+    except PermissionError:
+        # Read-only files can't be removed on Windows
+        os.chmod(path, stat.S_IWRITE)
+        os.remove(path)
+    return {'files': 1, 'dirs': 0, 'seconds': 0.0}
+
+
+class TrashPurger:
+    """Background thread emptying trash directories.
+
+    At exit the process waits up to DELETE_SETTINGS['exit_wait_seconds'] for
+    the scheduled purges (see get_purger). Trash directories left over by a
+    process that exited before its purge finished are emptied as well when
+    they are scheduled again.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        # Thread pools refuse new work once the interpreter is shutting down
+        self._exiting = False
+        self._thread = Thread(target=self._run, name="trash-purger", daemon=True)
+        self._thread.start()
+
+    def schedule(self, trash_directory):
+        self._queue.put(trash_directory)
+
+    def join(self, timeout=None):
+        """Block until everything scheduled so far has been purged; returns False on timeout."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def drain(self):
+        """Wait for pending purges at exit, up to DELETE_SETTINGS['exit_wait_seconds']."""
+        self._exiting = True
+        if not self.join(DELETE_SETTINGS["exit_wait_seconds"]):
+            logging.warning("Exiting before the trash was purged; the rest is purged the next time "
+                            "something in the same directory is trashed.")
+
+    def _run(self):
+        while True:
+            trash_directory = self._queue.get()
+            try:
+                with os.scandir(trash_directory) as entries:
+                    trashed = [entry.path for entry in entries]
+                for path in trashed:
+                    try:
+                        try:
+                            delete_path(path, workers=1 if self._exiting else None)
+                        except RuntimeError:
+                            # The interpreter began shutting down during the purge
+                            delete_path(path, workers=1)
+                    except Exception as e:
+                        logging.error(f"Error purging {path}: {e}")
+                try:
+                    os.rmdir(trash_directory)
+                except OSError:
+                    # Something new was trashed meanwhile; it has been scheduled too
+                    pass
+                logging.info(f"Purged trash {trash_directory}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.error(f"Error purging trash {trash_directory}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_purger = None
+_purger_lock = Lock()
+
+
+def get_purger():
+    """Return the process-wide trash purger, starting it on first use."""
+    global _purger
+    with _purger_lock:
+        if _purger is None:
+            _purger = TrashPurger()
+            atexit.register(_purger.drain)
+        return _purger
+
+
+def move_to_trash(path):
+    """Rename path into a trash directory next to it and purge it in the background.
+
+    The trash lives in the same parent directory, hence on the same file
+    system, so this is a single rename and returns right away. Returns the path
+    inside the trash.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    trash_directory = os.path.join(parent, DELETE_SETTINGS["trash_dir_name"])
+    trashed = os.path.join(trash_directory, f"{uuid.uuid4().hex}-{os.path.basename(path)}")
+    try:
+        os.makedirs(trash_directory, exist_ok=True)
+        os.rename(path, trashed)
+    except FileNotFoundError:
+        # The purger removed the emptied trash directory in between
+        if not os.path.lexists(path):
+            raise
+        os.makedirs(trash_directory, exist_ok=True)
+        os.rename(path, trashed)
+    get_purger().schedule(trash_directory)
+    return trashed
@@ -0,0 +1,258 @@
+import os
+import time
+import base64
+import shutil
+import struct
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from config.settings import ENCRYPTION_SETTINGS
+from utils.scanner import scan_directory
+
+# Streaming container layout:
+#   header  = MAGIC | version (1 byte) | chunk size (4 bytes) | salt (16 bytes) | nonce prefix (7 bytes)
+#   segment = AES-256-GCM(chunk) | tag (16 bytes), repeated; only the last chunk may be short
+# Each segment's nonce is the prefix, its 4-byte index and a final-segment flag,
+# and the header is authenticated with every segment, so reordered, truncated
+# or extended files fail to decrypt.
+MAGIC = b"AIDMSTRM"
+VERSION = 1
+_HEADER = struct.Struct(">8sBI16s7s")
+_TAG_SIZE = 16
+# Largest chunk size accepted; the header is only authenticated after the
+# first segment has been read, so it must not decide how much memory a read takes
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Fernet tokens are urlsafe base64 of: version 0x80 | timestamp (8) | IV (16) |
+# AES-CBC ciphertext (a multiple of 16, at least 16) | HMAC (32)
+_FERNET_VERSION = 0x80
+_FERNET_OVERHEAD = 1 + 8 + 16 + 32
+_BASE64_ALPHABET = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+# Suffix of the temp files written by _write_atomically
+_TEMP_SUFFIX = ".aidm-tmp"
+
+STREAM = 'stream'
+FERNET = 'fernet'
+
+
+def _is_fernet_token(file, size):
+    """Check that a file has the length, alphabet and version byte of a Fernet token.
+
+    Only the first 4 KiB and the padding at the end are read.
+    """
+    if size % 4 or size < 100:
+        return False
+    head = file.read(min(size, 4096))
+    if not _BASE64_ALPHABET.issuperset(head):
+        return False
+    try:
+        decoded = base64.urlsafe_b64decode(head[:len(head) // 4 * 4])
+    except ValueError:
+        return False
+    if not decoded or decoded[0] != _FERNET_VERSION:
+        return False
+    file.seek(size - 2)
+    token_size = size // 4 * 3 - file.read(2).count(b'=')
+    ciphertext_size = token_size - _FERNET_OVERHEAD
+    return ciphertext_size >= 16 and ciphertext_size % 16 == 0
+
+
+def detect_encryption(file_path):
+    """Return STREAM or FERNET if the file is encrypted in that format, else None."""
+    with open(file_path, 'rb') as file:
+        head = file.read(len(MAGIC))
+        if head == MAGIC:
+            return STREAM
+        file.seek(0)
+        if _is_fernet_token(file, os.fstat(file.fileno()).st_size):
+            return FERNET
+    return None
+
+
+def _derive_key(key, salt):
+    """Derive a per-file AES-256 key from the Fernet key and the file's salt."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"aidm-stream-v1").derive(
+        base64.urlsafe_b64decode(key))
+
+
+def _nonce(prefix, index, final):
+    return prefix + struct.pack(">IB", index, 1 if final else 0)
+
+
+def _write_atomically(file_path, write_contents):
+    """Write a replacement for file_path to a temp file, then rename it into place."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=_TEMP_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            write_contents(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def encrypt_stream(source, target, key, chunk_size=None):
+    """Encrypt the source file object into target in fixed-size authenticated segments."""
+    chunk_size = chunk_size or ENCRYPTION_SETTINGS["chunk_size"]
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+    salt = os.urandom(16)
+    prefix = os.urandom(7)
+    header = _HEADER.pack(MAGIC, VERSION, chunk_size, salt, prefix)
+    aesgcm = AESGCM(_derive_key(key, salt))
+    target.write(header)
+
+    index = 0
+    chunk = source.read(chunk_size)
+    while True:
+        next_chunk = source.read(chunk_size)
+        final = not next_chunk
+        target.write(aesgcm.encrypt(_nonce(prefix, index, final), chunk, header))
+        if final:
+            break
+        chunk = next_chunk
+        index += 1
+
+
+def decrypt_stream(source, target, key):
+    """Decrypt a streaming container from the source file object into target."""
+    header = source.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise ValueError("Truncated encryption header")
+    magic, version, chunk_size, salt, prefix = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported encryption format")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Invalid chunk size in encryption header: {chunk_size}")
+    aesgcm = AESGCM(_derive_key(key, salt))
+    segment_size = chunk_size + _TAG_SIZE
+
+    index = 0
+    segment = source.read(segment_size)
+    while True:
+        next_segment = source.read(segment_size)
+        final = not next_segment
+        # Raises InvalidTag if the segment was altered, reordered or the file truncated
+        target.write(aesgcm.decrypt(_nonce(prefix, index, final), segment, header))
+        if final:
+            break
+        segment = next_segment
+        index += 1
+
+
+def encrypt_file_in_place(file_path, key, chunk_size=None):
+    """Replace a file with its streaming-encrypted form, atomically and with bounded memory."""
+    with open(file_path, 'rb') as source:
+        _write_atomically(file_path, lambda target: encrypt_stream(source, target, key, chunk_size))
+
+
+def decrypt_file_in_place(file_path, key):
+    """Replace an encrypted file with its plaintext; legacy Fernet files are still accepted."""
+    if detect_encryption(file_path) == STREAM:
+        with open(file_path, 'rb') as source:
+            _write_atomically(file_path, lambda target: decrypt_stream(source, target, key))
+    else:
+        # Legacy files are a single Fernet token, which can only be decrypted whole
+        with open(file_path, 'rb') as source:
+            decrypted_data = Fernet(key).decrypt(source.read())
+        _write_atomically(file_path, lambda target: target.write(decrypted_data))
+
+
+# Key handed to each worker process once by the pool initializer
+_worker_key = None
+
+
+def _init_worker(key):
+    global _worker_key
+    _worker_key = key
+
+
+def _encrypt_worker(file_path):
+    """Encrypt one file in a worker process; returns (file_path, status, error)."""
+    try:
+        if detect_encryption(file_path):
+            return file_path, 'skipped', None
+        encrypt_file_in_place(file_path, _worker_key)
+        return file_path, 'done', None
+    except Exception as e:
+        return file_path, 'error', str(e)
+
+
+def _decrypt_worker(file_path):
+    """Decrypt one file in a worker process; returns (file_path, status, error)."""
+    try:
+        if not detect_encryption(file_path):
+            return file_path, 'skipped', None
+        decrypt_file_in_place(file_path, _worker_key)
+        return file_path, 'done', None
+    except Exception as e:
+        return file_path, 'error', str(e)
+
+
+def _process_tree(directory, key, worker, workers=None, skip_files=()):
+    """Run worker over every file under directory in a process pool.
+
+    At most a few tasks per process are in flight at a time, so huge trees do
+    not queue millions of futures. Files in skip_files (such as the key file)
+    are left alone and counted as skipped. Returns aggregate statistics.
+    """
+    workers = workers or ENCRYPTION_SETTINGS["workers"] or os.cpu_count() or 1
+    skip_files = {os.path.normcase(os.path.abspath(path)) for path in skip_files}
+    stats = {'files': 0, 'skipped': 0, 'errors': 0, 'bytes': 0}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key,)) as executor:
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                size = pending.pop(future)
+                file_path, status, error = future.result()
+                if status == 'done':
+                    stats['files'] += 1
+                    stats['bytes'] += size
+                elif status == 'skipped':
+                    stats['skipped'] += 1
+                else:
+                    stats['errors'] += 1
+                    logging.error(f"Error processing {file_path}: {error}")
+
+        for entry in scan_directory(directory, recursive=True):
+            # Temp files from in-flight rewrites show up while the tree is scanned
+            if entry.name.startswith('.') and entry.name.endswith(_TEMP_SUFFIX):
+                continue
+            if skip_files and os.path.normcase(os.path.abspath(entry.path)) in skip_files:
+                logging.info(f"Skipping {entry.path}")
+                stats['skipped'] += 1
+                continue
+            if len(pending) >= workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(worker, entry.path)] = entry.stat.st_size
+        collect(wait(pending)[0])
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['mb_per_second'] = stats['bytes'] / (1024 * 1024) / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def encrypt_tree(directory, key, workers=None, skip_files=()):
+    """Encrypt every not yet encrypted file under directory across a process pool."""
+    return _process_tree(directory, key, _encrypt_worker, workers, skip_files)
+
+
+def decrypt_tree(directory, key, workers=None, skip_files=()):
+    """Decrypt every encrypted file under directory across a process pool."""
+    return _process_tree(directory, key, _decrypt_worker, workers, skip_files)
@@ -0,0 +1,252 @@
+import os
+import time
+import sqlite3
+import logging
+from threading import Lock
+
+from config.settings import INDEX_SETTINGS, MODEL_SETTINGS
+from utils.file_operations import move_file
+from utils.journal import prediction_details
+from utils.scanner import scan_directory, file_metadata
+
+# Last action recorded for an indexed file
+ACTION_INDEXED = 'indexed'
+ACTION_MOVED = 'move'
+ACTION_ERROR = 'error'
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class FileIndex:
+    """SQLite index of scanned files keyed by path, inode, size and mtime.
+
+    Each row remembers the last predicted category and the last action taken,
+    so repeat runs only need to classify and move new or changed files. Failed
+    moves of an unchanged file are retried with exponential backoff, up to
+    INDEX_SETTINGS['retry_attempts'] attempts.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_SETTINGS["db_path"]
+        self._lock = Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " inode INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " category TEXT,"
+            " action TEXT,"
+            " target TEXT,"
+            " updated REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(files)")]
+        if 'attempts' not in columns:
+            # Index written before failed moves were retried
+            self.conn.execute("ALTER TABLE files ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, paths):
+        """Return {path: (inode, size, mtime_ns, category, action, attempts, updated)} for the indexed paths."""
+        rows = {}
+        paths = list(paths)
+        with self._lock:
+            for start in range(0, len(paths), _LOOKUP_CHUNK):
+                chunk = paths[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"SELECT path, inode, size, mtime_ns, category, action, attempts, updated FROM files"
+                    f" WHERE path IN ({placeholders})",
+                    chunk)
+                for path, *row in cursor:
+                    rows[path] = tuple(row)
+        return rows
+
+    @staticmethod
+    def is_unchanged(entry, row):
+        """Check whether a ScanEntry still matches its indexed row.
+
+        A file at a path recorded as moved away never matches: a rename keeps
+        inode, size and mtime, so it is the same file moved back, or a new one.
+        """
+        return (row is not None
+                and row[4] != ACTION_MOVED
+                and row[0] == entry.stat.st_ino
+                and row[1] == entry.stat.st_size
+                and row[2] == entry.stat.st_mtime_ns)
+
+    @classmethod
+    def is_settled(cls, entry, row):
+        """Check whether a ScanEntry needs nothing until it changes.
+
+        That is a file whose last move failed and is not due for a retry yet.
+        """
+        return cls.is_unchanged(entry, row) and row[4] == ACTION_ERROR and not cls.should_retry(row)
+
+    @staticmethod
+    def should_retry(row, now=None):
+        """Check whether the failed move recorded in row is due to be attempted again.
+
+        The n-th retry waits retry_delay_seconds * 2 ** (n - 1) after the last
+        failure; after retry_attempts failed attempts the file is left alone
+        until it changes.
+        """
+        if row is None or row[4] != ACTION_ERROR or row[5] >= INDEX_SETTINGS["retry_attempts"]:
+            return False
+        delay = INDEX_SETTINGS["retry_delay_seconds"] * 2 ** max(0, row[5] - 1)
+        return (now or time.time()) - row[6] >= delay
+
+    def record(self, records):
+        """Upsert (entry, category, action, target) tuples in one transaction.
+
+        An error counts as one more failed attempt when the file is unchanged
+        since its last recorded failure; any other action resets the count.
+        """
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO files"
+                    " (path, inode, size, mtime_ns, category, action, target, updated, attempts)"
+                    " VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, CASE WHEN ?6 = ?9 THEN 1 + COALESCE("
+                    "  (SELECT attempts FROM files WHERE path = ?1 AND action = ?9"
+                    "   AND inode = ?2 AND size = ?3 AND mtime_ns = ?4), 0) ELSE 0 END)",
+                    [(entry.path, entry.stat.st_ino, entry.stat.st_size, entry.stat.st_mtime_ns,
+                      category, action, target, now, ACTION_ERROR)
+                     for entry, category, action, target in records])
+
+    def status(self):
+        """Summarize the index: file count, counts per action and category, last update."""
+        with self._lock:
+            total, last_updated = self.conn.execute("SELECT COUNT(*), MAX(updated) FROM files").fetchone()
+            actions = dict(self.conn.execute("SELECT action, COUNT(*) FROM files GROUP BY action"))
+            categories = dict(self.conn.execute("SELECT category, COUNT(*) FROM files GROUP BY category"))
+        return {
+            'db_path': self.db_path,
+            'files': total,
+            'last_updated': last_updated,
+            'actions': actions,
+            'categories': categories,
+        }
+
+
+def _scan_batches(source_directory, recursive, exclude=()):
+    """Yield lists of up to MODEL_SETTINGS['batch_size'] ScanEntry objects."""
+    batch = []
+    for entry in scan_directory(source_directory, recursive=recursive, exclude=exclude):
+        batch.append(entry)
+        if len(batch) >= MODEL_SETTINGS["batch_size"]:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_index(source_directory, model, db_path=None, recursive=False):
+    """Scan and classify new or changed files into the index without moving them."""
+    if not os.path.isdir(source_directory):
+        logging.error(f"Source directory '{source_directory}' does not exist.")
+        return None
+
+    start = time.perf_counter()
+    scanned = changed = 0
+    with FileIndex(db_path) as index:
+        for batch in _scan_batches(source_directory, recursive):
+            rows = index.lookup(entry.path for entry in batch)
+            pending = [entry for entry in batch if not index.is_unchanged(entry, rows.get(entry.path))]
+            scanned += len(batch)
+            changed += len(pending)
+            if pending:
+                categories = model.predict_categories([file_metadata(entry) for entry in pending])
+                index.record((entry, category, ACTION_INDEXED, None) for entry, category in zip(pending, categories))
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Indexed {source_directory}: {scanned} files scanned, {changed} new or changed, in {elapsed:.2f}s")
+    return {'scanned': scanned, 'changed': changed, 'seconds': elapsed}
+
+
+def organize_files_incremental(source_directory, target_directory, model, db_path=None, recursive=False,
+                               show_message=None):
+    """Organize only the files that are new or changed since the last indexed run.
+
+    Unchanged files that were only indexed, or whose failed move is due for a
+    retry (FileIndex.should_retry), reuse their stored category instead of
+    being classified again; other unchanged files are left alone until they
+    change. A file found at a path it was moved away from is organized again.
+    """
+    try:
+        if not os.path.isdir(source_directory):
+            logging.error(f"Source directory '{source_directory}' does not exist.")
+            if show_message:
+                show_message("Error", f"Source directory '{source_directory}' does not exist.")
+            return None
+
+        os.makedirs(target_directory, exist_ok=True)
+        created_folders = set()
+        start = time.perf_counter()
+        scanned = moved = skipped = 0
+
+        with FileIndex(db_path) as index:
+            for batch in _scan_batches(source_directory, recursive, exclude=(target_directory,)):
+                scanned += len(batch)
+                rows = index.lookup(entry.path for entry in batch)
+
+                to_move = []
+                to_classify = []
+                for entry in batch:
+                    row = rows.get(entry.path)
+                    if index.is_settled(entry, row):
+                        skipped += 1
+                    elif index.is_unchanged(entry, row) and row[3]:
+                        # Indexed only, or a failed move due for a retry
+                        to_move.append((entry, row[3]))
+                    else:
+                        to_classify.append(entry)
+
+                if to_classify:
+                    categories = model.predict_categories([file_metadata(entry) for entry in to_classify])
+                    to_move.extend(zip(to_classify, categories))
+
+                records = []
+                for entry, category in to_move:
+                    target_folder = os.path.join(target_directory, category)
+                    if target_folder not in created_folders:
+                        os.makedirs(target_folder, exist_ok=True)
+                        created_folders.add(target_folder)
+                    target_path = os.path.join(target_folder, entry.name)
+                    prediction = prediction_details(file_metadata(entry), category)
+                    moved_to = move_file(entry.path, target_path, show_dialog=False, prediction=prediction, unique=True)
+                    if moved_to:
+                        moved += 1
+                        records.append((entry, category, ACTION_MOVED, moved_to))
+                    else:
+                        records.append((entry, category, ACTION_ERROR, target_path))
+                index.record(records)
+
+        elapsed = time.perf_counter() - start
+        message = (f"Incrementally organized '{source_directory}' into '{target_directory}': "
+                   f"{moved} moved, {skipped} unchanged, {scanned} scanned in {elapsed:.2f}s.")
+        logging.info(message)
+        if show_message:
+            show_message("Success", message)
+        return {'scanned': scanned, 'moved': moved, 'skipped': skipped, 'seconds': elapsed}
+    except Exception as e:
+        logging.error(f"Error organizing files: {e}")
+        if show_message:
+            show_message("Error", f"Error organizing files: {e}")
+        return None
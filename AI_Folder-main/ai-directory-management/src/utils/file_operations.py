@@ -1,39 +1,56 @@
 import os
-import shutil
 import logging
 import mimetypes
 import hashlib
-import json
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 import time
 from cryptography.fernet import Fernet
-import stat
 from utils.gui_operations import FileSelector
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import DEDUPE_SETTINGS, JOURNAL_SETTINGS, DELETE_SETTINGS
+from ai.categories import REGISTRY
+from utils.scanner import scan_directory, file_metadata
+from utils.sniffer import detect_type, read_only_cache
+from utils.copy_engine import fast_copy, fast_move, move_to_free_name, copy_tree_parallel
+from utils.delete_engine import delete_path, delete_tree, move_to_trash
+from utils.planner import plan_organize, plan_sort_by_date, plan_deorganize, execute_plan
+from utils.journal import get_journal, flush_journal
+from utils.log_viewer import tail_log
+from utils.encryption import encrypt_file_in_place, decrypt_file_in_place, encrypt_tree, decrypt_tree
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(asctime)s - %(message)s')
 
-def move_file(source_path, target_path, show_dialog=True):
-    """Move a file or folder to a new location."""
+def move_file(source_path, target_path, show_dialog=True, prediction=None, unique=False):
+    """Move a file or folder to a new location. Returns the final path on success, else False.
+
+    prediction, from utils.journal.prediction_details, is journaled with the
+    move when it files a classified file into its category folder. With unique
+    an existing file at target_path is never replaced; the moved file gets a
+    ' (n)' suffix instead.
+    """
     try:
-        shutil.move(source_path, target_path)
+        if unique:
+            target_path = move_to_free_name(source_path, target_path)
+        else:
+            target_path = fast_move(source_path, target_path)
         logging.info(f"Moved {source_path} to {target_path}")
-        log_operation('move', {'source': source_path, 'target': target_path})
+        log_operation('move', {'source': source_path, 'target': target_path, **(prediction or {})})
         if show_dialog:
             FileSelector.show_message("Success", f"Moved {os.path.basename(source_path)} successfully")
+        return target_path
     except PermissionError as e:
         logging.error(f"Permission denied: {e}")
     except Exception as e:
         logging.error(f"Error moving {source_path} to {target_path}: {e}")
         if show_dialog:
             FileSelector.show_message("Error", f"Error moving file: {str(e)}", "error")
+    return False
 
 def move_folder(source_folder, target_folder):
     """Move a folder to a new location."""
     try:
         if os.path.exists(source_folder) and os.path.isdir(source_folder):
-            shutil.move(source_folder, target_folder)
+            fast_move(source_folder, target_folder)
             logging.info(f"Moved folder {source_folder} to {target_folder}")
             log_operation('move_folder', {'source': source_folder, 'target': target_folder})
         else:
@@ -43,66 +60,69 @@ def move_folder(source_folder, target_folder):
     except Exception as e:
         logging.error(f"Error moving folder {source_folder} to {target_folder}: {e}")
 
-def copy_file(source_path, target_path):
-    """Copy a file or folder to a new location."""
+def copy_file(source_path, target_path, workers=None):
+    """Copy a file or folder to a new location.
+
+    Returns the copy statistics (files, dirs, bytes, errors), or None if the
+    copy failed outright. Folders whose files could not all be copied are
+    logged and journaled as failed.
+    """
     try:
         if os.path.isdir(source_path):
-            if not os.path.exists(target_path):
-                shutil.copytree(source_path, target_path)
-            else:
-                for item in os.listdir(source_path):
-                    s = os.path.join(source_path, item)
-                    d = os.path.join(target_path, item)
-                    if os.path.isdir(s):
-                        shutil.copytree(s, d, dirs_exist_ok=True)
-                    else:
-                        shutil.copy2(s, d)
+            stats = copy_tree_parallel(source_path, target_path, workers=workers)
+        else:
+            fast_copy(source_path, target_path)
+            stats = {'files': 1, 'dirs': 0, 'bytes': os.path.getsize(target_path), 'errors': 0}
+        if stats['errors']:
+            logging.error(f"Error copying {source_path} to {target_path}: {stats['errors']} files failed")
+            log_operation('copy_failed', {'source': source_path, 'target': target_path, 'errors': stats['errors']})
         else:
-            shutil.copy2(source_path, target_path)
-        logging.info(f"Copied {source_path} to {target_path}")
-        log_operation('copy', {'source': source_path, 'target': target_path})
+            logging.info(f"Copied {source_path} to {target_path}")
+            log_operation('copy', {'source': source_path, 'target': target_path})
+        return stats
     except PermissionError as e:
         logging.error(f"Permission denied: {e}")
     except Exception as e:
         logging.error(f"Error copying {source_path} to {target_path}: {e}")
+    return None
+
+def copy_folder(source_folder, target_folder, workers=None):
+    """Copy a folder and its contents to a new location.
 
-def copy_folder(source_folder, target_folder):
-    """Copy a folder and its contents to a new location."""
+    Returns the copy statistics like copy_file, or None if nothing was copied.
+    """
     try:
         if os.path.exists(source_folder) and os.path.isdir(source_folder):
-            if not os.path.exists(target_folder):
-                shutil.copytree(source_folder, target_folder)
+            stats = copy_tree_parallel(source_folder, target_folder, workers=workers)
+            if stats['errors']:
+                logging.error(f"Error copying folder {source_folder} to {target_folder}: "
+                              f"{stats['errors']} files failed")
+                log_operation('copy_folder_failed', {'source': source_folder, 'target': target_folder,
+                                                     'errors': stats['errors']})
             else:
-                for item in os.listdir(source_folder):
-                    s = os.path.join(source_folder, item)
-                    d = os.path.join(target_folder, item)
-                    if os.path.isdir(s):
-                        shutil.copytree(s, d, dirs_exist_ok=True)
-                    else:
-                        shutil.copy2(s, d)
-            logging.info(f"Copied folder {source_folder} to {target_folder}")
-            log_operation('copy_folder', {'source': source_folder, 'target': target_folder})
+                logging.info(f"Copied folder {source_folder} to {target_folder}")
+                log_operation('copy_folder', {'source': source_folder, 'target': target_folder})
+            return stats
         else:
             logging.warning(f"Source folder does not exist: {source_folder}")
     except PermissionError as e:
         logging.error(f"Permission denied: {e}")
     except Exception as e:
         logging.error(f"Error copying folder {source_folder} to {target_folder}: {e}")
+    return None
 
-def delete_file(path):
-    """Delete a specified file or folder."""
+def delete_file(path, use_trash=None, workers=None):
+    """Delete a specified file or folder.
+
+    With use_trash (DELETE_SETTINGS['use_trash'] by default) the path is only
+    renamed into a trash directory and purged in the background.
+    """
+    use_trash = DELETE_SETTINGS["use_trash"] if use_trash is None else use_trash
     try:
-        if os.path.isdir(path):
-           
-            for root, dirs, files in os.walk(path):
-                for dir in dirs:
-                    os.chmod(os.path.join(root, dir), stat.S_IWRITE)
-                for file in files:
-                    os.chmod(os.path.join(root, file), stat.S_IWRITE)
-            shutil.rmtree(path)
+        if use_trash:
+            move_to_trash(path)
         else:
-            os.chmod(path, stat.S_IWRITE)
-            os.remove(path)
+            delete_path(path, workers=workers)
         logging.info(f"Deleted {path}")
     except PermissionError as e:
         logging.error(f"Permission denied: {e}")
@@ -130,20 +150,26 @@ def summarize_file(file_path):
     except Exception as e:
         logging.error(f"Error summarizing file {file_path}: {e}")
 
-def display_log():
-    """Display a log of previous operations."""
+def display_log(limit=50, page=0, operation=None, path_prefix=None, since=None, until=None):
+    """Display the latest log entries matching the given filters."""
     try:
-        with open('operations.log', 'r') as log_file:
-            log_content = log_file.read()
-            print(log_content)
-            logging.info("Displayed log content.")
+        flush_journal()
+        for line in tail_log(JOURNAL_SETTINGS["path"], limit=limit, page=page, operation=operation,
+                             path_prefix=path_prefix, since=since, until=until):
+            print(line)
+        logging.info("Displayed log content.")
     except PermissionError as e:
         logging.error(f"Permission denied: {e}")
     except Exception as e:
         logging.error(f"Error displaying log: {e}")
 
-def categorize_file(file_name, categories):
-    """Categorize a file based on its extension."""
+def categorize_file(file_name, categories=None):
+    """Categorize a file based on its extension.
+
+    Without categories, the shared category registry from ai.categories is used.
+    """
+    if categories is None:
+        return REGISTRY.category_for_name(file_name) or "Others"
     _, ext = os.path.splitext(file_name)
     ext = ext.lower()
     for category, extensions in categories.items():
@@ -151,8 +177,14 @@ def categorize_file(file_name, categories):
             return category
     return "Others"
 
-def organize_files_task(source_directory, target_directory, model, show_message=None):
-    """Organize files in the source directory using the provided model."""
+def organize_files_task(source_directory, target_directory, model, show_message=None, recursive=False,
+                        dry_run=False, save_plan=None):
+    """Organize files in the source directory using the provided model.
+
+    The files are first classified into a MovePlan. With dry_run the plan is
+    only printed, and newly sniffed types are not cached; with save_plan it is
+    also written to that JSON file.
+    """
     try:
         if not os.path.exists(source_directory):
             logging.error(f"Source directory '{source_directory}' does not exist.")
@@ -160,22 +192,17 @@ def organize_files_task(source_directory, target_directory, model, show_message=
                 show_message("Error", f"Source directory '{source_directory}' does not exist.")
             return
 
-        if not os.path.exists(target_directory):
-            os.makedirs(target_directory)
-
-        for file_name in os.listdir(source_directory):
-            file_path = os.path.join(source_directory, file_name)
-            if os.path.isfile(file_path):
-                file_metadata = {
-                    'name': file_name,
-                    'size': os.path.getsize(file_path),
-                    'type': mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-                }
-                category = model.predict_category(file_metadata)
-                target_folder = os.path.join(target_directory, category)
-                if not os.path.exists(target_folder):
-                    os.makedirs(target_folder)
-                move_file(file_path, os.path.join(target_folder, file_name), show_dialog=False)
+        if dry_run:
+            with read_only_cache():
+                plan = plan_organize(source_directory, target_directory, model, recursive=recursive)
+        else:
+            plan = plan_organize(source_directory, target_directory, model, recursive=recursive)
+        if save_plan:
+            plan.save(save_plan)
+        if dry_run:
+            plan.print()
+            return plan
+        execute_plan(plan)
 
         # Log success and show success message
         logging.info(f"Files in '{source_directory}' have been organized successfully into '{target_directory}'.")
@@ -183,120 +210,87 @@ def organize_files_task(source_directory, target_directory, model, show_message=
             show_message("Success", f"Files in '{source_directory}' have been organized successfully into '{target_directory}'.")
 
         # Stop the function after successful completion
-        return
+        return plan
     except Exception as e:
         logging.error(f"Error organizing files: {e}")
         if show_message:
             show_message("Error", f"Error organizing files: {e}")
 
-def deorganize_files(source_directory):
-    """Moves files from subdirectories back to the main directory."""
-    try:
-        for root, dirs, files in os.walk(source_directory):
-            for file in files:
-                # Skip system files like desktop.ini
-                if file.lower() == "desktop.ini":
-                    logging.info(f"Skipping system file: {file}")
-                    continue
-
-                source_path = os.path.join(root, file)
-                target_path = os.path.join(source_directory, file)
-
-                # Avoid overwriting existing files
-                if os.path.exists(target_path):
-                    logging.warning(f"File already exists: {target_path}")
-                    continue
-
-                try:
-                    os.rename(source_path, target_path)
-                    logging.info(f"Moved {source_path} to {target_path}")
-                except PermissionError as e:
-                    logging.error(f"Permission denied: {e}")
-                except Exception as e:
-                    logging.error(f"Error moving file {file}: {e}")
+def deorganize_files(source_directory, workers=None, prune_empty=True, dry_run=False):
+    """Moves files from subdirectories back to the main directory.
 
+    Name collisions get a ' (n)' suffix instead of being skipped, and with
+    prune_empty the emptied subdirectories are removed afterwards.
+    """
+    try:
+        plan = plan_deorganize(source_directory)
+        if dry_run:
+            plan.print()
+            return plan
+        stats = execute_plan(plan, workers=workers)
+        if prune_empty:
+            stats['pruned'] = prune_empty_directories(source_directory)
+        logging.info(f"Deorganized {source_directory}: {stats['moved']} moved, {stats['errors']} errors, "
+                     f"{stats.get('pruned', 0)} empty directories removed")
+        return stats
     except Exception as e:
         logging.error(f"Error during deorganization: {e}")
 
 
+def prune_empty_directories(root):
+    """Remove the empty directories below root, deepest first; returns how many were removed."""
+    directories = [entry.path for entry in scan_directory(root, recursive=True, include_dirs=True) if entry.is_dir]
+    removed = 0
+    # Directories are scanned parents first, so reversed order visits children before their parents
+    for directory in reversed(directories):
+        try:
+            os.rmdir(directory)
+            removed += 1
+        except OSError:
+            # Not empty
+            pass
+    return removed
+
+
 def rename_files(directory):
     """Rename files intelligently based on content/type."""
     if not os.path.exists(directory):
         logging.error(f"Directory {directory} does not exist.")
         return
 
-    for root, _, files in os.walk(directory):
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            mime_type, _ = mimetypes.guess_type(file_path)
-            if mime_type:
-                print(f"Current file: {file_path}")
-                new_file_name = input(f"Enter new name for {file_name} (leave blank to skip): ").strip()
-                if new_file_name:
-                    new_file_path = os.path.join(root, new_file_name)
-                    try:
-                        os.rename(file_path, new_file_path)
-                        logging.info(f"Renamed file {file_path} to {new_file_path}")
-                    except PermissionError as e:
-                        logging.error(f"Permission denied: {e}")
-                    except Exception as e:
-                        logging.error(f"Error renaming file {file_path} to {new_file_path}: {e}")
-                else:
-                    logging.info(f"Skipped renaming file {file_path}")
+    for entry in scan_directory(directory, recursive=True):
+        file_name = entry.name
+        file_path = entry.path
+        mime_type, _ = mimetypes.guess_type(file_name)
+        if mime_type:
+            print(f"Current file: {file_path}")
+            new_file_name = input(f"Enter new name for {file_name} (leave blank to skip): ").strip()
+            if new_file_name:
+                new_file_path = os.path.join(os.path.dirname(file_path), new_file_name)
+                try:
+                    os.rename(file_path, new_file_path)
+                    logging.info(f"Renamed file {file_path} to {new_file_path}")
+                except PermissionError as e:
+                    logging.error(f"Permission denied: {e}")
+                except Exception as e:
+                    logging.error(f"Error renaming file {file_path} to {new_file_path}: {e}")
             else:
-                logging.warning(f"Could not determine MIME type for file {file_path}")
+                logging.info(f"Skipped renaming file {file_path}")
+        else:
+            logging.warning(f"Could not determine MIME type for file {file_path}")
 
 def log_operation(operation, details):
-    """Log an operation to the operations log."""
-    log_entry = {
-        'operation': operation,
-        'details': details
-    }
-    try:
-        with open('operations.log', 'a') as log_file:
-            log_file.write(json.dumps(log_entry) + '\n')
-    except PermissionError as e:
-        logging.error(f"Permission denied: {e}")
-
-class DirectoryEventHandler(FileSystemEventHandler):
-    def __init__(self, model, target_directory):
-        self.model = model
-        self.target_directory = target_directory
-
-    def on_created(self, event):
-        if not event.is_directory:
-            file_path = event.src_path
-            logging.info(f"New file detected: {file_path}")
-            self.organize_file(file_path)
-
-    def organize_file(self, file_path):
-        file_name = os.path.basename(file_path)
-        file_metadata = {
-            'name': file_name,
-            'size': os.path.getsize(file_path),
-            'type': mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-        }
-        category = self.model.predict_category(file_metadata)
-        target_folder = os.path.join(self.target_directory, category)
-        if not os.path.exists(target_folder):
-            try:
-                os.makedirs(target_folder)
-                logging.info(f"Created directory: {target_folder}")
-            except PermissionError as e:
-                logging.error(f"Permission denied: {e}")
-                return
-            except Exception as e:
-                logging.error(f"Error creating directory {target_folder}: {e}")
-                return
-        else:
-            logging.info(f"Directory already exists: {target_folder}")
-        try:
-            move_file(file_path, os.path.join(target_folder, file_name))
-        except PermissionError as e:
-            logging.error(f"Permission denied: {e}")
-        except Exception as e:
-            logging.error(f"Error moving file {file_path} to {target_folder}: {e}")
+    """Log an operation to the operations log.
 
+    Entries are queued for the background journal writer, which batches,
+    flushes and rotates the log according to JOURNAL_SETTINGS. A journal
+    that cannot take the entry (e.g. closed at exit) is logged, not raised,
+    so the operation itself still counts as done.
+    """
+    try:
+        get_journal().append(operation, details)
+    except Exception as e:
+        logging.error(f"Error logging {operation} operation: {e}")
 
 def process_file(file_path, target_directory, model):
     """Process a new file."""
@@ -304,7 +298,7 @@ def process_file(file_path, target_directory, model):
         file_metadata = {
             'name': os.path.basename(file_path),
             'size': os.path.getsize(file_path),
-            'type': mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            'type': detect_type(file_path)
         }
         category = model.predict_category(file_metadata)
         target_folder = os.path.join(target_directory, category)
@@ -324,41 +318,123 @@ def process_file(file_path, target_directory, model):
     except Exception as e:
         logging.error(f"Error moving file {file_path}: {e}")
 
-def sort_files_by_date(source_directory, target_directory):
-    """Organize files based on creation/modification date."""
+def sort_files_by_date(source_directory, target_directory, recursive=False, dry_run=False, save_plan=None,
+                       granularity=None, time_source=None, workers=None):
+    """Organize files based on creation/modification date.
+
+    Files go into one folder per year, month, ISO week or day (granularity) of
+    their mtime, ctime or birth time (time_source); see SORT_SETTINGS.
+    """
     if not os.path.exists(source_directory):
         logging.error(f"Source directory {source_directory} does not exist.")
         return
 
-    if not os.path.exists(target_directory):
-        os.makedirs(target_directory)
-
-    for file_name in os.listdir(source_directory):
-        file_path = os.path.join(source_directory, file_name)
-        if os.path.isfile(file_path):
-            
-            mod_time = os.path.getmtime(file_path)
-            mod_time_struct = time.localtime(mod_time)
-            year = mod_time_struct.tm_year
-            month = mod_time_struct.tm_mon
-            day = mod_time_struct.tm_mday
-
-            
-            target_subdir = os.path.join(target_directory, f"{year}-{month:02d}-{day:02d}")
-            if not os.path.exists(target_subdir):
-                os.makedirs(target_subdir)
-
-            
-            target_path = os.path.join(target_subdir, file_name)
+    plan = plan_sort_by_date(source_directory, target_directory, recursive=recursive, granularity=granularity,
+                             time_source=time_source)
+    if save_plan:
+        plan.save(save_plan)
+    if dry_run:
+        plan.print()
+        return plan
+    execute_plan(plan, workers=workers)
+
+    logging.info("File sorting by date completed.")
+    return plan
+
+def _hash_file(file_path, size, partial_bytes=None, chunk_size=1024 * 1024):
+    """Hash a file's contents, or only its first and last partial_bytes when given."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as file:
+        if partial_bytes is not None:
+            digest.update(file.read(partial_bytes))
+            if size > 2 * partial_bytes:
+                file.seek(size - partial_bytes)
+            digest.update(file.read(partial_bytes))
+        else:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _safe_hash(key_func, item):
+    """Apply key_func to a (path, size) pair, skipping files that cannot be read."""
+    try:
+        return key_func(item)
+    except OSError as e:
+        logging.warning(f"Skipping {item[0]}: {e}")
+        return None
+
+def _regroup(groups, key_func, workers):
+    """Split groups of (path, size) pairs by key_func, keeping groups with more than one file."""
+    items = [item for group in groups for item in group]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        keys = executor.map(lambda item: _safe_hash(key_func, item), items)
+        buckets = {}
+        for item, key in zip(items, keys):
+            if key is not None:
+                buckets.setdefault((item[1], key), []).append(item)
+    return [group for group in buckets.values() if len(group) > 1]
+
+def find_duplicates(directory, recursive=True, workers=None, min_size=1):
+    """Find sets of byte-identical files under directory.
+
+    Files are grouped by size first, then by a hash of their first and last few
+    KiB, and only the remaining candidates are hashed in full by a thread pool.
+    Returns a list of {'size': ..., 'paths': [...]} dicts sorted by reclaimable bytes.
+    """
+    partial_bytes = DEDUPE_SETTINGS["partial_bytes"]
+    chunk_size = DEDUPE_SETTINGS["chunk_size"]
+    workers = workers or DEDUPE_SETTINGS["workers"]
+
+    # Stage 1: group by size, counting hard links to the same inode only once
+    by_size = {}
+    seen_inodes = set()
+    for entry in scan_directory(directory, recursive=recursive):
+        size = entry.stat.st_size
+        inode = (entry.stat.st_dev, entry.stat.st_ino)
+        if size < min_size or (entry.stat.st_ino and inode in seen_inodes):
+            continue
+        seen_inodes.add(inode)
+        by_size.setdefault(size, []).append((entry.path, size))
+    groups = [group for group in by_size.values() if len(group) > 1]
+
+    # Stage 2: partial hash of the head and tail of each candidate
+    groups = _regroup(groups, lambda item: _hash_file(item[0], item[1], partial_bytes=partial_bytes), workers)
+
+    # Stage 3: full streaming hash, unless the partial hash already covered the whole file
+    small = [group for group in groups if group[0][1] <= 2 * partial_bytes]
+    large = [group for group in groups if group[0][1] > 2 * partial_bytes]
+    large = _regroup(large, lambda item: _hash_file(item[0], item[1], chunk_size=chunk_size), workers)
+
+    duplicates = [{'size': group[0][1], 'paths': sorted(path for path, _ in group)} for group in small + large]
+    duplicates.sort(key=lambda group: group['size'] * (len(group['paths']) - 1), reverse=True)
+    reclaimable = sum(group['size'] * (len(group['paths']) - 1) for group in duplicates)
+    logging.info(f"Found {len(duplicates)} duplicate sets in {directory}, {reclaimable} bytes reclaimable")
+    return duplicates
+
+def link_duplicates(duplicates):
+    """Replace every duplicate with a hard link to the first file of its set.
+
+    Returns the number of bytes reclaimed.
+    """
+    reclaimed = 0
+    for group in duplicates:
+        original, *copies = group['paths']
+        for duplicate in copies:
+            temp_path = f"{duplicate}.dedupe-tmp"
             try:
-                shutil.move(file_path, target_path)
-                logging.info(f"Moved {file_path} to {target_path}")
+                os.link(original, temp_path)
+                os.replace(temp_path, duplicate)
+                reclaimed += group['size']
+                logging.info(f"Linked {duplicate} to {original}")
+                log_operation('hardlink', {'source': original, 'target': duplicate})
             except PermissionError as e:
                 logging.error(f"Permission denied: {e}")
             except Exception as e:
-                logging.error(f"Error moving {file_path} to {target_path}: {e}")
-
-    logging.info("File sorting by date completed.")
+                logging.error(f"Error linking {duplicate} to {original}: {e}")
+            finally:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+    return reclaimed
 
 def generate_key():
     """Generate a key for encryption."""
@@ -379,7 +455,12 @@ def load_key():
         return None
 
 def encrypt_file(file_path):
-    """Encrypt a file for security."""
+    """Encrypt a file for security.
+
+    The file is encrypted in fixed-size authenticated segments into a temp file
+    that then replaces the original, so memory use is bounded and a crash never
+    leaves a half-written file behind.
+    """
     try:
         
         if not os.path.exists('encryption.key'):
@@ -390,17 +471,7 @@ def encrypt_file(file_path):
         if key is None:
             return
 
-        fernet = Fernet(key)
-
-        with open(file_path, 'rb') as file:
-            file_data = file.read()
-
-       
-        encrypted_data = fernet.encrypt(file_data)
-
-       
-        with open(file_path, 'wb') as file:
-            file.write(encrypted_data)
+        encrypt_file_in_place(file_path, key)
 
         logging.info(f"Encrypted file: {file_path}")
         log_operation('encrypt', {'file': file_path})
@@ -410,7 +481,7 @@ def encrypt_file(file_path):
         logging.error(f"Error encrypting file {file_path}: {e}")
 
 def decrypt_file(file_path):
-    """Decrypt a file."""
+    """Decrypt a file (streaming containers and legacy Fernet files)."""
     try:
         if not os.path.exists('encryption.key'):
             logging.error("Encryption key not found.")
@@ -418,15 +489,7 @@ def decrypt_file(file_path):
         key = load_key()
         if key is None:
             return
-        fernet = Fernet(key)
-
-        with open(file_path, 'rb') as file:
-            encrypted_data = file.read()
-
-        decrypted_data = fernet.decrypt(encrypted_data)
-
-        with open(file_path, 'wb') as file:
-            file.write(decrypted_data)
+        decrypt_file_in_place(file_path, key)
 
         logging.info(f"Decrypted file: {file_path}")
         log_operation('decrypt', {'file': file_path})
@@ -435,6 +498,54 @@ def decrypt_file(file_path):
     except Exception as e:
         logging.error(f"Error decrypting file {file_path}: {e}")
 
+def encrypt_directory(directory, workers=None):
+    """Encrypt every file under a directory in parallel, loading the key once.
+
+    Files that are already encrypted are skipped. Returns the aggregate statistics.
+    """
+    try:
+        if not os.path.isdir(directory):
+            logging.error(f"Directory does not exist: {directory}")
+            return None
+        key = generate_key() if not os.path.exists('encryption.key') else load_key()
+        if key is None:
+            return None
+
+        stats = encrypt_tree(directory, key, workers=workers, skip_files=('encryption.key',))
+        logging.info(f"Encrypted {stats['files']} files in {directory} ({stats['skipped']} skipped, "
+                     f"{stats['errors']} errors) at {stats['mb_per_second']:.1f} MB/s")
+        log_operation('encrypt_tree', {'path': directory, 'files': stats['files']})
+        return stats
+    except PermissionError as e:
+        logging.error(f"Permission denied: {e}")
+    except Exception as e:
+        logging.error(f"Error encrypting directory {directory}: {e}")
+    return None
+
+def decrypt_directory(directory, workers=None):
+    """Decrypt every encrypted file under a directory in parallel, loading the key once."""
+    try:
+        if not os.path.isdir(directory):
+            logging.error(f"Directory does not exist: {directory}")
+            return None
+        if not os.path.exists('encryption.key'):
+            logging.error("Encryption key not found.")
+            return None
+        key = load_key()
+        if key is None:
+            return None
+
+        stats = decrypt_tree(directory, key, workers=workers, skip_files=('encryption.key',))
+        logging.info(f"Decrypted {stats['files']} files in {directory} ({stats['skipped']} skipped, "
+                     f"{stats['errors']} errors) at {stats['mb_per_second']:.1f} MB/s")
+        log_operation('decrypt_tree', {'path': directory, 'files': stats['files']})
+        return stats
+    except PermissionError as e:
+        logging.error(f"Permission denied: {e}")
+    except Exception as e:
+        logging.error(f"Error decrypting directory {directory}: {e}")
+    return None
+
 def create_directory(parent_path, directory_name, show_dialog=True):
     """Create a new directory at the specified path."""
     try:
@@ -473,12 +584,15 @@ def create_directory(parent_path, directory_name, show_dialog=True):
             FileSelector.show_message("Error", error_msg, "error")
         return False
 
-def delete_directory(path, name):
+def delete_directory(path, name, use_trash=None, workers=None):
     """Delete a specified directory."""
     try:
         full_path = os.path.join(path, name)
         if os.path.exists(full_path) and os.path.isdir(full_path):
-            shutil.rmtree(full_path)
+            if DELETE_SETTINGS["use_trash"] if use_trash is None else use_trash:
+                move_to_trash(full_path)
+            else:
+                delete_tree(full_path, workers=workers)
             logging.info(f"Deleted directory: {full_path}")
             log_operation('delete_directory', {'path': full_path})
         else:
@@ -488,11 +602,15 @@ def delete_directory(path, name):
     except Exception as e:
         logging.error(f"Error deleting directory {full_path}: {e}")
 
-def list_files_in_directory(path):
-    """List files in a specified directory."""
+def list_files_in_directory(path, recursive=False):
+    """List files in a specified directory.
+
+    With recursive, files in subdirectories are listed by their path relative to path.
+    """
     try:
         if os.path.exists(path) and os.path.isdir(path):
-            files = os.listdir(path)
+            files = [os.path.relpath(entry.path, path) if entry.depth else entry.name
+                     for entry in scan_directory(path, recursive=recursive, include_dirs=not recursive)]
             logging.info(f"Files in directory {path}: {files}")
             return files
         else:
@@ -533,7 +651,7 @@ def view_file_metadata(file_path):
             metadata = {
                 "Size": os.path.getsize(file_path),
                 "Created": time.ctime(os.path.getmtime(file_path)),
-                "Type": mimetypes.guess_type(file_path)[0]
+                "Type": detect_type(file_path)
             }
             logging.info(f"Metadata for {file_path}: {metadata}")
             return metadata
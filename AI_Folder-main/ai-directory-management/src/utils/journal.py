@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+from threading import Thread, Event, Lock
+
+from config.settings import JOURNAL_SETTINGS
+from utils.log_viewer import INDEX_SUFFIX
+
+FSYNC_NEVER = 'never'
+FSYNC_BATCH = 'batch'
+FSYNC_CLOSE = 'close'
+
+# Control messages for the writer thread
+_FLUSH = 'flush'
+_STOP = 'stop'
+
+
+class OperationJournal:
+    """Operations log written by a background thread in batches.
+
+    Entries are flushed every flush_every_entries entries, every
+    flush_every_ms milliseconds, on flush() and on close(). The fsync policy
+    makes each written batch durable (FSYNC_BATCH), only the final write
+    (FSYNC_CLOSE) or leaves it to the OS (FSYNC_NEVER). Once the file grows past
+    max_bytes it is rotated to path.1, path.2, ... keeping backup_count segments.
+    """
+
+    def __init__(self, path=None, flush_every_entries=None, flush_every_ms=None, fsync=None,
+                 max_bytes=None, backup_count=None):
+        settings = JOURNAL_SETTINGS
+        self.path = os.path.abspath(path or settings["path"])
+        self.flush_every_entries = flush_every_entries or settings["flush_every_entries"]
+        self.flush_interval = (flush_every_ms or settings["flush_every_ms"]) / 1000.0
+        self.fsync = fsync or settings["fsync"]
+        self.max_bytes = max_bytes if max_bytes is not None else settings["max_bytes"]
+        self.backup_count = backup_count if backup_count is not None else settings["backup_count"]
+
+        self._queue = queue.Queue()
+        self._file = None
+        self._closed = False
+        self._thread = Thread(target=self._run, name="operations-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, operation, details):
+        """Queue an entry; it is written by the background thread."""
+        if self._closed:
+            raise ValueError("Journal is closed.")
+        self._queue.put({'operation': operation, 'details': details, 'time': time.time()})
+
+    def flush(self):
+        """Block until every entry queued so far has been written."""
+        if self._closed:
+            return
+        done = Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        """Write the remaining entries, apply the close fsync policy and stop the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join()
+
+    def _run(self):
+        buffer = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            control = item if isinstance(item, tuple) else None
+            if item is not None and control is None:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(buffer) < self.flush_every_entries and time.monotonic() < deadline:
+                    continue
+
+            if buffer or control:
+                self._write(buffer, final=control is not None and control[0] == _STOP)
+            buffer = []
+            deadline = None
+
+            if control:
+                if control[0] == _STOP:
+                    self._close_file()
+                    return
+                control[1].set()
+
+    def _write(self, entries, final=False):
+        if not entries and self._file is None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            if entries:
+                self._file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+                self._file.flush()
+            if self.fsync == FSYNC_BATCH or (final and self.fsync == FSYNC_CLOSE):
+                os.fsync(self._file.fileno())
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except PermissionError as e:
+            logging.error(f"Permission denied: {e}")
+        except Exception as e:
+            logging.error(f"Error writing operations journal {self.path}: {e}")
+
+    def _rotate(self):
+        self._close_file()
+        for index in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                self._replace_segment(older, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            self._replace_segment(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+            self._remove_index(self.path)
+
+    def _replace_segment(self, source, destination):
+        """Rename a log segment together with the log viewer's offset index of it.
+
+        The index is keyed by the segment's inode, so it stays valid under the
+        new name; the index of the segment being replaced is removed.
+        """
+        os.replace(source, destination)
+        if os.path.exists(source + INDEX_SUFFIX):
+            os.replace(source + INDEX_SUFFIX, destination + INDEX_SUFFIX)
+        else:
+            self._remove_index(destination)
+
+    @staticmethod
+    def _remove_index(segment):
+        try:
+            os.remove(segment + INDEX_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_journal = None
+_journal_path = None
+_journal_lock = Lock()
+
+
+def get_journal():
+    """Return the process-wide journal, starting it on first use."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = OperationJournal(_journal_path)
+            atexit.register(_journal.close)
+        return _journal
+
+
+def reset_journal(path=None):
+    """Close the process-wide journal; the next get_journal() starts one writing to path.
+
+    path defaults to JOURNAL_SETTINGS['path']. Tests use this to keep their
+    entries out of the real operations log.
+    """
+    global _journal, _journal_path
+    with _journal_lock:
+        if _journal is not None:
+            _journal.close()
+            atexit.unregister(_journal.close)
+            _journal = None
+        _journal_path = path
+
+
+def prediction_details(file_metadata, category):
+    """Journal fields recording the category an organize move was predicted into.
+
+    Added to 'move' entries so that later moves of the file out of its
+    category folder can be learned from (see ai/feedback.py).
+    """
+    return {'category': category, 'size': file_metadata['size'], 'type': file_metadata['type']}
+
+
+def flush_journal():
+    """Flush the process-wide journal if it has been started."""
+    if _journal is not None:
+        _journal.flush()
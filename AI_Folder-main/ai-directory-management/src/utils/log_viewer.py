@@ -0,0 +1,168 @@
+import os
+import json
+import struct
+from datetime import datetime
+from array import array
+
+# Sidecar index file name: log path + INDEX_SUFFIX. Layout: MAGIC | inode |
+# indexed size, then one uint64 start offset per complete line of the log.
+INDEX_SUFFIX = '.idx'
+_INDEX_MAGIC = b"AIDMIDX1"
+_INDEX_HEADER = struct.Struct("<8sQQ")
+_READ_BLOCK = 1024 * 1024
+# Entries read from the log per backwards step
+_TAIL_BLOCK = 1024
+
+
+class LogIndex:
+    """Byte-offset index of a JSON-lines log, kept in a sidecar file (log + '.idx').
+
+    The index is extended incrementally as the log grows and rebuilt when the
+    log is replaced (rotated) or truncated.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.index_path = log_path + INDEX_SUFFIX
+        self.count = 0
+        self.indexed_size = 0
+
+    def update(self):
+        """Index any complete lines appended since the last update; returns the entry count."""
+        log_stat = os.stat(self.log_path)
+        inode, indexed_size = self._read_header()
+        if inode != log_stat.st_ino or indexed_size > log_stat.st_size:
+            indexed_size = 0
+            with open(self.index_path, 'wb') as index_file:
+                index_file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, log_stat.st_ino, 0))
+
+        if indexed_size < log_stat.st_size:
+            offsets = array('Q')
+            position = indexed_size
+            with open(self.log_path, 'rb') as log_file:
+                log_file.seek(indexed_size)
+                pending = b''
+                while True:
+                    block = log_file.read(_READ_BLOCK)
+                    if not block:
+                        break
+                    data = pending + block
+                    start = 0
+                    while True:
+                        newline = data.find(b'\n', start)
+                        if newline < 0:
+                            break
+                        offsets.append(position + start)
+                        start = newline + 1
+                    position += start
+                    pending = data[start:]
+            with open(self.index_path, 'r+b') as index_file:
+                index_file.seek(0, os.SEEK_END)
+                offsets.tofile(index_file)
+                index_file.seek(0)
+                index_file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, log_stat.st_ino, position))
+            indexed_size = position
+
+        self.indexed_size = indexed_size
+        self.count = (os.path.getsize(self.index_path) - _INDEX_HEADER.size) // 8
+        return self.count
+
+    def _read_header(self):
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                magic, inode, indexed_size = _INDEX_HEADER.unpack(index_file.read(_INDEX_HEADER.size))
+            if magic == _INDEX_MAGIC:
+                return inode, indexed_size
+        except (OSError, struct.error):
+            pass
+        return None, 0
+
+    def read_lines(self, start, stop):
+        """Return the raw lines of entries start..stop-1 with one read of each file."""
+        if start >= stop:
+            return []
+        offsets = array('Q')
+        with open(self.index_path, 'rb') as index_file:
+            index_file.seek(_INDEX_HEADER.size + start * 8)
+            # The next entry's offset, when there is one, marks where the last line ends
+            offsets.fromfile(index_file, min(stop + 1, self.count) - start)
+        end = offsets.pop() if stop < self.count else self.indexed_size
+        with open(self.log_path, 'rb') as log_file:
+            log_file.seek(offsets[0])
+            data = log_file.read(end - offsets[0])
+        base = offsets[0]
+        bounds = [offset - base for offset in offsets] + [len(data)]
+        return [data[bounds[i]:bounds[i + 1]].rstrip(b'\r\n').decode('utf-8', errors='replace')
+                for i in range(len(offsets))]
+
+
+def parse_log_time(value):
+    """Parse an ISO date/time or epoch seconds into the epoch seconds logged with each entry."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _log_segments(log_path):
+    """Yield the log and its rotated segments, newest first."""
+    if os.path.exists(log_path):
+        yield log_path
+    index = 1
+    while os.path.exists(f"{log_path}.{index}"):
+        yield f"{log_path}.{index}"
+        index += 1
+
+
+def _matches(entry, operation, path_prefix, since, until):
+    if operation and entry.get('operation') != operation:
+        return False
+    if path_prefix:
+        details = entry.get('details') or {}
+        if not any(isinstance(value, str) and value.startswith(path_prefix) for value in details.values()):
+            return False
+    if since is not None or until is not None:
+        entry_time = entry.get('time')
+        if entry_time is None:
+            return False
+        if since is not None and entry_time < since:
+            return False
+        if until is not None and entry_time > until:
+            return False
+    return True
+
+
+def tail_log(log_path, limit=50, page=0, operation=None, path_prefix=None, since=None, until=None):
+    """Return up to limit raw log lines matching the filters, newest page first.
+
+    Page 0 holds the newest matches, page 1 the ones before them, and so on;
+    lines within a page are in chronological order. Entries are read backwards
+    through the offset index, so only the tail of the log is touched.
+    """
+    skip = page * limit
+    matches = []
+    for segment in _log_segments(log_path):
+        index = LogIndex(segment)
+        stop = index.update()
+        while stop > 0 and len(matches) < limit:
+            start = max(0, stop - _TAIL_BLOCK)
+            for line in reversed(index.read_lines(start, stop)):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not _matches(entry, operation, path_prefix, since, until):
+                    # The journal is chronological, nothing older can match the time range
+                    if since is not None and entry.get('time') is not None and entry['time'] < since:
+                        return list(reversed(matches))
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                matches.append(line)
+                if len(matches) >= limit:
+                    break
+            stop = start
+        if len(matches) >= limit:
+            break
+    return list(reversed(matches))
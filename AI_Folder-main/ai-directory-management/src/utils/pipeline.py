@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import logging
+from threading import Thread, Lock
+
+from config.settings import PIPELINE_SETTINGS, MODEL_SETTINGS
+from utils.file_operations import move_file
+from utils.journal import prediction_details
+from utils.scanner import scan_directory, file_metadata
+
+# Marks the end of a stage's input; each worker puts it back for its siblings.
+_DONE = object()
+
+
+def _next_batch(in_queue, batch_size):
+    """Block for one item, then drain up to batch_size items without waiting.
+
+    Returns (items, done) where done tells that the end of input was reached.
+    """
+    item = in_queue.get()
+    if item is _DONE:
+        in_queue.put(_DONE)
+        return [], True
+    items = [item]
+    while len(items) < batch_size:
+        try:
+            item = in_queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is _DONE:
+            in_queue.put(_DONE)
+            return items, True
+        items.append(item)
+    return items, False
+
+
+def _start_stage(name, handle_item, in_queue, out_queue, workers, batch_size=None):
+    """Start a pool of worker threads feeding items from in_queue to handle_item.
+
+    With batch_size set, handle_item receives a list of up to batch_size items.
+    Returns a closer thread that finishes once every worker is done and then
+    signals the end of input to the next stage.
+    """
+    def run():
+        done = False
+        while not done:
+            items, done = _next_batch(in_queue, batch_size or 1)
+            if not items:
+                continue
+            try:
+                handle_item(items if batch_size else items[0], out_queue)
+            except Exception as e:
+                logging.error(f"Error in {name} stage: {e}")
+
+    threads = [Thread(target=run, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+
+    def close():
+        for thread in threads:
+            thread.join()
+        if out_queue is not None:
+            out_queue.put(_DONE)
+
+    closer = Thread(target=close, name=f"{name}-closer", daemon=True)
+    closer.start()
+    return closer
+
+
+def organize_files_pipelined(source_directory, target_directory, model, show_message=None,
+                             scan_workers=None, classify_workers=None, move_workers=None, queue_size=None,
+                             recursive=False):
+    """Organize files with a scan -> classify -> move pipeline.
+
+    Produces the same category layout as organize_files_task and returns a dict
+    with the number of files moved, the elapsed time and the files per second.
+    """
+    scan_workers = scan_workers or PIPELINE_SETTINGS["scan_workers"]
+    classify_workers = classify_workers or PIPELINE_SETTINGS["classify_workers"]
+    move_workers = move_workers or PIPELINE_SETTINGS["move_workers"]
+    queue_size = queue_size or PIPELINE_SETTINGS["queue_size"]
+
+    try:
+        if not os.path.isdir(source_directory):
+            logging.error(f"Source directory '{source_directory}' does not exist.")
+            if show_message:
+                show_message("Error", f"Source directory '{source_directory}' does not exist.")
+            return None
+
+        os.makedirs(target_directory, exist_ok=True)
+
+        entry_queue = queue.Queue(maxsize=queue_size)
+        classify_queue = queue.Queue(maxsize=queue_size)
+        move_queue = queue.Queue(maxsize=queue_size)
+
+        created_folders = set()
+        folders_lock = Lock()
+        moved = [0]
+        moved_lock = Lock()
+
+        def scan(entry, out_queue):
+            out_queue.put((entry.path, file_metadata(entry)))
+
+        def classify(items, out_queue):
+            categories = model.predict_categories([metadata for _, metadata in items])
+            for (file_path, metadata), category in zip(items, categories):
+                out_queue.put((file_path, metadata, category))
+
+        def move(item, out_queue):
+            file_path, metadata, category = item
+            target_folder = os.path.join(target_directory, category)
+            with folders_lock:
+                if target_folder not in created_folders:
+                    os.makedirs(target_folder, exist_ok=True)
+                    created_folders.add(target_folder)
+            if move_file(file_path, os.path.join(target_folder, metadata['name']), show_dialog=False,
+                         prediction=prediction_details(metadata, category), unique=True):
+                with moved_lock:
+                    moved[0] += 1
+
+        start = time.perf_counter()
+        _start_stage("scan", scan, entry_queue, classify_queue, scan_workers)
+        _start_stage("classify", classify, classify_queue, move_queue, classify_workers,
+                     batch_size=MODEL_SETTINGS["batch_size"])
+        move_closer = _start_stage("move", move, move_queue, None, move_workers)
+
+        try:
+            for entry in scan_directory(source_directory, recursive=recursive, exclude=(target_directory,)):
+                entry_queue.put(entry)
+        finally:
+            # Let the stages finish the files already scanned even if scanning failed
+            entry_queue.put(_DONE)
+            move_closer.join()
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'files': moved[0],
+            'seconds': elapsed,
+            'files_per_second': moved[0] / elapsed if elapsed > 0 else 0.0,
+        }
+        message = (f"Files in '{source_directory}' have been organized successfully into '{target_directory}' "
+                   f"({stats['files']} files in {elapsed:.2f}s, {stats['files_per_second']:.1f} files/s).")
+        logging.info(message)
+        if show_message:
+            show_message("Success", message)
+        return stats
+    except Exception as e:
+        logging.error(f"Error organizing files: {e}")
+        if show_message:
+            show_message("Error", f"Error organizing files: {e}")
+        return None
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import logging
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import MODEL_SETTINGS, PLAN_SETTINGS, SORT_SETTINGS
+from utils.copy_engine import move_to_free_name
+from utils.journal import get_journal, prediction_details
+from utils.scanner import scan_directory, file_metadata
+
+
+def resolve_collision(name, occupied, counters=None):
+    """Return name, or 'stem (n).ext' with the smallest free n, and mark it occupied.
+
+    counters, if given, remembers the last n tried per name, so many files
+    with the same name do not rescan all earlier suffixes.
+    """
+    candidate = name
+    if candidate in occupied:
+        stem, extension = os.path.splitext(name)
+        counter = counters.get(name, 0) if counters is not None else 0
+        while candidate in occupied:
+            counter += 1
+            candidate = f"{stem} ({counter}){extension}"
+        if counters is not None:
+            counters[name] = counter
+    occupied.add(candidate)
+    return candidate
+
+
+class PlannedMove:
+    __slots__ = ('source', 'destination', 'category', 'metadata')
+
+    def __init__(self, source, destination, category, metadata=None):
+        self.source = source
+        self.destination = destination
+        self.category = category
+        # File metadata the category was predicted from, for organize plans
+        self.metadata = metadata
+
+
+class MovePlan:
+    """An ordered list of planned moves that can be printed, saved as JSON or executed.
+
+    Destination names are made unique while planning: a file never replaces
+    an existing file or another planned file, it gets a ' (n)' suffix instead.
+    Each destination directory is listed at most once to learn its names.
+    Executing the plan re-checks each destination, so files created there
+    after planning are not replaced either.
+    """
+
+    def __init__(self, source_directory=None, target_directory=None):
+        self.source_directory = source_directory
+        self.target_directory = target_directory
+        self.moves = []
+        # destination directory -> names already taken in it
+        self._occupied = {}
+        # destination directory -> {name: last collision suffix used}
+        self._counters = {}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def add(self, source, destination_directory, category, metadata=None):
+        """Plan a move of source into destination_directory under a free name.
+
+        metadata is given when category was predicted from it; it is journaled
+        with the move.
+        """
+        occupied = self._occupied.get(destination_directory)
+        if occupied is None:
+            try:
+                occupied = set(os.listdir(destination_directory))
+            except OSError:
+                occupied = set()
+            self._occupied[destination_directory] = occupied
+            self._counters[destination_directory] = {}
+        name = resolve_collision(os.path.basename(source), occupied, self._counters[destination_directory])
+        self.moves.append(PlannedMove(source, os.path.join(destination_directory, name), category, metadata))
+
+    def directories(self):
+        """Return the destination directories, each once."""
+        return list(dict.fromkeys(os.path.dirname(move.destination) for move in self.moves))
+
+    def summary(self):
+        """Return {category: number of planned moves}."""
+        return dict(Counter(move.category for move in self.moves))
+
+    def print(self, file=None):
+        file = file or sys.stdout
+        for move in self.moves:
+            print(f"{move.source} -> {move.destination}", file=file)
+        print(f"\nPlan: {len(self.moves)} files into {len(self.directories())} directories", file=file)
+        for category, count in sorted(self.summary().items()):
+            print(f"  {category}: {count}", file=file)
+
+    def save(self, path):
+        """Write the plan as JSON."""
+        with open(path, 'w', encoding='utf-8') as plan_file:
+            json.dump({
+                'source_directory': self.source_directory,
+                'target_directory': self.target_directory,
+                'moves': [{'source': move.source, 'destination': move.destination, 'category': move.category,
+                           'metadata': move.metadata} for move in self.moves],
+            }, plan_file, indent=1)
+        logging.info(f"Saved plan with {len(self.moves)} moves to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """Read a plan written by save()."""
+        with open(path, 'r', encoding='utf-8') as plan_file:
+            data = json.load(plan_file)
+        plan = cls(data.get('source_directory'), data.get('target_directory'))
+        plan.moves = [PlannedMove(move['source'], move['destination'], move['category'], move.get('metadata'))
+                      for move in data['moves']]
+        return plan
+
+
+def plan_organize(source_directory, target_directory, model, recursive=False):
+    """Scan and classify source_directory into a plan of moves into category folders."""
+    plan = MovePlan(source_directory, target_directory)
+    batch = []
+
+    def classify(batch):
+        metadata_list = [file_metadata(entry) for entry in batch]
+        categories = model.predict_categories(metadata_list)
+        for entry, metadata, category in zip(batch, metadata_list, categories):
+            plan.add(entry.path, os.path.join(target_directory, category), category, metadata)
+
+    for entry in scan_directory(source_directory, recursive=recursive, exclude=(target_directory,)):
+        batch.append(entry)
+        if len(batch) >= MODEL_SETTINGS["batch_size"]:
+            classify(batch)
+            batch = []
+    if batch:
+        classify(batch)
+    return plan
+
+
+# Folder name for each sort-by-date granularity
+GRANULARITIES = {
+    'year': lambda moment: f"{moment.year}",
+    'month': lambda moment: f"{moment.year}-{moment.month:02d}",
+    'week': lambda moment: "{0}-W{1:02d}".format(*moment.isocalendar()),
+    'day': lambda moment: f"{moment.year}-{moment.month:02d}-{moment.day:02d}",
+}
+
+# Folder names are cached per 15-minute slot of timestamps. Current time zone
+# offsets are multiples of 15 minutes, but historical ones are not (e.g. local
+# mean time, or +00:19:32 in the Netherlands before 1937), so a slot is only
+# cached when both of its ends fall into the same folder.
+_BUCKET_SLOT = 900
+
+
+def _timestamp_getter(time_source):
+    """Return a function reading the requested timestamp from a stat result."""
+    if time_source == 'mtime':
+        return lambda file_stat: file_stat.st_mtime
+    if time_source == 'ctime':
+        return lambda file_stat: file_stat.st_ctime
+    if time_source == 'birth':
+        if hasattr(os.stat_result, 'st_birthtime'):
+            return lambda file_stat: getattr(file_stat, 'st_birthtime', file_stat.st_mtime)
+        if os.name == 'nt':
+            # st_ctime is the creation time on Windows
+            return lambda file_stat: file_stat.st_ctime
+        logging.warning("File birth times are not available on this platform, using modification times.")
+        return lambda file_stat: file_stat.st_mtime
+    raise ValueError(f"Unknown time source: {time_source}")
+
+
+def plan_sort_by_date(source_directory, target_directory, recursive=False, granularity=None, time_source=None):
+    """Plan moves of the files in source_directory into date folders.
+
+    granularity is 'year' (YYYY), 'month' (YYYY-MM), 'week' (ISO YYYY-Www) or
+    'day' (YYYY-MM-DD); time_source is 'mtime', 'ctime' or 'birth'. Folder
+    names are computed once per 15 minutes of timestamps instead of once per
+    file, except for slots that a local day boundary falls inside.
+    """
+    granularity = granularity or SORT_SETTINGS["granularity"]
+    bucket_name = GRANULARITIES[granularity]
+    get_timestamp = _timestamp_getter(time_source or SORT_SETTINGS["time_source"])
+    # timestamp slot -> destination folder, or None if the slot spans two folders
+    buckets = {}
+
+    plan = MovePlan(source_directory, target_directory)
+    for entry in scan_directory(source_directory, recursive=recursive, exclude=(target_directory,)):
+        timestamp = get_timestamp(entry.stat)
+        slot = int(timestamp // _BUCKET_SLOT)
+        if slot in buckets:
+            bucket = buckets[slot]
+        else:
+            first = bucket_name(datetime.fromtimestamp(slot * _BUCKET_SLOT))
+            last = bucket_name(datetime.fromtimestamp((slot + 1) * _BUCKET_SLOT - 1))
+            bucket = buckets[slot] = first if first == last else None
+        if bucket is None:
+            bucket = bucket_name(datetime.fromtimestamp(timestamp))
+        plan.add(entry.path, os.path.join(target_directory, bucket), bucket)
+    return plan
+
+
+def plan_deorganize(source_directory, skip_names=('desktop.ini',)):
+    """Plan moves of every file in the subdirectories of source_directory up into it.
+
+    Files are planned in sorted path order, so name collisions resolve to the
+    same ' (n)' suffixes on every run. Files named in skip_names
+    (case-insensitive) stay where they are.
+    """
+    skip_names = {name.lower() for name in skip_names}
+    entries = [entry for entry in scan_directory(source_directory, recursive=True)
+               if entry.depth > 0 and entry.name.lower() not in skip_names]
+    entries.sort(key=lambda entry: entry.path)
+
+    plan = MovePlan(source_directory, source_directory)
+    for entry in entries:
+        subdirectory = os.path.relpath(entry.path, source_directory).split(os.sep, 1)[0]
+        plan.add(entry.path, source_directory, subdirectory)
+    return plan
+
+
+def _move_batch(moves):
+    """Move a batch of planned moves; returns (moved, errors).
+
+    A file that appeared at a planned destination since planning is never
+    replaced; the moved file gets the next free ' (n)' name instead.
+    """
+    moved = errors = 0
+    journal = get_journal()
+    for move in moves:
+        try:
+            destination = move_to_free_name(move.source, move.destination)
+        except PermissionError as e:
+            logging.error(f"Permission denied: {e}")
+            errors += 1
+            continue
+        except Exception as e:
+            logging.error(f"Error moving {move.source} to {move.destination}: {e}")
+            errors += 1
+            continue
+        moved += 1
+        if destination != move.destination:
+            logging.warning(f"{move.destination} exists now; moved {move.source} to {destination} instead")
+        details = {'source': move.source, 'target': destination}
+        if move.metadata is not None:
+            details.update(prediction_details(move.metadata, move.category))
+        try:
+            journal.append('move', details)
+        except Exception as e:
+            # The file has been moved either way
+            logging.error(f"Error logging move operation: {e}")
+    return moved, errors
+
+
+def execute_plan(plan, workers=None, batch_size=None):
+    """Create every destination directory once, then run the moves in batches on a thread pool."""
+    workers = workers or PLAN_SETTINGS["workers"]
+    batch_size = batch_size or PLAN_SETTINGS["batch_size"]
+    start = time.perf_counter()
+
+    for directory in plan.directories():
+        os.makedirs(directory, exist_ok=True)
+
+    moved = errors = 0
+    moves = plan.moves
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batches = (moves[index:index + batch_size] for index in range(0, len(moves), batch_size))
+        for batch_moved, batch_errors in executor.map(_move_batch, batches):
+            moved += batch_moved
+            errors += batch_errors
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Executed plan: {moved} moved, {errors} errors in {elapsed:.2f}s")
+    return {'moved': moved, 'errors': errors, 'seconds': elapsed}
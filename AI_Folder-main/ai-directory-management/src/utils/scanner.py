@@ -0,0 +1,100 @@
+import os
+import logging
+
+from utils.sniffer import detect_type
+
+
+class ScanEntry:
+    """A scanned file, directory or symlink carrying the stat result cached by os.scandir."""
+
+    __slots__ = ('path', 'name', 'stat', 'depth', 'is_dir', 'is_link')
+
+    def __init__(self, path, name, stat, depth, is_dir=False, is_link=False):
+        self.path = path
+        self.name = name
+        self.stat = stat
+        self.depth = depth
+        self.is_dir = is_dir
+        # A symlink yielded as itself (with its lstat), see scan_directory's include_links
+        self.is_link = is_link
+
+    def __repr__(self):
+        return f"ScanEntry({self.path!r}, depth={self.depth})"
+
+
+def scan_directory(root, recursive=False, max_depth=None, follow_symlinks=False, include_dirs=False, exclude=(),
+                   include_links=False):
+    """Yield a ScanEntry for every file under root.
+
+    Entries directly inside root have depth 0. Without recursive only depth 0 is
+    scanned, otherwise subdirectories are walked depth-first down to max_depth
+    (unlimited when None). Symlinked files are yielded like os.path.isfile would
+    see them, but symlinked directories are only descended into when
+    follow_symlinks is set. Directories listed in exclude are skipped, and with
+    include_dirs directories are yielded before their contents. With
+    include_links, symlinks that are neither followed nor yielded as files
+    (links to directories, dangling links) are yielded with is_link set.
+
+    Only one os.scandir iterator per directory level is open at a time, so
+    memory stays flat no matter how many files the tree holds.
+    """
+    if not recursive:
+        max_depth = 0
+    excluded = {os.path.normcase(os.path.abspath(path)) for path in exclude}
+    visited = set()
+
+    try:
+        if follow_symlinks:
+            root_stat = os.stat(root)
+            visited.add((root_stat.st_dev, root_stat.st_ino))
+        stack = [(os.scandir(root), 0)]
+    except OSError as e:
+        logging.error(f"Error scanning directory {root}: {e}")
+        return
+
+    try:
+        while stack:
+            iterator, depth = stack[-1]
+            entry = next(iterator, None)
+            if entry is None:
+                iterator.close()
+                stack.pop()
+                continue
+
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if excluded and os.path.normcase(os.path.abspath(entry.path)) in excluded:
+                        continue
+                    dir_stat = entry.stat(follow_symlinks=follow_symlinks)
+                    if include_dirs:
+                        yield ScanEntry(entry.path, entry.name, dir_stat, depth, is_dir=True)
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if follow_symlinks:
+                        # Guard against symlink loops
+                        key = (dir_stat.st_dev, dir_stat.st_ino)
+                        if key in visited:
+                            continue
+                        visited.add(key)
+                    try:
+                        stack.append((os.scandir(entry.path), depth + 1))
+                    except OSError as e:
+                        logging.warning(f"Skipping directory {entry.path}: {e}")
+                elif entry.is_file():
+                    yield ScanEntry(entry.path, entry.name, entry.stat(), depth)
+                elif include_links and entry.is_symlink():
+                    yield ScanEntry(entry.path, entry.name, entry.stat(follow_symlinks=False), depth, is_link=True)
+            except OSError as e:
+                logging.warning(f"Skipping {entry.path}: {e}")
+    finally:
+        for iterator, _ in stack:
+            iterator.close()
+
+
+def file_metadata(entry):
+    """Build the metadata dict the category model expects from a ScanEntry."""
+    return {
+        'name': entry.name,
+        'size': entry.stat.st_size,
+        'type': detect_type(entry.path, entry.name, entry.stat)
+    }
@@ -0,0 +1,340 @@
+import os
+import sys
+import atexit
+import sqlite3
+import logging
+import mimetypes
+from threading import Lock
+from contextlib import contextmanager
+
+from config.settings import SNIFF_SETTINGS
+
+try:
+    import magic
+except ImportError:
+    # python-magic is optional (and needs the libmagic library); the builtin table is used instead
+    magic = None
+
+DEFAULT_TYPE = 'application/octet-stream'
+
+# (offset, signature, MIME type), checked in order
+SIGNATURES = (
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'fLaC', 'audio/flac'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'\x1aE\xdf\xa3', 'video/x-matroska'),
+    (0, b'Rar!\x1a\x07', 'application/x-rar-compressed'),
+    (0, b'\x1f\x8b', 'application/x-gzip'),
+    (0, b'BZh', 'application/x-bzip2'),
+    (0, b'\xfd7zXZ\x00', 'application/x-xz'),
+    (0, b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed'),
+    (257, b'ustar', 'application/x-tar'),
+    (0, b'SQLite format 3\x00', 'application/x-sqlite3'),
+    (0, b'MZ', 'application/x-msdownload'),
+    (0, b'\x7fELF', 'application/x-executable'),
+    (0, b'\x00\x01\x00\x00\x00', 'application/x-font-ttf'),
+    (0, b'OTTO', 'application/x-font-otf'),
+    (0, b'<?xml', 'application/xml'),
+)
+
+# RIFF form type -> MIME type
+_RIFF_TYPES = {b'WAVE': 'audio/x-wav', b'AVI ': 'video/x-msvideo', b'WEBP': 'image/webp'}
+
+# ISO base media (MP4) major brand -> MIME type, video/mp4 otherwise
+_FTYP_BRANDS = {b'qt  ': 'video/quicktime', b'M4A ': 'audio/mp4', b'heic': 'image/heic', b'heix': 'image/heic',
+                b'mif1': 'image/heif'}
+
+# Office Open XML part folder -> MIME type, for ZIP archives that turn out to be documents
+_OOXML_PARTS = (
+    (b'word/', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'xl/', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    (b'ppt/', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'),
+)
+
+# Stream names (UTF-16) inside legacy Office compound files
+_OLE_STREAMS = (
+    ('WordDocument'.encode('utf-16-le'), 'application/msword'),
+    ('Workbook'.encode('utf-16-le'), 'application/vnd.ms-excel'),
+    ('PowerPoint'.encode('utf-16-le'), 'application/vnd.ms-powerpoint'),
+)
+
+# Script interpreter named on a #! line -> MIME type
+_INTERPRETERS = (
+    (b'python', 'application/x-python-code'),
+    (b'node', 'application/javascript'),
+    (b'perl', 'application/x-perl'),
+    (b'ruby', 'application/x-ruby'),
+    (b'php', 'application/x-php'),
+    (b'sh', 'application/x-sh'),
+)
+
+# libmagic names for types the category rules know under another name
+_MAGIC_ALIASES = {
+    'application/gzip': 'application/x-gzip',
+    'application/x-rar': 'application/x-rar-compressed',
+    'application/vnd.rar': 'application/x-rar-compressed',
+    'application/x-dosexec': 'application/x-msdownload',
+    'application/vnd.microsoft.portable-executable': 'application/x-msdownload',
+    'application/vnd.sqlite3': 'application/x-sqlite3',
+    'font/sfnt': 'application/x-font-ttf',
+    'font/ttf': 'application/x-font-ttf',
+    'font/otf': 'application/x-font-otf',
+    'text/x-python': 'application/x-python-code',
+    'text/x-script.python': 'application/x-python-code',
+    'text/x-shellscript': 'application/x-sh',
+    'text/x-perl': 'application/x-perl',
+    'text/x-ruby': 'application/x-ruby',
+    'text/x-php': 'application/x-php',
+    'text/xml': 'application/xml',
+}
+
+
+def _sniff_text(head):
+    """Recognize scripts, markup and plain text; None for binary data."""
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'text/plain'
+    if b'\x00' in head:
+        return None
+    try:
+        # A multi-byte character may be cut off at the end of the buffer
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:
+            return None
+    if head.startswith(b'#!'):
+        interpreter = head[2:].split(b'\n', 1)[0].lower()
+        for name, mime_type in _INTERPRETERS:
+            if name in interpreter:
+                return mime_type
+    start = head.lstrip()[:15].lower()
+    if start.startswith((b'<!doctype html', b'<html')):
+        return 'text/html'
+    return 'text/plain'
+
+
+def sniff_bytes(head):
+    """Detect a MIME type from the first bytes of a file with the builtin signature table."""
+    for offset, signature, mime_type in SIGNATURES:
+        if head.startswith(signature, offset):
+            return mime_type
+    if head.startswith(b'RIFF'):
+        return _RIFF_TYPES.get(head[8:12], DEFAULT_TYPE)
+    if head[4:8] == b'ftyp':
+        return _FTYP_BRANDS.get(head[8:12], 'video/mp4')
+    if head.startswith(b'PK\x03\x04'):
+        if head.startswith(b'mimetypeapplication/epub+zip', 30):
+            return 'application/epub+zip'
+        if b'[Content_Types].xml' in head:
+            for part, mime_type in _OOXML_PARTS:
+                if part in head:
+                    return mime_type
+        return 'application/zip'
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        for stream, mime_type in _OLE_STREAMS:
+            if stream in head:
+                return mime_type
+        return 'application/x-ole-storage'
+    if head.startswith((b'\xff\xfb', b'\xff\xf3', b'\xff\xf2')):
+        return 'audio/mpeg'
+    return _sniff_text(head) if head else None
+
+
+def read_head(path, size=None):
+    """Read the first size bytes of a file with a single pread where available."""
+    size = size or SNIFF_SETTINGS["head_size"]
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if hasattr(os, 'pread'):
+            return os.pread(fd, size, 0)
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+def needs_sniffing(name):
+    """Check whether a file's extension leaves its type open.
+
+    Files without an extension, with an extension mimetypes does not know, or
+    with one listed in SNIFF_SETTINGS['ambiguous_extensions'] are sniffed.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if not extension or extension in SNIFF_SETTINGS["ambiguous_extensions"]:
+        return True
+    return mimetypes.guess_type(name)[0] is None
+
+
+class SniffCache:
+    """SQLite cache of sniffed MIME types keyed by device and inode.
+
+    A row is only used while the file's size and mtime still match, so
+    unchanged files are never read twice. New results are buffered and written
+    in one transaction every flush_every results and on flush().
+    """
+
+    def __init__(self, db_path=None, flush_every=256):
+        self.db_path = db_path or SNIFF_SETTINGS["cache_path"] or default_cache_path()
+        self.flush_every = flush_every
+        self._lock = Lock()
+        self._pending = {}
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sniffed ("
+            " device INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " mime_type TEXT,"
+            " PRIMARY KEY (device, inode))"
+        )
+        self.conn.commit()
+
+    def get(self, file_stat):
+        """Return (found, mime_type) for a stat result."""
+        key = (file_stat.st_dev, file_stat.st_ino)
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self.conn.execute("SELECT size, mtime_ns, mime_type FROM sniffed WHERE device = ? AND inode = ?",
+                                        key).fetchone()
+        if row is not None and row[0] == file_stat.st_size and row[1] == file_stat.st_mtime_ns:
+            return True, row[2]
+        return False, None
+
+    def put(self, file_stat, mime_type):
+        with self._lock:
+            self._pending[(file_stat.st_dev, file_stat.st_ino)] = (file_stat.st_size, file_stat.st_mtime_ns, mime_type)
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sniffed (device, inode, size, mtime_ns, mime_type) VALUES (?, ?, ?, ?, ?)",
+                [key + row for key, row in self._pending.items()])
+        self._pending.clear()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_locked()
+            finally:
+                self.conn.close()
+
+
+_cache = None
+_cache_lock = Lock()
+# Number of active read_only_cache() blocks; new results are not cached while it is non-zero
+_read_only = 0
+
+
+def default_cache_path():
+    """Return sniff_cache.db in the user's cache directory, creating the directory."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    directory = os.path.join(base, 'ai-directory-management')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, 'sniff_cache.db')
+
+
+def get_sniff_cache(create=True):
+    """Return the process-wide sniff cache, opening it on first use.
+
+    The cache lives at SNIFF_SETTINGS['cache_path'], or default_cache_path()
+    when that is None. With create=False None is returned instead of creating
+    a cache file that does not exist yet.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = SNIFF_SETTINGS["cache_path"] or default_cache_path()
+            if not create and not os.path.exists(path):
+                return None
+            _cache = SniffCache(path)
+            atexit.register(_cache.close)
+        return _cache
+
+
+@contextmanager
+def read_only_cache():
+    """Use cached types without recording new ones, e.g. while planning a dry run."""
+    global _read_only
+    with _cache_lock:
+        _read_only += 1
+    try:
+        yield
+    finally:
+        with _cache_lock:
+            _read_only -= 1
+
+
+def _sniff_file(path):
+    head = read_head(path)
+    mime_type = None
+    if magic is not None and SNIFF_SETTINGS["use_libmagic"] and head:
+        try:
+            mime_type = magic.from_buffer(head, mime=True)
+            mime_type = _MAGIC_ALIASES.get(mime_type, mime_type)
+        except Exception as e:
+            logging.debug(f"libmagic failed on {path}: {e}")
+            mime_type = None
+        if mime_type in (None, DEFAULT_TYPE, 'text/plain', 'application/zip'):
+            # The builtin table tells apart scripts and Office documents libmagic may lump together
+            mime_type = sniff_bytes(head) or mime_type
+    else:
+        mime_type = sniff_bytes(head)
+    return mime_type
+
+
+def sniff_type(path, file_stat=None):
+    """Detect a file's MIME type from its content, or None if it is not recognized.
+
+    Results are cached by (device, inode) and reused while size and mtime are
+    unchanged. Files whose stat has no inode number (os.scandir on Windows) are
+    sniffed without the cache. An OSError reading the file is raised and not
+    cached, so the file is read again next time. Inside read_only_cache() the
+    cache is only read, and not created if it does not exist.
+    """
+    if file_stat is None:
+        file_stat = os.stat(path)
+    writable = not _read_only
+    cache = get_sniff_cache(create=writable) if file_stat.st_ino else None
+    if cache is not None:
+        found, mime_type = cache.get(file_stat)
+        if found:
+            return mime_type
+    mime_type = _sniff_file(path)
+    if cache is not None and writable:
+        cache.put(file_stat, mime_type)
+    return mime_type
+
+
+def detect_type(path, name=None, file_stat=None):
+    """Return a file's MIME type from its name, sniffing the content when the name leaves it open."""
+    name = name or os.path.basename(path)
+    guessed = mimetypes.guess_type(name)[0]
+    if SNIFF_SETTINGS["enabled"] and needs_sniffing(name):
+        try:
+            sniffed = sniff_type(path, file_stat)
+        except OSError as e:
+            logging.warning(f"Could not read {path} to detect its type: {e}")
+            sniffed = None
+        if sniffed and sniffed != DEFAULT_TYPE:
+            return sniffed
+    return guessed or DEFAULT_TYPE
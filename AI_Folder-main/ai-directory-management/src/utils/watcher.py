@@ -0,0 +1,419 @@
+import os
+import time
+import math
+import fnmatch
+import logging
+from collections import OrderedDict
+from threading import Thread, Condition, Lock, Event
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from config.settings import WATCH_SETTINGS
+from utils.file_operations import move_file
+from utils.journal import prediction_details
+from utils.file_index import FileIndex, ACTION_MOVED, ACTION_ERROR
+from utils.scanner import ScanEntry, scan_directory, file_metadata
+
+
+class CoalescingQueue:
+    """Bounded FIFO of paths in which repeated puts of the same path collapse into one.
+
+    put() never blocks: when the queue is full the path is dropped and a rescan
+    of the watched directory is requested instead, so the observer thread keeps
+    up with any burst.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        # Used as an ordered set
+        self._items = OrderedDict()
+        self._condition = Condition()
+        self._closed = False
+        self._rescan_requested = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def put(self, path):
+        """Queue a path unless it is already queued. Returns False if it was dropped."""
+        with self._condition:
+            if path not in self._items:
+                if len(self._items) >= self.max_size:
+                    self._rescan_requested = True
+                    return False
+                self._items[path] = None
+                self._condition.notify()
+            return True
+
+    def discard(self, path):
+        """Forget a queued path, e.g. because the file was deleted again."""
+        with self._condition:
+            self._items.pop(path, None)
+
+    def get_batch(self, max_items):
+        """Wait for queued paths and return up to max_items of them; None once closed and drained.
+
+        An empty batch is returned when a rescan is requested while nothing is queued.
+        """
+        with self._condition:
+            while not self._items:
+                if self._closed:
+                    return None
+                if self._rescan_requested:
+                    return []
+                self._condition.wait()
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popitem(last=False)[0])
+            return batch
+
+    def request_rescan(self):
+        with self._condition:
+            self._rescan_requested = True
+            # Wake a worker waiting on an empty queue to run the rescan
+            self._condition.notify_all()
+
+    def take_rescan_request(self):
+        """Return True, once, if a rescan was requested after an overflow."""
+        with self._condition:
+            requested = self._rescan_requested
+            self._rescan_requested = False
+            return requested
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class SettleWheel:
+    """Hold candidate files until they have finished arriving, then hand them to a queue.
+
+    A file is promoted once its size and mtime are unchanged after a full settle
+    window, or right away when promote() is called for it (close-after-write or
+    rename into place). Candidates sit in a hashed timer wheel of tick-sized
+    slots, so each file is stat'ed once per window instead of being polled, and
+    a tick only touches the files that fall due in it.
+    """
+
+    def __init__(self, queue, window, tick, max_size):
+        self.queue = queue
+        self.window = window
+        self.tick = tick
+        self.max_size = max_size
+        # A file added just after a tick waits for the slots of one whole window
+        # after the next tick, plus the slot being processed
+        self._slots = [set() for _ in range(math.ceil(window / tick) + 2)]
+        self._position = 0
+        # path -> (slot index, (size, mtime_ns) when it was last scheduled)
+        self._pending = {}
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, path):
+        """Start tracking a file. Files already being tracked are left as they are."""
+        with self._lock:
+            if path in self._pending:
+                return
+            if len(self._pending) >= self.max_size:
+                self.queue.request_rescan()
+                return
+        snapshot = self._snapshot(path)
+        if snapshot is not None:
+            with self._lock:
+                if path not in self._pending:
+                    self._schedule(path, snapshot)
+
+    def promote(self, path):
+        """Hand a file to the queue now, whether or not it was being tracked."""
+        self.discard(path)
+        self.queue.put(path)
+
+    def discard(self, path):
+        with self._lock:
+            pending = self._pending.pop(path, None)
+            if pending is not None:
+                self._slots[pending[0]].discard(path)
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="watch-settle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the wheel; files that have not settled yet are dropped."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            dropped = len(self._pending)
+            self._pending.clear()
+            for slot in self._slots:
+                slot.clear()
+        if dropped:
+            logging.info(f"Stopped with {dropped} files still arriving")
+
+    def advance(self):
+        """Process the next slot: promote settled files and reschedule changing ones."""
+        with self._lock:
+            self._position = (self._position + 1) % len(self._slots)
+            due = self._slots[self._position]
+            self._slots[self._position] = set()
+            snapshots = {path: self._pending.pop(path)[1] for path in due}
+
+        for path, snapshot in snapshots.items():
+            current = self._snapshot(path)
+            if current is None:
+                continue
+            if current == snapshot:
+                self.queue.put(path)
+            else:
+                with self._lock:
+                    if path not in self._pending:
+                        self._schedule(path, current)
+
+    def _schedule(self, path, snapshot):
+        # The slot just behind the current position comes up last, a full window from now
+        slot = (self._position - 1) % len(self._slots)
+        self._slots[slot].add(path)
+        self._pending[path] = (slot, snapshot)
+
+    @staticmethod
+    def _snapshot(path):
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return None
+        return path_stat.st_size, path_stat.st_mtime_ns
+
+    def _run(self):
+        while not self._stopped.wait(self.tick):
+            try:
+                self.advance()
+            except Exception as e:
+                logging.error(f"Error checking arriving files: {e}")
+
+
+def is_transient(file_name, patterns=None):
+    """Check whether a file name looks like a temporary or partial download."""
+    patterns = WATCH_SETTINGS["ignore_patterns"] if patterns is None else patterns
+    return any(fnmatch.fnmatch(file_name, pattern) for pattern in patterns)
+
+
+class DirectoryEventHandler(FileSystemEventHandler):
+    """Feed file system events into a SettleWheel without doing any work on the observer thread."""
+
+    def __init__(self, wheel, exclude=()):
+        self.wheel = wheel
+        self.exclude = [os.path.normcase(os.path.abspath(path)) + os.sep for path in exclude]
+
+    def _wanted(self, path):
+        if is_transient(os.path.basename(path)):
+            return False
+        normalized = os.path.normcase(os.path.abspath(path))
+        return not any(normalized.startswith(excluded) for excluded in self.exclude)
+
+    def on_created(self, event):
+        if not event.is_directory and self._wanted(event.src_path):
+            self.wheel.add(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory and self._wanted(event.src_path):
+            self.wheel.add(event.src_path)
+
+    def on_closed(self, event):
+        # The writer closed the file, so it is complete
+        if not event.is_directory and self._wanted(event.src_path):
+            self.wheel.promote(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.wheel.discard(event.src_path)
+            self.wheel.queue.discard(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.wheel.discard(event.src_path)
+            self.wheel.queue.discard(event.src_path)
+            # Downloads and uploads are renamed into place once complete
+            if self._wanted(event.dest_path):
+                self.wheel.promote(event.dest_path)
+
+
+class FolderWatcher:
+    """Organize files into category folders as they appear in a watched directory.
+
+    An observer feeds new files into a SettleWheel, which passes them on to a
+    CoalescingQueue once they have finished arriving; worker threads take paths
+    in batches, classify each batch with one predict_categories call and move
+    the files.
+
+    Every outcome is recorded in the file index, which serves as the
+    checkpoint for the reconciliation pass run at startup: files that arrived
+    while the watcher was down are organized, files it already failed on are
+    left alone until they change.
+    """
+
+    def __init__(self, source_directory, target_directory, model, recursive=False, workers=None,
+                 batch_size=None, queue_size=None, settle_ms=None, db_path=None, reconcile=None):
+        settings = WATCH_SETTINGS
+        self.source_directory = source_directory
+        self.target_directory = target_directory
+        self.model = model
+        self.recursive = recursive
+        self.workers = workers or settings["workers"]
+        self.batch_size = batch_size or settings["batch_size"]
+        queue_size = queue_size or settings["queue_size"]
+        settle_ms = settings["settle_ms"] if settle_ms is None else settle_ms
+        self.queue = CoalescingQueue(queue_size)
+        self.wheel = SettleWheel(self.queue, settle_ms / 1000.0, settings["settle_tick_ms"] / 1000.0, queue_size)
+        self.db_path = db_path
+        self.reconcile_on_start = settings["reconcile"] if reconcile is None else reconcile
+        self.index = None
+        self.observer = None
+        self.moved = 0
+        self.errors = 0
+        self._created_folders = set()
+        self._stats_lock = Lock()
+        self._threads = []
+
+    def start(self):
+        """Start the observer and the worker threads, then reconcile files that arrived while stopped."""
+        os.makedirs(self.target_directory, exist_ok=True)
+        self.index = FileIndex(self.db_path)
+        handler = DirectoryEventHandler(self.wheel, exclude=(self.target_directory,))
+        self.observer = Observer()
+        self.observer.schedule(handler, self.source_directory, recursive=self.recursive)
+        self.observer.start()
+        self.wheel.start()
+        for index in range(self.workers):
+            thread = Thread(target=self._work, name=f"watch-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Watching {self.source_directory} for new files")
+        # The observer is already running, so nothing created during the pass is missed
+        if self.reconcile_on_start:
+            self.reconcile()
+
+    def stop(self):
+        """Stop watching, finish the queued files and wait for the workers."""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        self.wheel.stop()
+        self.queue.close()
+        for thread in self._threads:
+            thread.join()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        logging.info(f"Stopped watching {self.source_directory}: {self.moved} moved, {self.errors} errors")
+
+    def run_forever(self):
+        """Watch until interrupted with Ctrl+C."""
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def reconcile(self):
+        """Feed files in the source directory that the index has no outcome for into the pipeline.
+
+        Only files whose failed move is not due for a retry are skipped
+        (FileIndex.is_settled); a file back at a path it was moved away from
+        is organized again. Files older than the settle window go straight to the
+        work queue, newer ones may still be arriving and go through the settle wheel.
+        Returns the number of files fed in.
+        """
+        start = time.perf_counter()
+        settled_before = time.time() - self.wheel.window
+        scanned = fed = 0
+        batch = []
+
+        def feed(batch):
+            rows = self.index.lookup(entry.path for entry in batch)
+            count = 0
+            for entry in batch:
+                row = rows.get(entry.path)
+                if self.index.is_settled(entry, row):
+                    continue
+                if entry.stat.st_mtime < settled_before:
+                    self.queue.put(entry.path)
+                else:
+                    self.wheel.add(entry.path)
+                count += 1
+            return count
+
+        for entry in scan_directory(self.source_directory, recursive=self.recursive,
+                                    exclude=(self.target_directory,)):
+            if is_transient(entry.name):
+                continue
+            scanned += 1
+            batch.append(entry)
+            if len(batch) >= self.batch_size:
+                fed += feed(batch)
+                batch = []
+        if batch:
+            fed += feed(batch)
+
+        logging.info(f"Reconciled {self.source_directory}: {fed} of {scanned} files to organize "
+                     f"in {time.perf_counter() - start:.2f}s")
+        return fed
+
+    def _work(self):
+        while True:
+            # Rescan once the backlog has drained, not while the queue is still full
+            if len(self.queue) == 0 and self.queue.take_rescan_request():
+                logging.warning("Watch queue overflowed, rescanning the source directory")
+                self.reconcile()
+            batch = self.queue.get_batch(self.batch_size)
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                self._organize_batch(batch)
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += len(batch)
+                logging.error(f"Error organizing watched files: {e}")
+
+    def _organize_batch(self, paths):
+        entries = []
+        for path in paths:
+            try:
+                entries.append(ScanEntry(path, os.path.basename(path), os.stat(path), 0))
+            except FileNotFoundError:
+                # Already gone, e.g. moved away by its creator
+                continue
+        if not entries:
+            return
+
+        metadata_list = [file_metadata(entry) for entry in entries]
+        categories = self.model.predict_categories(metadata_list)
+        records = []
+        for entry, metadata, category in zip(entries, metadata_list, categories):
+            target_folder = os.path.join(self.target_directory, category)
+            if target_folder not in self._created_folders:
+                os.makedirs(target_folder, exist_ok=True)
+                self._created_folders.add(target_folder)
+            target_path = os.path.join(target_folder, entry.name)
+            moved = move_file(entry.path, target_path, show_dialog=False,
+                              prediction=prediction_details(metadata, category), unique=True)
+            records.append((entry, category, ACTION_MOVED if moved else ACTION_ERROR, moved or target_path))
+            with self._stats_lock:
+                if moved:
+                    self.moved += 1
+                else:
+                    self.errors += 1
+        self.index.record(records)